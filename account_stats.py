@@ -0,0 +1,104 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+# ---------- Incremental Updates ----------
+# These run inside the caller's transaction (no commit), so the counters
+# change atomically with the borrow/fine rows they describe.
+BUMP_SQL = text("""
+    INSERT INTO user_account_stats (user_id, total_borrowed, currently_borrowed, fines_due)
+    VALUES (:user_id, :total, :current, :fines) AS new
+    ON DUPLICATE KEY UPDATE
+        total_borrowed = user_account_stats.total_borrowed + new.total_borrowed,
+        currently_borrowed = user_account_stats.currently_borrowed + new.currently_borrowed,
+        fines_due = user_account_stats.fines_due + new.fines_due
+""")
+
+
+def bump_params(user_id, total=0, current=0, fines=0):
+    return {"user_id": user_id, "total": total, "current": current, "fines": fines}
+
+
+def _bump(session: Session, user_id, total=0, current=0, fines=0):
+    session.execute(BUMP_SQL, bump_params(user_id, total, current, fines))
+
+
+def record_issue(session: Session, user_id):
+    _bump(session, user_id, total=1, current=1)
+
+
+def record_return(session: Session, user_id):
+    _bump(session, user_id, current=-1)
+
+
+def record_fine(session: Session, user_id, amount):
+    _bump(session, user_id, fines=amount)
+
+
+def record_payment(session: Session, user_id, amount):
+    _bump(session, user_id, fines=-amount)
+
+
+# ---------- Reads ----------
+EMPTY_STATS = {"total_borrowed": 0, "currently_borrowed": 0, "fines_due": 0}
+
+
+STATS_SQL = text("""
+    SELECT total_borrowed, currently_borrowed, fines_due
+    FROM user_account_stats
+    WHERE user_id = :user_id
+""")
+
+
+def get_stats(session: Session, user_id):
+    """Primary-key read of a user's counters; users with no activity get zeros."""
+    row = session.execute(STATS_SQL, {"user_id": user_id}).fetchone()
+    return dict(row._mapping) if row else dict(EMPTY_STATS)
+
+
+# ---------- Rebuild ----------
+REBUILD_SELECT = """
+    SELECT u.user_id,
+           COALESCE(b.total_borrowed, 0),
+           COALESCE(b.currently_borrowed, 0),
+           COALESCE(f.fines_due, 0)
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id,
+               COUNT(*) AS total_borrowed,
+               SUM(CASE WHEN return_date IS NULL THEN 1 ELSE 0 END) AS currently_borrowed
+        FROM borrows_history
+        GROUP BY user_id
+    ) b ON b.user_id = u.user_id
+    LEFT JOIN (
+        SELECT br.user_id, SUM(f.amount) AS fines_due
+        FROM fines f
+        JOIN borrows br ON f.borrow_id = br.borrow_id
+        WHERE f.paid = FALSE
+        GROUP BY br.user_id
+    ) f ON f.user_id = u.user_id
+"""
+
+
+def rebuild(session: Session, user_id=None):
+    """
+    Recomputes the counters from borrows/fines history, for every user or
+    just one, in a single transaction. Returns the number of rows written.
+    """
+    where = "WHERE u.user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id} if user_id is not None else {}
+    try:
+        if user_id is None:
+            session.execute(text("DELETE FROM user_account_stats"))
+        else:
+            session.execute(text("DELETE FROM user_account_stats WHERE user_id = :user_id"), params)
+        result = session.execute(text(f"""
+            INSERT INTO user_account_stats (user_id, total_borrowed, currently_borrowed, fines_due)
+            {REBUILD_SELECT}
+            {where}
+        """), params)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return result.rowcount
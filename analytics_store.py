@@ -0,0 +1,307 @@
+"""
+Columnar copy of the library for the Reports / Analytics menus.
+
+snapshot() copies the catalogue, hot and archived loans (with the
+borrows_history view), fines, reviews and rollup tables from the database
+(read replica when configured) into a local DuckDB file.
+With LMS_ANALYTICS_BACKEND=duckdb the analytics menus run their unchanged
+SQL there through AnalyticsSession, so the group-by/window scans use DuckDB's
+vectorized engine instead of the OLTP primary. parity() runs every analytics
+query on both sides and reports any differences.
+"""
+import os
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from rich.console import Console
+from sqlalchemy import inspect, text, types
+
+console = Console()
+
+ANALYTICS_BACKEND = os.getenv("LMS_ANALYTICS_BACKEND", "database")  # database | duckdb
+ANALYTICS_PATH = Path(os.getenv("LMS_ANALYTICS_DB", "analytics.duckdb"))
+ANALYTICS_SNAPSHOT_TIME = os.getenv("LMS_ANALYTICS_SNAPSHOT_TIME", "03:00")
+CHUNK_SIZE = 50000
+
+# Tables copied into the store; column lists come from exporter.EXPORT_TABLES
+# so password hashes stay in the database.
+SNAPSHOT_TABLES = (
+    "books", "book_copies", "authors", "book_authors", "categories", "book_categories",
+    "users", "borrows", "borrows_archive", "fines", "reviews", "reservations",
+    "book_borrow_stats", "book_borrow_monthly", "user_account_stats",
+)
+# Views recreated in the store once their tables are copied
+VIEWS = (
+    """CREATE VIEW borrows_history AS
+         SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date FROM borrows
+         UNION ALL
+         SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date FROM borrows_archive""",
+)
+# Generated columns the analytics SQL relies on (not exported, recomputed here)
+DERIVED_COLUMNS = {
+    "borrows": ["active INTEGER AS (CASE WHEN return_date IS NULL THEN 1 ELSE 0 END)"],
+}
+# MySQL functions used by the analytics SQL, as DuckDB macros
+MACROS = (
+    "CREATE OR REPLACE MACRO curdate() AS current_date",
+    "CREATE OR REPLACE MACRO date_format(d, f) AS strftime(CAST(d AS TIMESTAMP), f)",
+)
+
+
+def _connect(path, read_only=False):
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("The analytics store needs duckdb and pyarrow (pip install duckdb pyarrow)")
+    return duckdb.connect(str(path), read_only=read_only)
+
+
+# ---------- Snapshot ----------
+def _duckdb_type(sa_type):
+    if isinstance(sa_type, types.Boolean):
+        return "BOOLEAN"
+    if isinstance(sa_type, types.Integer):
+        return "BIGINT"
+    if isinstance(sa_type, types.Float):
+        return "DOUBLE"
+    if isinstance(sa_type, types.Numeric):
+        return f"DECIMAL({sa_type.precision or 18}, {sa_type.scale or 2})"
+    if isinstance(sa_type, types.DateTime):
+        return "TIMESTAMP"
+    if isinstance(sa_type, types.Date):
+        return "DATE"
+    return "VARCHAR"
+
+
+def _table_columns(engine, table):
+    """[(name, DuckDB type)] for the exported columns of `table`, typed from the database schema."""
+    from exporter import EXPORT_TABLES
+
+    reflected = {c["name"]: c["type"] for c in inspect(engine).get_columns(table)}
+    wanted = EXPORT_TABLES[table]
+    names = list(reflected) if wanted == "*" else [c.strip() for c in wanted.split(",")]
+    if table in DERIVED_COLUMNS:
+        derived = {c.split()[0] for c in DERIVED_COLUMNS[table]}
+        names = [n for n in names if n not in derived]
+    return [(name, _duckdb_type(reflected[name])) for name in names]
+
+
+def _copy_table(conn, engine, table):
+    import pyarrow as pa
+    from exporter import stream_chunks
+
+    columns = _table_columns(engine, table)
+    names = ", ".join(name for name, _ in columns)
+    definitions = [f"{name} {kind}" for name, kind in columns] + DERIVED_COLUMNS.get(table, [])
+    conn.execute(f"CREATE TABLE {table} ({', '.join(definitions)})")
+    rows = 0
+    for _, partition in stream_chunks(f"SELECT {names} FROM {table}", CHUNK_SIZE, engine):
+        chunk = pa.table({name: [row[i] for row in partition] for i, (name, _) in enumerate(columns)})
+        conn.register("chunk", chunk)
+        conn.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM chunk")
+        conn.unregister("chunk")
+        rows += len(partition)
+    return rows
+
+
+def snapshot(path=ANALYTICS_PATH, tables=SNAPSHOT_TABLES, engine=None, quiet=False):
+    """
+    Rebuilds the DuckDB store from the database. The new file is written next
+    to the old one and swapped in when complete, so readers never see a
+    partial snapshot. Returns {table: rows, "seconds": ...}.
+    """
+    if engine is None:
+        from db import get_read_engine
+        engine = get_read_engine()
+    path = Path(path)
+    staging = path.with_name(path.name + ".staging")
+    staging.unlink(missing_ok=True)
+    started = time.perf_counter()
+    counts = {}
+    conn = _connect(staging)
+    try:
+        for statement in MACROS:
+            conn.execute(statement)
+        for table in tables:
+            table_started = time.perf_counter()
+            counts[table] = _copy_table(conn, engine, table)
+            if not quiet:
+                console.print(f"[dim]{table}: {counts[table]:,} rows in {time.perf_counter() - table_started:.1f}s[/dim]")
+        if {"borrows", "borrows_archive"} <= set(tables):
+            for statement in VIEWS:
+                conn.execute(statement)
+        conn.execute("CREATE TABLE snapshot_info AS SELECT CAST(? AS TIMESTAMP) AS taken_at", [datetime.now()])
+        conn.close()
+    except Exception:
+        conn.close()
+        staging.unlink(missing_ok=True)
+        raise
+    os.replace(staging, path)
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def run_scheduler(at: str = ANALYTICS_SNAPSHOT_TIME, run_now: bool = True):
+    """Rebuilds the analytics store daily at `at` (HH:MM); blocks forever."""
+    import schedule
+
+    if run_now:
+        snapshot()
+    schedule.every().day.at(at).do(snapshot)
+    console.print(f"[green]Analytics snapshot scheduled daily at {at}[/green]")
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
+
+
+# ---------- Session ----------
+_BIND_RE = re.compile(r"(?<![:\w]):(\w+)")
+
+
+class AnalyticsResult:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        names = [d[0] for d in cursor.description or []]
+        self._row = namedtuple("Row", names, rename=True) if names else None
+
+    def keys(self):
+        return list(self._row._fields) if self._row else []
+
+    def fetchall(self):
+        return [self._row(*r) for r in self._cursor.fetchall()]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(*row)
+
+    def scalar(self):
+        row = self._cursor.fetchone()
+        return None if row is None else row[0]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class AnalyticsSession:
+    """
+    Read-only stand-in for a SQLAlchemy Session over the DuckDB store: the
+    analytics menus call execute(text(...), params) on it exactly as on the
+    database. `:name` binds are passed to DuckDB as `$name`.
+    """
+
+    def __init__(self, path=ANALYTICS_PATH):
+        self.path = Path(path)
+        self._open()
+
+    def _open(self):
+        self.conn = _connect(self.path, read_only=True)
+        self.taken_at = self.conn.execute("SELECT taken_at FROM snapshot_info").fetchone()[0]
+
+    def execute(self, statement, params=None):
+        sql = _BIND_RE.sub(r"$\1", str(statement))
+        return AnalyticsResult(self.conn.execute(sql, params or {}))
+
+    def reload(self):
+        """Reopens the store, e.g. after snapshot() replaced it."""
+        self.conn.close()
+        self._open()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.conn.close()
+
+
+def is_analytics(session) -> bool:
+    return isinstance(session, AnalyticsSession)
+
+
+@contextmanager
+def analytics_session(session):
+    """
+    Yields an AnalyticsSession when LMS_ANALYTICS_BACKEND=duckdb and a snapshot
+    exists; otherwise yields `session` unchanged.
+    """
+    if ANALYTICS_BACKEND != "duckdb":
+        yield session
+        return
+    if not ANALYTICS_PATH.exists():
+        console.print("[dim]No analytics snapshot yet; querying the database (run `cli.py analytics-snapshot`).[/dim]")
+        yield session
+        return
+    analytics = AnalyticsSession()
+    try:
+        yield analytics
+    finally:
+        analytics.close()
+
+
+# ---------- Parity ----------
+# Checks for the history view and monthly rollup, which no menu query reads yet
+PARITY_SQL = {
+    "history:borrows_by_month": """
+        SELECT DATE_FORMAT(borrow_date, '%Y-%m') AS month, COUNT(*) AS borrows,
+               SUM(CASE WHEN return_date IS NULL THEN 1 ELSE 0 END) AS active
+        FROM borrows_history
+        GROUP BY DATE_FORMAT(borrow_date, '%Y-%m')
+    """,
+    "rollup:book_borrow_monthly": """
+        SELECT DATE_FORMAT(month, '%Y-%m') AS month, SUM(borrows) AS borrows,
+               SUM(returns) AS returns, SUM(late_days) AS late_days
+        FROM book_borrow_monthly
+        GROUP BY DATE_FORMAT(month, '%Y-%m')
+    """,
+}
+
+
+def analytics_queries():
+    """name -> function(session) returning rows, for every query the analytics menus run."""
+    import book_stats
+    from librarian import ANALYTICS_SQL, REPORTS, run_report
+
+    queries = {f"analytics:{name}": (lambda s, sql=sql: s.execute(text(sql)).fetchall())
+               for name, sql in ANALYTICS_SQL.items()}
+    queries["analytics:most_borrowed"] = lambda s: book_stats.most_borrowed(s, 5)
+    queries["analytics:least_borrowed"] = lambda s: book_stats.least_borrowed(s, 5)
+    for name, sql in PARITY_SQL.items():
+        queries[name] = lambda s, sql=sql: s.execute(text(sql)).fetchall()
+    for report_id in sorted(REPORTS, key=int):
+        queries[f"report:{report_id}"] = lambda s, r=report_id: run_report(s, r)
+    return queries
+
+
+def _normalize(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (Decimal, float)):
+        return round(float(value), 2)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _normalized(rows):
+    return sorted((tuple(_normalize(v) for v in row) for row in rows), key=repr)
+
+
+def parity(session, analytics):
+    """
+    Runs each analytics query on the database and the store; returns
+    [(name, database rows, store rows, matches)]. Rows are compared as
+    multisets with numbers rounded to 2 places, so only run it right after a
+    snapshot on a quiet database.
+    """
+    results = []
+    for name, run in analytics_queries().items():
+        expected, actual = run(session), run(analytics)
+        results.append((name, len(expected), len(actual), _normalized(expected) == _normalized(actual)))
+    return results
@@ -0,0 +1,140 @@
+"""
+Approximate nearest-neighbour search over book vectors (pure NumPy IVF).
+
+build() clusters the unit-normalized vectors with spherical k-means and
+stores them grouped by cluster (an inverted file): cluster offsets into one
+contiguous vector array, like the CSR arrays in catalogue_cache. A query
+scores the centroids, then only the vectors of the `nprobe` closest
+clusters, so its cost grows with sqrt(books) instead of books. Indexes are
+saved as .npy files and memory-mapped back. benchmarks/ann.py reports
+recall and latency against exact search.
+"""
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 1
+NPROBE = 16
+TRAIN_SAMPLE = 50000
+KMEANS_ITERATIONS = 10
+ASSIGN_CHUNK = 65536
+ARRAYS = ("centroids", "list_offsets", "vectors", "ids", "sorted_ids", "sorted_rows")
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _assign(vectors, centroids):
+    """Closest (highest cosine) centroid for each row, in chunks to bound the score matrix."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        labels[start:start + ASSIGN_CHUNK] = np.argmax(vectors[start:start + ASSIGN_CHUNK] @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(vectors, clusters, iterations=KMEANS_ITERATIONS, seed=42):
+    """Spherical k-means centroids (unit length) for unit-length `vectors`."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed clusters that lost every member with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index; vectors and ids are stored grouped by cluster."""
+
+    def __init__(self, centroids, list_offsets, vectors, ids, sorted_ids, sorted_rows):
+        self.centroids, self.list_offsets = centroids, list_offsets
+        self.vectors, self.ids = vectors, ids
+        # ids in ascending order and their row in `vectors`, for lookups by book id
+        self.sorted_ids, self.sorted_rows = sorted_ids, sorted_rows
+
+    @classmethod
+    def build(cls, ids, vectors, clusters=None, seed=42):
+        """Indexes `vectors` (one row per id); `clusters` defaults to 4 * sqrt(len(ids))."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize(vectors)
+        clusters = min(len(ids), clusters or max(1, int(4 * math.sqrt(len(ids)))))
+        rng = np.random.default_rng(seed)
+        sample = vectors if len(vectors) <= TRAIN_SAMPLE else vectors[rng.choice(len(vectors), TRAIN_SAMPLE, replace=False)]
+        centroids = kmeans(sample, clusters, seed=seed)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        list_offsets = np.zeros(clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=clusters), out=list_offsets[1:])
+        grouped_ids = ids[order]
+        by_id = np.argsort(grouped_ids, kind="stable")
+        return cls(centroids, list_offsets, np.ascontiguousarray(vectors[order]), grouped_ids,
+                   grouped_ids[by_id], by_id.astype(np.int64))
+
+    # ---------- Persistence ----------
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        (path / "meta.json").write_text(json.dumps({"version": FORMAT_VERSION, "size": len(self)}))
+
+    @classmethod
+    def open(cls, path):
+        """Maps an index written by save(); None when missing or from another format."""
+        path = Path(path)
+        try:
+            if json.loads((path / "meta.json").read_text())["version"] != FORMAT_VERSION:
+                return None
+            return cls(*(np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # ---------- Queries ----------
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, ids):
+        """Rows in `vectors` for the given ids; unknown ids are skipped."""
+        ids = np.asarray(list(ids), dtype=self.sorted_ids.dtype)
+        p = np.searchsorted(self.sorted_ids, ids)
+        p = p[p < len(self.sorted_ids)]
+        return self.sorted_rows[p[np.isin(self.sorted_ids[p], ids)]]
+
+    def _top(self, scores, rows, k, exclude_rows):
+        if exclude_rows is not None and len(exclude_rows):
+            keep = ~np.isin(rows, exclude_rows)
+            scores, rows = scores[keep], rows[keep]
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.ids[rows[p]]), float(scores[p])) for p in best]
+
+    def search(self, vector, k=10, nprobe=NPROBE, exclude_rows=None):
+        """[(id, cosine)] best first among the `nprobe` clusters closest to `vector`."""
+        query = normalize(vector)
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probes])
+        return self._top(self.vectors[rows] @ query, rows, k, exclude_rows)
+
+    def exact(self, vector, k=10, exclude_rows=None):
+        """Brute-force search over every vector (the reference for recall)."""
+        return self._top(self.vectors @ normalize(vector), np.arange(len(self.ids)), k, exclude_rows)
+
+    def similar(self, ids, k=10, nprobe=NPROBE):
+        """[(id, cosine)] nearest to the mean direction of `ids`, excluding them; [] if none are indexed."""
+        rows = self.rows_of(ids)
+        if not len(rows):
+            return []
+        return self.search(self.vectors[rows].mean(axis=0), k, nprobe, exclude_rows=rows)
@@ -0,0 +1,139 @@
+"""
+Async service API over the core library operations.
+
+Built on SQLAlchemy's AsyncEngine with the aiomysql driver, so one process
+(an HTTP or kiosk front end) can serve many concurrent patrons without a
+thread per user. It runs exactly the statements the synchronous CLI uses;
+only the I/O model differs.
+
+    import asyncio, async_service
+    asyncio.run(async_service.search("title", "potter"))
+"""
+import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+
+import account_stats
+import recommendation_cache
+import session_cache
+from db import DATABASE_URL
+from librarian import REPORTS
+from student import (
+    LOAN_DAYS, PICK_COPY_SQL, INSERT_BORROW_SQL, LOCK_ACTIVE_BORROW_SQL, BORROWER_BOOKS_SQL,
+    issue_statements, return_statements, after_issue, search_query, search_pattern,
+)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("+pymysql", "+aiomysql"))
+POOL_SIZE = int(os.getenv("LMS_ASYNC_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("LMS_ASYNC_MAX_OVERFLOW", "10"))
+
+_engine = None
+_session_factory = None
+
+
+# ---------- Engine & Sessions ----------
+def get_async_engine():
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _engine = create_async_engine(
+            ASYNC_DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True
+        )
+    return _engine
+
+
+@asynccontextmanager
+async def async_session():
+    """Yields an AsyncSession from the shared pool; one per request/operation."""
+    global _session_factory
+    if _session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _session_factory = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    async with _session_factory() as session:
+        yield session
+
+
+async def dispose():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
+def _rows(result):
+    return [dict(row._mapping) for row in result]
+
+
+# ---------- Operations ----------
+async def search(mode: str, term: str, with_copies: bool = False, session=None):
+    """Title/author/category search; returns a list of dicts."""
+    query = search_query(mode, with_copies)
+    async with _maybe_session(session) as s:
+        result = await s.execute(query, {"term": search_pattern(mode, term)})
+        return _rows(result)
+
+
+async def issue(user_id: int, book_id: int, librarian_id: int = None, session=None):
+    """Async twin of student.borrow_book: returns the borrow dict, or None when no copy is free."""
+    async with _maybe_session(session) as s:
+        copy = (await s.execute(PICK_COPY_SQL, {"book_id": book_id})).fetchone()
+        if not copy:
+            await s.rollback()
+            return None
+        result = await s.execute(INSERT_BORROW_SQL, {
+            "user_id": user_id, "copy_id": copy.copy_id, "librarian_id": librarian_id, "loan_days": LOAN_DAYS
+        })
+        for statement, params in issue_statements(user_id, copy.copy_id, result.lastrowid):
+            await s.execute(statement, params)
+        await s.commit()
+        borrower_books = []
+        if recommendation_cache.size():
+            borrower_books = [row.book_id for row in await s.execute(BORROWER_BOOKS_SQL, {"user_id": user_id})]
+        after_issue(book_id, borrower_books)
+        return {"borrow_id": result.lastrowid, "user_id": user_id, "book_id": book_id, "copy_id": copy.copy_id}
+
+
+async def return_borrow(borrow_id: int, user_id: int = None, session=None):
+    """Async twin of student.return_borrow."""
+    async with _maybe_session(session) as s:
+        borrow = (await s.execute(LOCK_ACTIVE_BORROW_SQL, {"borrow_id": borrow_id})).fetchone()
+        if not borrow or (user_id is not None and int(borrow.user_id) != int(user_id)):
+            await s.rollback()
+            return None
+        for statement, params in return_statements(borrow.user_id, borrow.copy_id, borrow.borrow_id):
+            await s.execute(statement, params)
+        await s.commit()
+        return {"borrow_id": borrow.borrow_id, "user_id": borrow.user_id, "copy_id": borrow.copy_id}
+
+
+async def account(user_id: int, session=None):
+    """Profile plus borrow/fine counters for a user, or None if unknown."""
+    async with _maybe_session(session) as s:
+        profile = (await s.execute(session_cache.PROFILE_SQL, {"user_id": user_id})).fetchone()
+        if profile is None:
+            return None
+        stats = (await s.execute(account_stats.STATS_SQL, {"user_id": user_id})).fetchone()
+        data = dict(profile._mapping)
+        data.update(dict(stats._mapping) if stats else account_stats.EMPTY_STATS)
+        return data
+
+
+async def report(report_id: str, session=None):
+    """Runs one of librarian.REPORTS; raises KeyError for unknown ids."""
+    spec = REPORTS[str(report_id)]
+    async with _maybe_session(session) as s:
+        result = await s.execute(text(spec["sql"]))
+        return {"report": str(report_id), "title": spec["title"], "rows": _rows(result)}
+
+
+@asynccontextmanager
+async def _maybe_session(session):
+    if session is not None:
+        yield session
+    else:
+        async with async_session() as s:
+            yield s
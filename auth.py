@@ -1,22 +1,156 @@
+import base64
 import hashlib
+import hmac
+import os
+import time
 from sqlalchemy import text
 from rich.console import Console
 import typer
 
 console = Console()
 
+
+# ---------- Password Hashing ----------
+# scrypt cost parameters; raise LMS_SCRYPT_N as hardware gets faster; existing
+# hashes are upgraded on the next successful login.
+SCRYPT_N = int(os.getenv("LMS_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("LMS_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("LMS_SCRYPT_P", "1"))
+SALT_BYTES = 16
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2), dklen=32)
+
+
+def hash_password(password: str) -> str:
+    """Returns a salted scrypt hash: scrypt$n$r$p$salt$hash (base64 fields)."""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: str):
+    """
+    Checks a password against a stored hash in constant time.
+    Returns (ok, needs_rehash); legacy unsalted sha256 hex digests verify but
+    always need a rehash, as do scrypt hashes with outdated cost parameters.
+    """
+    if not stored:
+        return False, False
+    stored = stored.strip()
+
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = base64.b64decode(digest)
+            actual = _scrypt(password, base64.b64decode(salt), n, r, p)
+        except ValueError:
+            return False, False
+        ok = hmac.compare_digest(actual, expected)
+        return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+    # compare_digest rejects non-ASCII str; compare bytes so a corrupt row fails instead of raising
+    legacy = hashlib.sha256(password.encode()).hexdigest().encode()
+    ok = hmac.compare_digest(legacy, stored.lower().encode())
+    return ok, ok
+
+
+# Verified against when the username doesn't exist, so both paths cost the same
+_DUMMY_HASH = hash_password("not-a-real-password")
+
+
+# ---------- Login Throttling ----------
+class LoginThrottle:
+    """
+    In-memory per-username failure counter with exponential backoff.
+    After FREE_ATTEMPTS failures each further failure doubles the lockout
+    (BASE_DELAY, 2x, 4x ... up to MAX_DELAY seconds). Locked-out attempts are
+    rejected before any credential lookup reaches the database.
+    """
+    FREE_ATTEMPTS = 3
+    BASE_DELAY = 1.0
+    MAX_DELAY = 300.0
+    MAX_ENTRIES = 10000
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.failures = {}  # key -> (count, locked_until)
+
+    @staticmethod
+    def key(role: str, username: str):
+        return role, username.strip().casefold()
+
+    def retry_after(self, role: str, username: str) -> float:
+        """Seconds until this username may try again (0 when allowed)."""
+        entry = self.failures.get(self.key(role, username))
+        if not entry:
+            return 0.0
+        return max(entry[1] - self.clock(), 0.0)
+
+    def record_failure(self, role: str, username: str):
+        key = self.key(role, username)
+        count = self.failures.get(key, (0, 0.0))[0] + 1
+        delay = 0.0
+        if count > self.FREE_ATTEMPTS:
+            delay = min(self.BASE_DELAY * 2 ** (count - self.FREE_ATTEMPTS - 1), self.MAX_DELAY)
+        self.failures[key] = (count, self.clock() + delay)
+        if len(self.failures) > self.MAX_ENTRIES:
+            self._prune()
+
+    def record_success(self, role: str, username: str):
+        self.failures.pop(self.key(role, username), None)
+
+    def _prune(self):
+        now = self.clock()
+        for key in [k for k, (_, until) in self.failures.items() if until <= now]:
+            del self.failures[key]
+        # Still too many: drop the oldest lockouts first
+        while len(self.failures) > self.MAX_ENTRIES:
+            del self.failures[min(self.failures, key=lambda k: self.failures[k][1])]
+
+
+throttle = LoginThrottle()
+
+
+def _check_credentials(session, role, table, id_column, username, password, extra_where=""):
+    """Shared login flow: throttle, lookup, constant-time verify, rehash. Returns the row or None."""
+    wait = throttle.retry_after(role, username)
+    if wait > 0:
+        console.print(f"[red]Too many failed attempts. Try again in {wait:.0f}s.[/red]")
+        return None
+
+    query = text(f"SELECT {id_column}, username, password_hash FROM {table} WHERE username = :username{extra_where}")
+    result = session.execute(query, {"username": username}).fetchone()
+
+    ok, needs_rehash = verify_password(password, result.password_hash if result else _DUMMY_HASH)
+    if not (result and ok):
+        throttle.record_failure(role, username)
+        return None
+
+    throttle.record_success(role, username)
+    if needs_rehash:
+        session.execute(
+            text(f"UPDATE {table} SET password_hash = :password_hash WHERE {id_column} = :id"),
+            {"password_hash": hash_password(password), "id": getattr(result, id_column)}
+        )
+        session.commit()
+    return result
+
+
 def librarian_login(session):
     username = typer.prompt("Username")
     password = typer.prompt("Password", hide_input=True)
 
-    query = text("SELECT librarian_id, password_hash FROM librarians WHERE username = :username")
-    result = session.execute(query, {"username": username}).fetchone()
-
+    result = _check_credentials(session, "librarian", "librarians", "librarian_id", username, password)
     if result:
-        entered_hash = hashlib.sha256(password.encode()).hexdigest()
-        if entered_hash == result.password_hash:
-            console.print("[green]Login successful![/green]")
-            return True
+        console.print("[green]Login successful![/green]")
+        return True
 
     console.print("[red]Invalid username or password[/red]")
     return False
@@ -26,14 +160,11 @@ def student_login(session) -> int:
     username = typer.prompt("Username")
     password = typer.prompt("Password", hide_input=True)
 
-    query = text("SELECT user_id, username, password_hash FROM users WHERE username = :username AND status = 'A'")
-    result = session.execute(query, {"username": username}).fetchone()
-
+    result = _check_credentials(session, "student", "users", "user_id", username, password,
+                                extra_where=" AND status = 'A'")
     if result:
-        entered_hash = hashlib.sha256(password.encode()).hexdigest()
-        if entered_hash == result.password_hash:
-            console.print(f"[green]Welcome {result.username}![/green]")
-            return result.user_id
+        console.print(f"[green]Welcome {result.username}![/green]")
+        return result.user_id
 
     console.print("[red]Invalid student credentials[/red]")
     return None
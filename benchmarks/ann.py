@@ -0,0 +1,92 @@
+"""
+Recall and latency of the approximate book index (ann_index.py) against exact search.
+
+    python -m benchmarks.ann --books 200000 --dim 32
+    python -m benchmarks.ann --factors recommender
+
+Indexes synthetic clustered vectors (or the trained book factors in a
+recommender directory), then for each --nprobe runs `similar` lookups for
+random books. It reports recall@K against brute force over every vector,
+and p50/p95/p99 latency for both. Exits non-zero when the default nprobe
+misses --budget-ms at p50.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.timing import measure
+
+
+def synthetic_vectors(books, dim, seed=42):
+    """Book vectors around 500 topic directions, roughly like CF factors."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(500, dim))
+    vectors = topics[rng.integers(0, len(topics), books)] + rng.normal(scale=1.0, size=(books, dim))
+    return np.arange(1, books + 1), vectors.astype(np.float32)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=32)
+    parser.add_argument("--factors", default=None, help="Recommender directory to index instead of synthetic vectors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, action="append", default=None)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    import ann_index
+
+    if args.factors:
+        import recommender
+        factors = recommender.Factors.open(args.factors)
+        if factors is None:
+            print(f"No trained factors in {args.factors}", file=sys.stderr)
+            return 2
+        ids, vectors = np.asarray(factors.book_ids), np.asarray(factors.book_factors)
+    else:
+        ids, vectors = synthetic_vectors(args.books, args.dim)
+
+    started = time.perf_counter()
+    index = ann_index.IVFIndex.build(ids, vectors)
+    build_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(7)
+    probes = [int(i) for i in rng.choice(ids, args.queries)]
+    exact = {}
+    for book_id in probes:
+        rows = index.rows_of([book_id])
+        exact[book_id] = {b for b, _ in index.exact(index.vectors[rows[0]], args.k, exclude_rows=rows)}
+
+    cycle = iter(probes * 1000)
+    exact_timing = measure(lambda: len(index.exact(index.vectors[index.rows_of([next(cycle)])[0]], args.k)),
+                           min(args.queries, 50))
+    sweeps = {}
+    for nprobe in args.nprobe or [1, 2, 4, ann_index.NPROBE, 16, 32]:
+        hits = sum(len(exact[b] & {r for r, _ in index.similar([b], args.k, nprobe)}) for b in probes)
+        cycle = iter(probes * 1000)
+        sweeps[nprobe] = {
+            f"recall@{args.k}": round(hits / (len(probes) * args.k), 4),
+            "similar": measure(lambda: len(index.similar([next(cycle)], args.k, nprobe)), args.queries),
+        }
+
+    result = {
+        "books": len(ids),
+        "dim": int(vectors.shape[1]),
+        "clusters": len(index.centroids),
+        "build_seconds": round(build_seconds, 2),
+        "exact": exact_timing,
+        "nprobe": sweeps,
+        "budget_ms": args.budget_ms,
+    }
+    print(json.dumps(result, indent=2))
+    default = sweeps.get(ann_index.NPROBE)
+    return 1 if default and default["similar"]["p50_ms"] > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
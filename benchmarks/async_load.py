@@ -0,0 +1,133 @@
+"""
+Concurrent-patron load benchmark for async_service.
+
+    python -m benchmarks.async_load --patrons 200 --duration 30
+    python -m benchmarks.async_load --patrons 50 --mix search=6,account=3,issue_return=1
+
+Each simulated patron loops over a weighted mix of operations against the
+live database until --duration elapses. Reports throughput and latency
+percentiles per operation. issue_return issues a book and immediately
+returns it, so the catalogue ends where it started.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+import async_service
+from benchmarks.timing import percentile
+
+SEARCH_TERMS = ["the", "harry", "love", "war", "king", "night", "history", "a"]
+
+
+async def load_ids():
+    async with async_service.async_session() as s:
+        users = [r[0] for r in await s.execute(text("SELECT user_id FROM users WHERE status = 'A' LIMIT 5000"))]
+        books = [r[0] for r in await s.execute(text("""
+            SELECT DISTINCT book_id FROM book_copies WHERE is_available = TRUE LIMIT 5000
+        """))]
+    return users, books
+
+
+async def op_search(rng, users, books):
+    await async_service.search(rng.choice(["title", "author", "category"]), rng.choice(SEARCH_TERMS))
+
+
+async def op_account(rng, users, books):
+    await async_service.account(rng.choice(users))
+
+
+async def op_issue_return(rng, users, books):
+    borrow = await async_service.issue(rng.choice(users), rng.choice(books))
+    if borrow:
+        await async_service.return_borrow(borrow["borrow_id"])
+
+
+async def op_report(rng, users, books):
+    await async_service.report(rng.choice(["1", "9"]))
+
+
+OPERATIONS = {
+    "search": op_search,
+    "account": op_account,
+    "issue_return": op_issue_return,
+    "report": op_report,
+}
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def patron(seed, deadline, weights, users, books, latencies, errors):
+    rng = random.Random(seed)
+    names = list(weights)
+    cum = list(weights.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, cum)[0]
+        started = time.perf_counter()
+        try:
+            await OPERATIONS[name](rng, users, books)
+        except Exception:
+            errors[name] = errors.get(name, 0) + 1
+            continue
+        latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+
+async def run(patrons, duration, weights):
+    users, books = await load_ids()
+    if not users or not books:
+        raise SystemExit("need at least one active user and one available book")
+    latencies, errors = {}, {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*[
+        patron(i, deadline, weights, users, books, latencies, errors) for i in range(patrons)
+    ])
+    elapsed = time.perf_counter() - started
+    await async_service.dispose()
+
+    result = {"patrons": patrons, "seconds": round(elapsed, 2), "operations": {}, "errors": errors}
+    total = 0
+    for name, samples in sorted(latencies.items()):
+        total += len(samples)
+        result["operations"][name] = {
+            "count": len(samples),
+            "ops_per_sec": round(len(samples) / elapsed, 1),
+            "p50_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(percentile(samples, 95), 2),
+            "p99_ms": round(percentile(samples, 99), 2),
+        }
+    result["ops_per_sec"] = round(total / elapsed, 1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patrons", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--mix", default="search=6,account=3,issue_return=1")
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.patrons, args.duration, parse_mix(args.mix)))
+    print(json.dumps(result, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Hot/cold borrows benchmark: active-loan queries before and after archiving.
+
+    DATABASE_URL=mysql+pymysql://root:pw@localhost/lms_bench \\
+        python -m benchmarks.borrows_hotcold --rows 50000000 --i-know-this-writes
+
+Seeds a synthetic, mostly returned borrow history (spread over --years) into
+the configured database, times the return list, my-borrowed-books and
+overdue queries, moves old history into borrows_archive, and times them
+again. Point it at a scratch database: the seeded rows are real borrows.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from catalogue import insert_rows
+
+QUERIES = {
+    "return_list": """
+        SELECT br.borrow_id, bc.copy_id, b.title, bc.barcode
+        FROM borrows br
+        JOIN book_copies bc ON br.copy_id = bc.copy_id
+        LEFT JOIN books b ON bc.book_id = b.book_id
+        WHERE br.active = 1 AND br.user_id = :user_id
+    """,
+    "my_borrowed_books": """
+        SELECT br.borrow_id, br.copy_id, br.borrow_date, br.due_date, br.return_date, br.active
+        FROM borrows br
+        WHERE br.user_id = :user_id
+        ORDER BY br.borrow_date DESC
+    """,
+    "overdue_report": """
+        SELECT br.borrow_id, br.user_id, br.due_date
+        FROM borrows br
+        WHERE br.active = 1 AND br.due_date < CURDATE()
+    """,
+}
+
+
+def seed(session, rows, years, active_ratio, batch_size=5000, seed_value=42):
+    rng = random.Random(seed_value)
+    user_ids = [r[0] for r in session.execute(text("SELECT user_id FROM users"))]
+    copy_ids = [r[0] for r in session.execute(text("SELECT copy_id FROM book_copies"))]
+    if not user_ids or not copy_ids:
+        raise SystemExit("seed users and book_copies first (e.g. Fake_data.py)")
+    today = date.today()
+    span = years * 365
+    statement = "INSERT INTO borrows (user_id, copy_id, borrow_date, due_date, return_date) VALUES"
+    columns = ["user_id", "copy_id", "borrow_date", "due_date", "return_date"]
+
+    started = time.perf_counter()
+    written = 0
+    while written < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - written)):
+            if rng.random() < active_ratio:
+                borrowed = today - timedelta(days=rng.randint(0, 30))
+                returned = None
+            else:
+                borrowed = today - timedelta(days=rng.randint(15, span))
+                returned = borrowed + timedelta(days=rng.randint(1, 30))
+            batch.append((rng.choice(user_ids), rng.choice(copy_ids), borrowed, borrowed + timedelta(days=14), returned))
+        insert_rows(session, statement, columns, batch, batch_size)
+        session.commit()
+        written += len(batch)
+        if written % (batch_size * 100) == 0:
+            print(f"  seeded {written:,} rows ({written / (time.perf_counter() - started):,.0f}/s)", file=sys.stderr)
+    return user_ids
+
+
+def time_queries(session, user_ids, repeats, seed_value=7):
+    rng = random.Random(seed_value)
+    results = {}
+    for name, sql in QUERIES.items():
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            session.execute(text(sql), {"user_id": rng.choice(user_ids)}).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+            session.rollback()
+        results[name] = {"p50_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000_000, help="synthetic borrows to insert (0 = use existing data)")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--active-ratio", type=float, default=0.002)
+    parser.add_argument("--hot-days", type=int, default=365)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--json", dest="json_path", default=None)
+    parser.add_argument("--i-know-this-writes", action="store_true", help="required: seeds and archives real rows")
+    args = parser.parse_args(argv)
+    if not args.i_know_this_writes:
+        parser.error("this benchmark writes to DATABASE_URL; pass --i-know-this-writes on a scratch database")
+
+    import borrow_archive
+    from db import SessionLocal
+
+    with SessionLocal() as session:
+        if args.rows:
+            user_ids = seed(session, args.rows, args.years, args.active_ratio)
+        else:
+            user_ids = [r[0] for r in session.execute(text("SELECT user_id FROM users"))]
+        hot_before = session.execute(text("SELECT COUNT(*) FROM borrows")).scalar()
+        before = time_queries(session, user_ids, args.repeats)
+
+        started = time.perf_counter()
+        moved = borrow_archive.archive_returned(session, args.hot_days)
+        archive_seconds = time.perf_counter() - started
+        session.execute(text("ANALYZE TABLE borrows"))
+
+        hot_after = session.execute(text("SELECT COUNT(*) FROM borrows")).scalar()
+        after = time_queries(session, user_ids, args.repeats)
+
+    result = {
+        "hot_rows_before": hot_before,
+        "hot_rows_after": hot_after,
+        "archived": moved,
+        "archive_seconds": round(archive_seconds, 1),
+        "queries": {
+            name: {
+                "before": before[name],
+                "after": after[name],
+                "speedup": round(before[name]["p50_ms"] / max(after[name]["p50_ms"], 1e-6), 1),
+            }
+            for name in QUERIES
+        },
+    }
+    print(json.dumps(result, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Memory profile of catalogue_cache on a synthetic catalogue (no database).
+
+    python -m benchmarks.catalogue_memory --books 1000000 --budget-mb 100
+
+Builds a CatalogueCache shaped like benchmarks.seed (1-2 authors and 1-3
+categories per book), then reports the cache's own size, the tracemalloc
+peak during the build, and lookup latencies. It also times writing the
+snapshot file and mapping it back in, which is what a warm start costs.
+Exits non-zero when the cache is larger than --budget-mb.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.seed import WORDS
+from benchmarks.timing import measure
+
+
+def synthetic_rows(books, seed_value=42):
+    rng = random.Random(seed_value)
+    authors, categories = max(books // 5, 1), 200
+    book_rows, author_links, category_links = [], [], []
+    for book_id in range(1, books + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        book_rows.append((book_id, f"{title} {book_id}"))
+        for author_id in set(rng.randint(1, authors) for _ in range(rng.randint(1, 2))):
+            author_links.append((book_id, author_id))
+        for category_id in set(rng.randint(1, categories) for _ in range(rng.randint(1, 3))):
+            category_links.append((book_id, category_id))
+    return (book_rows, author_links, category_links,
+            [(i, f"Author {i}") for i in range(1, authors + 1)],
+            [(i, f"Category {i}") for i in range(1, categories + 1)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--budget-mb", type=float, default=100.0)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from catalogue_cache import CatalogueCache
+
+    rows = synthetic_rows(args.books)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    cache = CatalogueCache.from_rows(*rows)
+    build_seconds = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    gc.collect()
+
+    fd, snapshot_path = tempfile.mkstemp(suffix=".snap")
+    os.close(fd)
+    state = {"max_book_id": args.books, "max_updated_at": ""}
+    try:
+        started = time.perf_counter()
+        snapshot_bytes = cache.save(snapshot_path, "benchmark", state)
+        write_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        mapped = CatalogueCache.open(snapshot_path, "benchmark", state)
+        mapped.get(args.books // 2)
+        open_ms = (time.perf_counter() - started) * 1000
+    finally:
+        os.remove(snapshot_path)
+
+    rng = random.Random(7)
+    ids = lambda n: [rng.randint(1, args.books) for _ in range(n)]
+    some_title = cache.get(args.books // 2).title
+    result = {
+        "books": len(cache),
+        "cache_mb": round(cache.memory_bytes() / 2 ** 20, 1),
+        "retained_mb": round(retained / 2 ** 20, 1),
+        "build_peak_mb": round(peak / 2 ** 20, 1),
+        "build_seconds": round(build_seconds, 1),
+        "snapshot_mb": round(snapshot_bytes / 2 ** 20, 1),
+        "snapshot_write_seconds": round(write_seconds, 2),
+        "snapshot_open_ms": round(open_ms, 2),
+        "budget_mb": args.budget_mb,
+        "lookups": {
+            "get_50": measure(lambda: len(cache.books(ids(50))), args.repeats),
+            "get_50_mapped": measure(lambda: len(mapped.books(ids(50))), args.repeats),
+            "ids_by_title": measure(lambda: len(cache.ids_by_title(some_title)), args.repeats),
+            "similar": measure(lambda: len(cache.similar(ids(5))), max(args.repeats // 10, 5)),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return 1 if result["cache_mb"] > args.budget_mb else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Compares a benchmark run against a stored baseline.
+
+    python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/latest.json
+    python -m benchmarks.compare baseline.json latest.json --tolerance 0.25 --metric p95_ms
+
+A benchmark regresses when its metric grows by more than --tolerance
+(fraction) AND by more than --min-delta-ms, so sub-millisecond noise on fast
+queries doesn't fail the build. Exits 1 on any regression.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, metric="p50_ms", tolerance=0.2, min_delta_ms=1.0):
+    """Returns rows of (name, baseline, current, change, status)."""
+    rows = []
+    base, cur = baseline["benchmarks"], current["benchmarks"]
+    for name in sorted(set(base) | set(cur)):
+        if name not in cur:
+            rows.append((name, base[name][metric], None, None, "missing"))
+            continue
+        if name not in base:
+            rows.append((name, None, cur[name][metric], None, "new"))
+            continue
+        before, after = base[name][metric], cur[name][metric]
+        change = (after - before) / before if before else 0.0
+        if change > tolerance and after - before > min_delta_ms:
+            status = "regressed"
+        elif change < -tolerance and before - after > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, before, after, change, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p50_ms", choices=("p50_ms", "p95_ms", "p99_ms"))
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("dataset") != current.get("dataset"):
+        print(f"warning: datasets differ ({baseline.get('dataset')} vs {current.get('dataset')})", file=sys.stderr)
+
+    rows = compare(baseline, current, args.metric, args.tolerance, args.min_delta_ms)
+    fmt = lambda v: "-" if v is None else f"{v:.2f}"
+    for name, before, after, change, status in rows:
+        pct = "" if change is None else f"{change:+.0%}"
+        print(f"{status:>9}  {fmt(before):>10} -> {fmt(after):>10} {args.metric}  {pct:>6}  {name}")
+
+    regressed = [row for row in rows if row[4] == "regressed"]
+    print(f"\n{len(regressed)} regression(s) out of {len(rows)} benchmarks", file=sys.stderr)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Training time and accuracy of the demand forecast (prediction.py).
+
+    python -m benchmarks.forecast --titles 100000 --weeks 156 --horizon 8
+
+The synthetic library has 200 categories, each with its own annual season.
+Each title has a popularity drawn from a long-tailed distribution; about a
+third are new releases whose demand fades, and a tenth are not in any
+category. Weekly borrows are Poisson-sampled.
+
+The last --horizon weeks are held out and the model is fitted on the rest.
+It reports fit time, plus WAPE (sum |error| / sum actual) and RMSE on the
+held-out weeks, against three baselines:
+- the all-time mean, which is close to what the old regression did;
+- the mean of the last 4 weeks;
+- the mean of the last 52 weeks.
+
+Most titles borrow less than once a week, so Poisson noise dominates those
+scores. The "oracle" row forecasts the true rates, which marks the floor.
+rate_rmse measures each method against the true rates directly.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+
+def synthetic_library(titles, weeks, categories=200, seed=42):
+    """(book_ids, weekly counts titles x weeks, membership csr, true weekly rate) with seasonal, long-tailed demand."""
+    from prediction import WEEKS_PER_YEAR, membership_matrix
+
+    rng = np.random.default_rng(seed)
+    book_ids = np.arange(1, titles + 1, dtype=np.int64)
+    primary = rng.integers(0, categories, titles)
+    links = [np.column_stack([book_ids, primary])]
+    second = rng.random(titles) < 0.3
+    links.append(np.column_stack([book_ids[second], rng.integers(0, categories, int(second.sum()))]))
+    uncategorized = rng.random(titles) < 0.1
+    links = np.concatenate(links)
+    links = links[~np.isin(links[:, 0], book_ids[uncategorized])]
+
+    t = np.arange(weeks)
+    amplitude = rng.uniform(0.1, 0.6, categories)
+    phase = rng.uniform(0, 2 * np.pi, categories)
+    season = 1 + amplitude[:, None] * np.sin(2 * np.pi * t / WEEKS_PER_YEAR + phase[:, None])
+    title_season = season[primary]
+    title_season[uncategorized] = 1 + 0.3 * np.sin(2 * np.pi * t / WEEKS_PER_YEAR)
+
+    popularity = rng.lognormal(mean=-2.0, sigma=1.2, size=titles)
+    release = np.where(rng.random(titles) < 0.35, rng.integers(0, weeks, titles), -10 ** 6)
+    age = t[None, :] - release[:, None]
+    lifecycle = np.where(age < 0, 0.0, np.where(release[:, None] >= 0, 1 + 3 * np.exp(-np.maximum(age, 0) / 12), 1.0))
+    rate = popularity[:, None] * title_season * lifecycle
+    counts = rng.poisson(rate).astype(np.float32)
+    return book_ids, counts, membership_matrix(book_ids, links), rate
+
+
+def _rmse(forecast, actual):
+    return round(float(np.sqrt(np.mean(np.square(forecast - actual)))), 4)
+
+
+def scores(forecast, actual, true_rate):
+    from prediction import wape
+
+    return {"wape": round(wape(forecast, actual), 4), "rmse": _rmse(forecast, actual),
+            "rate_rmse": _rmse(forecast, true_rate)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=100_000)
+    parser.add_argument("--weeks", type=int, default=156)
+    parser.add_argument("--horizon", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    import prediction
+
+    started = time.perf_counter()
+    _, counts, membership, rate = synthetic_library(args.titles, args.weeks + args.horizon)
+    generate_seconds = time.perf_counter() - started
+    history, actual = counts[:, :-args.horizon], counts[:, -args.horizon:]
+    true_rate = rate[:, -args.horizon:]
+
+    started = time.perf_counter()
+    forecast, half_life = prediction.fit(history, membership, args.horizon)
+    fit_seconds = time.perf_counter() - started
+
+    flat = lambda values: np.repeat(values[:, None], args.horizon, axis=1)
+    result = {
+        "titles": args.titles,
+        "weeks": args.weeks,
+        "horizon": args.horizon,
+        "borrows_per_week": round(float(history.sum()) / args.weeks, 1),
+        "generate_seconds": round(generate_seconds, 1),
+        "fit_seconds": round(fit_seconds, 2),
+        "half_life_weeks": half_life,
+        "forecast": scores(forecast, actual, true_rate),
+        "baselines": {
+            "oracle": scores(true_rate, actual, true_rate),
+            "all_time_mean": scores(flat(history.mean(axis=1)), actual, true_rate),
+            "last_4_weeks": scores(flat(history[:, -4:].mean(axis=1)), actual, true_rate),
+            "last_52_weeks": scores(flat(history[:, -52:].mean(axis=1)), actual, true_rate),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
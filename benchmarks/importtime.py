@@ -0,0 +1,95 @@
+"""
+Cold-start benchmark for cli.py based on `python -X importtime`.
+
+    python -m benchmarks.importtime                  # report
+    python -m benchmarks.importtime --budget-ms 250  # non-zero exit when over budget (CI)
+
+Each run starts a fresh interpreter, so the numbers are cold imports of the
+application modules (the OS file cache stays warm). The median of --runs is
+compared with the budget, and the check also fails when any module listed in
+HEAVY_MODULES is imported at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Must only be imported once a menu option or subcommand needs them
+HEAVY_MODULES = ("sqlalchemy", "pandas", "numpy", "matplotlib", "seaborn", "sklearn", "pymysql")
+
+
+def parse_importtime(stderr: str):
+    """Returns [(module, self_us, cumulative_us)] from -X importtime output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(target: str = "cli"):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {target} failed:\n{proc.stderr[-2000:]}")
+    entries = parse_importtime(proc.stderr)
+    total = next((cum for name, _, cum in entries if name == target), 0)
+    return total, entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="cli", help="module to import (default: cli)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="heaviest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the median exceeds this")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    totals = []
+    entries = []
+    for _ in range(args.runs):
+        total, entries = measure(args.target)
+        totals.append(total / 1000)
+    median_ms = statistics.median(totals)
+    loaded = {name.split(".")[0] for name, _, _ in entries}
+    heavy = sorted(m for m in HEAVY_MODULES if m in loaded)
+
+    print(f"import {args.target}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f})")
+    print(f"\nTop {args.top} imports by self time:")
+    for name, self_us, cum_us in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.2f} ms self  {cum_us / 1000:8.2f} ms cumulative  {name}")
+
+    result = {
+        "target": args.target,
+        "runs_ms": totals,
+        "median_ms": median_ms,
+        "heavy_modules_loaded": heavy,
+        "budget_ms": args.budget_ms,
+    }
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2))
+
+    failed = False
+    if heavy:
+        print(f"\n✗ heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"\n✗ median {median_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
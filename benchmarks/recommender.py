@@ -0,0 +1,103 @@
+"""
+Training time and recall@K of the "Recommended for you" model (recommender.py).
+
+    python -m benchmarks.recommender --k 10 --factors 32 --iterations 15
+
+Leave-one-out against the configured database (e.g. one seeded with
+benchmarks.seed): each user's most recent borrowed book is held out, the
+model is trained on everything else, and recall@K is the share of users
+whose held-out book appears in their top K (books already seen excluded).
+A most-borrowed baseline is reported next to it. The benchmark does not
+touch the saved factors.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from benchmarks.timing import measure
+
+LATEST_BORROW_SQL = text("""
+    SELECT user_id, book_id FROM (
+        SELECT br.user_id, bc.book_id,
+               ROW_NUMBER() OVER (PARTITION BY br.user_id ORDER BY br.borrow_date DESC, br.borrow_id DESC) AS rn
+        FROM borrows br JOIN book_copies bc ON bc.copy_id = br.copy_id
+    ) ranked
+    WHERE rn = 1
+""")
+
+
+def split(rows, held_out):
+    """Interaction rows minus each user's held-out book."""
+    return [(u, b, s) for u, b, s in rows if held_out.get(u) != b]
+
+
+def recall_at_k(factors, matrix, user_ids, book_ids, held_out, k, popular):
+    """(model recall, most-borrowed recall) over the users with a held-out book and training history."""
+    hits = baseline_hits = users = 0
+    for row, user_id in enumerate(user_ids):
+        target = held_out.get(int(user_id))
+        if target is None:
+            continue
+        seen = set(book_ids[matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]].tolist())
+        ranked = [b for b, _ in factors.top_k(int(user_id), k, exclude=seen)]
+        baseline = [b for b in popular if b not in seen][:k]
+        users += 1
+        hits += target in ranked
+        baseline_hits += target in baseline
+    return (hits / users if users else 0.0), (baseline_hits / users if users else 0.0), users
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    import recommender
+    from db import ReadSessionLocal
+
+    factors_n = args.factors or recommender.FACTORS
+    iterations = args.iterations or recommender.ITERATIONS
+    with ReadSessionLocal() as session:
+        rows = [tuple(r) for r in session.execute(recommender.INTERACTIONS_SQL)]
+        held_out = {r.user_id: r.book_id for r in session.execute(LATEST_BORROW_SQL)}
+
+    started = time.perf_counter()
+    user_ids, book_ids, matrix = recommender.interaction_matrix(split(rows, held_out))
+    matrix_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    user_factors, book_factors = recommender.factorize(matrix, factors_n, iterations)
+    train_seconds = time.perf_counter() - started
+    factors = recommender.Factors(user_ids, user_factors, book_ids, book_factors)
+
+    popularity = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    popular = book_ids[np.argsort(-popularity, kind="stable")[:args.k + 200]].tolist()
+    recall, baseline_recall, evaluated = recall_at_k(factors, matrix, user_ids, book_ids, held_out, args.k, popular)
+
+    rng = np.random.default_rng(7)
+    result = {
+        "users": len(user_ids),
+        "books": len(book_ids),
+        "interactions": int(matrix.nnz),
+        "factors": factors_n,
+        "iterations": iterations,
+        "matrix_seconds": round(matrix_seconds, 2),
+        "train_seconds": round(train_seconds, 2),
+        "evaluated_users": evaluated,
+        f"recall@{args.k}": round(recall, 4),
+        f"most_borrowed_recall@{args.k}": round(baseline_recall, 4),
+        "top_k": measure(lambda: len(factors.top_k(int(rng.choice(user_ids)), args.k)), args.repeats)
+        if len(user_ids) else {},
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
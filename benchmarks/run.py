@@ -0,0 +1,214 @@
+"""
+Times every hot query against a seeded database (see benchmarks.seed).
+
+    python -m benchmarks.run --repeats 20 --output benchmarks/results/latest.json
+    python -m benchmarks.run --only search --only queries.sql
+    python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/latest.json
+
+Groups: queries.sql (every numbered query in it), search (title/author/
+category), recommend (both recommenders, and the cached post-search
+lists cold and hot), borrow (issue + return of one copy per run) and
+predictions (the update_predictions bulk write). Each benchmark
+reports p50/p95/p99 latency and rows/sec.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from benchmarks.timing import measure
+
+ROOT = Path(__file__).resolve().parent.parent
+QUERIES_FILE = ROOT / "queries.sql"
+SEARCH_TERMS = {"title": ["history", "night", "love", "a"], "author": ["author 1", "author 42", "or 7"],
+                "category": ["category 1", "category 9"]}
+GROUPS = ("queries.sql", "search", "recommend", "borrow", "predictions")
+
+_QUERY_HEADER = re.compile(r"^--\s*(\d+)\.\s*(.+)$", re.M)
+
+
+def load_queries(path=QUERIES_FILE):
+    """Parses '-- N. Title' headed statements out of queries.sql -> [(id, title, sql)]."""
+    source = Path(path).read_text(encoding="utf-8")
+    headers = list(_QUERY_HEADER.finditer(source))
+    queries = []
+    for header, following in zip(headers, headers[1:] + [None]):
+        body = source[header.end():following.start() if following else len(source)]
+        sql = body.strip().rstrip(";").strip()
+        if sql:
+            queries.append((header.group(1), header.group(2).strip(), sql))
+    return queries
+
+
+def sample_ids(session, table, column, n, rng):
+    high = session.execute(text(f"SELECT MAX({column}) FROM {table}")).scalar() or 0
+    return [rng.randint(1, high) for _ in range(n)] if high else []
+
+
+# ---------- Groups ----------
+def bench_queries(session, repeats):
+    results = {}
+    for query_id, title, sql in load_queries():
+        statement = text(sql)
+        results[f"queries.sql#{query_id} {title}"] = measure(
+            lambda: len(session.execute(statement).fetchall()), repeats
+        )
+    return results
+
+
+def bench_search(session, repeats, rng):
+    from student import find_books
+
+    results = {}
+    for mode, terms in SEARCH_TERMS.items():
+        results[f"search/{mode}"] = measure(
+            lambda: len(find_books(session, mode, rng.choice(terms), with_copies=True)), repeats
+        )
+    return results
+
+
+def bench_recommend(session, repeats, rng):
+    import recommendation_cache
+    from student import fetch_also_borrowed_books, fetch_similar_items, search_recommendations
+
+    book_ids = sample_ids(session, "books", "book_id", 1000, rng)
+    if not book_ids:
+        return {}
+    shown = lambda: [str(b) for b in rng.sample(book_ids, 5)]
+    # A handful of result sets searched over and over, as for popular titles
+    hot_sets = [shown() for _ in range(10)]
+
+    def cold():
+        recommendation_cache.clear()
+        return len(search_recommendations(session, shown()))
+
+    results = {
+        "recommend/also_borrowed": measure(lambda: len(fetch_also_borrowed_books(session, shown())), repeats),
+        "recommend/similar_items": measure(lambda: len(fetch_similar_items(session, shown())), repeats),
+        "recommend/search_cold": measure(cold, repeats),
+        "recommend/search_hot": measure(lambda: len(search_recommendations(session, rng.choice(hot_sets))),
+                                        repeats, warmup=len(hot_sets) * 3),
+    }
+    recommendation_cache.clear()
+    return results
+
+
+def bench_borrow(session, repeats, rng):
+    """issue_book/return_book minus the prompts: borrow_book then return_borrow, timed separately."""
+    from student import borrow_book, return_borrow
+
+    user_ids = sample_ids(session, "users", "user_id", 1000, rng)
+    book_ids = [r[0] for r in session.execute(text("""
+        SELECT DISTINCT book_id FROM book_copies WHERE is_available = TRUE LIMIT 1000
+    """))]
+    session.commit()
+    if not user_ids or not book_ids:
+        return {}
+    open_borrows = []
+
+    def issue():
+        borrow = borrow_book(session, rng.choice(user_ids), rng.choice(book_ids))
+        if borrow:
+            open_borrows.append(borrow["borrow_id"])
+        return 1 if borrow else 0
+
+    def give_back():
+        return 1 if open_borrows and return_borrow(session, open_borrows.pop()) else 0
+
+    issued = measure(issue, repeats, warmup=0)
+    returned = measure(give_back, repeats, warmup=0)
+    while open_borrows:
+        return_borrow(session, open_borrows.pop())
+    return {"borrow/issue_book": issued, "borrow/return_book": returned}
+
+
+def bench_predictions(session, repeats, rng):
+    """update_predictions' bulk UPDATE, fed a CSV covering every copy."""
+    import pandas as pd
+    import recommend
+
+    copy_ids = [r[0] for r in session.execute(text("SELECT copy_id FROM book_copies"))]
+    session.commit()
+    if not copy_ids:
+        return {}
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        pd.DataFrame({
+            "copy_id": copy_ids,
+            "predicted_borrow_prob": [rng.random() for _ in copy_ids],
+            "predicted_damage_prob": [rng.random() * 0.2 for _ in copy_ids],
+        }).to_csv(path, index=False)
+
+        def write():
+            recommend.update_predictions(path)
+            return len(copy_ids)
+
+        return {"predictions/update_predictions": measure(write, max(repeats // 5, 1), warmup=0)}
+    finally:
+        os.remove(path)
+
+
+def run(groups=GROUPS, repeats: int = 20, seed_value: int = 7):
+    from db import SessionLocal
+
+    rng = random.Random(seed_value)
+    benchmarks, errors = {}, {}
+    with SessionLocal() as session:
+        counts = {t: session.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar()
+                  for t in ("books", "book_copies", "users", "borrows")}
+        session.commit()
+        for group in groups:
+            started = time.perf_counter()
+            try:
+                if group == "queries.sql":
+                    benchmarks.update(bench_queries(session, repeats))
+                elif group == "search":
+                    benchmarks.update(bench_search(session, repeats, rng))
+                elif group == "recommend":
+                    benchmarks.update(bench_recommend(session, repeats, rng))
+                elif group == "borrow":
+                    benchmarks.update(bench_borrow(session, repeats, rng))
+                elif group == "predictions":
+                    benchmarks.update(bench_predictions(session, repeats, rng))
+            except Exception as e:
+                session.rollback()
+                errors[group] = repr(e)
+            print(f"  {group}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "repeats": repeats,
+        "dataset": counts,
+        "benchmarks": benchmarks,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--only", action="append", choices=GROUPS, help="run only these groups (repeatable)")
+    parser.add_argument("--output", default=None, help="write results JSON here (default: stdout only)")
+    args = parser.parse_args(argv)
+
+    result = run(args.only or GROUPS, args.repeats)
+    document = json.dumps(result, indent=2)
+    print(document)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(document)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Seeds a reproducible synthetic library for benchmarking.
+
+    DATABASE_URL=mysql+pymysql://root:pw@localhost/lms_bench \\
+        python -m benchmarks.seed --scale 100k --i-know-this-writes
+
+Scales: 10k, 100k and 1m books (1m also writes 10M borrows). The same scale
+and --seed always produce the same rows. Expects an empty database created
+from schema.sql; use --force to seed on top of existing rows anyway.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from catalogue import insert_rows
+
+SCALES = {
+    "10k": {"books": 10_000, "users": 2_000, "borrows": 100_000},
+    "100k": {"books": 100_000, "users": 20_000, "borrows": 1_000_000},
+    "1m": {"books": 1_000_000, "users": 100_000, "borrows": 10_000_000},
+}
+BATCH_SIZE = 5000
+HISTORY_DAYS = 5 * 365
+ACTIVE_RATIO = 0.01
+LATE_FINE = 5
+WORDS = ("history", "night", "love", "war", "king", "garden", "river", "code", "star", "house",
+         "shadow", "winter", "empire", "data", "ocean", "secret", "city", "storm", "light", "stone")
+
+
+def _insert(session, statement, columns, rows):
+    insert_rows(session, statement, columns, rows, BATCH_SIZE)
+    session.commit()
+
+
+def _chunks(total, size=BATCH_SIZE * 10):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def seed_catalogue(session, rng, books, authors, categories):
+    _insert(session, "INSERT INTO authors (author_id, full_name) VALUES", ["author_id", "full_name"],
+            [(i, f"Author {i}") for i in range(1, authors + 1)])
+    _insert(session, "INSERT INTO categories (category_id, name) VALUES", ["category_id", "name"],
+            [(i, f"Category {i}") for i in range(1, categories + 1)])
+    copy_id = 0
+    for start, end in _chunks(books):
+        book_rows, author_links, category_links, copies = [], [], [], []
+        for book_id in range(start + 1, end + 1):
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+            book_rows.append((book_id, f"{title} {book_id}", f"978{book_id:010d}", rng.randint(1950, 2024)))
+            for author_id in set(rng.randint(1, authors) for _ in range(rng.randint(1, 2))):
+                author_links.append((book_id, author_id))
+            for category_id in set(rng.randint(1, categories) for _ in range(rng.randint(1, 3))):
+                category_links.append((book_id, category_id))
+            for _ in range(rng.randint(1, 3)):
+                copy_id += 1
+                copies.append((copy_id, book_id, f"BC{copy_id:012d}"))
+        _insert(session, "INSERT INTO books (book_id, title, isbn, published_year) VALUES",
+                ["book_id", "title", "isbn", "published_year"], book_rows)
+        _insert(session, "INSERT INTO book_authors (book_id, author_id) VALUES", ["book_id", "author_id"], author_links)
+        _insert(session, "INSERT INTO book_categories (book_id, category_id) VALUES",
+                ["book_id", "category_id"], category_links)
+        _insert(session, "INSERT INTO book_copies (copy_id, book_id, barcode) VALUES",
+                ["copy_id", "book_id", "barcode"], copies)
+    return copy_id
+
+
+def seed_users(session, rng, users):
+    from auth import hash_password
+
+    password_hash = hash_password("bench")
+    today = date.today()
+    for start, end in _chunks(users):
+        _insert(session, """
+            INSERT INTO users (user_id, full_name, username, password_hash, email,
+                               membership_type_id, membership_date, status) VALUES
+        """, ["user_id", "full_name", "username", "password_hash", "email", "membership_type_id",
+              "membership_date", "status"], [
+            (i, f"Bench User {i}", f"user{i}", password_hash, f"user{i}@bench.local", rng.randint(1, 3),
+             today - timedelta(days=rng.randint(0, HISTORY_DAYS)), "A" if rng.random() < 0.95 else "I")
+            for i in range(start + 1, end + 1)
+        ])
+
+
+def seed_borrows(session, rng, borrows, users, copies):
+    today = date.today()
+    fine_id = 0
+    for start, end in _chunks(borrows):
+        borrow_rows, fines = [], []
+        for borrow_id in range(start + 1, end + 1):
+            if rng.random() < ACTIVE_RATIO:
+                borrowed = today - timedelta(days=rng.randint(0, 30))
+                returned = None
+            else:
+                borrowed = today - timedelta(days=rng.randint(31, HISTORY_DAYS))
+                returned = borrowed + timedelta(days=rng.randint(1, 28))
+            due = borrowed + timedelta(days=14)
+            borrow_rows.append((borrow_id, rng.randint(1, users), rng.randint(1, copies), borrowed, due, returned))
+            if returned and returned > due:
+                fine_id += 1
+                paid = rng.random() < 0.7
+                fines.append((fine_id, borrow_id, (returned - due).days * LATE_FINE, paid,
+                              returned + timedelta(days=rng.randint(0, 30)) if paid else None))
+        _insert(session, "INSERT INTO borrows (borrow_id, user_id, copy_id, borrow_date, due_date, return_date) VALUES",
+                ["borrow_id", "user_id", "copy_id", "borrow_date", "due_date", "return_date"], borrow_rows)
+        _insert(session, "INSERT INTO fines (fine_id, borrow_id, amount, paid, payment_date) VALUES",
+                ["fine_id", "borrow_id", "amount", "paid", "payment_date"], fines)
+    session.execute(text("""
+        UPDATE book_copies SET is_available = FALSE
+        WHERE copy_id IN (SELECT copy_id FROM borrows WHERE active = 1)
+    """))
+    session.commit()
+
+
+def seed_reviews(session, rng, reviews, users, books):
+    seen = set()
+    rows = []
+    while len(rows) < reviews:
+        pair = (rng.randint(1, users), rng.randint(1, books))
+        if pair not in seen:
+            seen.add(pair)
+            rows.append((*pair, rng.randint(1, 5)))
+    _insert(session, "INSERT INTO reviews (user_id, book_id, rating) VALUES", ["user_id", "book_id", "rating"], rows)
+
+
+def seed(session, scale: str, seed_value: int = 42, force: bool = False):
+    """Seeds `scale` into the database behind `session`; returns row counts and timing."""
+    import account_stats
+    import book_stats
+
+    sizes = SCALES[scale]
+    if not force and session.execute(text("SELECT COUNT(*) FROM books")).scalar():
+        raise SystemExit("books is not empty; seed a fresh database or pass --force")
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+    books, users, borrows = sizes["books"], sizes["users"], sizes["borrows"]
+
+    copies = seed_catalogue(session, rng, books, authors=max(books // 5, 1), categories=200)
+    seed_users(session, rng, users)
+    seed_borrows(session, rng, borrows, users, copies)
+    seed_reviews(session, rng, borrows // 10, users, books)
+    account_stats.rebuild(session)
+    book_stats.rebuild(session)
+
+    return {"scale": scale, "seed": seed_value, "books": books, "copies": copies, "users": users,
+            "borrows": borrows, "seconds": round(time.perf_counter() - started, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="seed even if the catalogue is not empty")
+    parser.add_argument("--i-know-this-writes", action="store_true", help="required: inserts into DATABASE_URL")
+    args = parser.parse_args(argv)
+    if not args.i_know_this_writes:
+        parser.error("seeding writes to DATABASE_URL; pass --i-know-this-writes on a scratch database")
+
+    from db import SessionLocal
+
+    with SessionLocal() as session:
+        print(json.dumps(seed(session, args.scale, args.seed, args.force), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(samples_ms, rows=0):
+    """p50/p95/p99 (ms) of a list of timings, plus rows/sec over their total time."""
+    total_s = sum(samples_ms) / 1000
+    return {
+        "runs": len(samples_ms),
+        "p50_ms": round(statistics.median(samples_ms), 3) if samples_ms else 0.0,
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / total_s, 1) if total_s else 0.0,
+    }
+
+
+def measure(func, repeats: int, warmup: int = 1):
+    """
+    Calls func() warmup + repeats times; func returns the number of rows it
+    produced or touched. Returns summarize() of the timed calls.
+    """
+    for _ in range(warmup):
+        func()
+    samples, rows = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows += func() or 0
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples, rows)
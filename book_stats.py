@@ -0,0 +1,169 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+# ---------- Incremental Updates ----------
+# Keyed off the borrow row, so callers only pass a borrow_id. Like
+# account_stats these run inside the caller's transaction (no commit).
+# MySQL 8.0.20 deprecates VALUES(col) in ON DUPLICATE KEY UPDATE; an
+# INSERT ... SELECT names the new row through a derived table alias instead.
+# unique_borrowers can overcount when one user is issued two copies of a title
+# at the same instant (neither NOT EXISTS sees the other); rebuild() reconciles it.
+ISSUE_SQL = text("""
+    INSERT INTO book_borrow_stats (book_id, total_borrows, unique_borrowers, last_borrowed)
+    SELECT * FROM (
+        SELECT bc.book_id, 1 AS total_borrows,
+               NOT EXISTS (
+                   SELECT 1 FROM borrows p
+                   JOIN book_copies pc ON pc.copy_id = p.copy_id
+                   WHERE p.user_id = br.user_id AND pc.book_id = bc.book_id AND p.borrow_id <> br.borrow_id
+               ) AND NOT EXISTS (
+                   SELECT 1 FROM borrows_archive p
+                   JOIN book_copies pc ON pc.copy_id = p.copy_id
+                   WHERE p.user_id = br.user_id AND pc.book_id = bc.book_id
+               ) AS unique_borrowers,
+               br.borrow_date AS last_borrowed
+        FROM borrows br
+        JOIN book_copies bc ON bc.copy_id = br.copy_id
+        WHERE br.borrow_id = :borrow_id
+    ) AS new
+    ON DUPLICATE KEY UPDATE
+        total_borrows = book_borrow_stats.total_borrows + new.total_borrows,
+        unique_borrowers = book_borrow_stats.unique_borrowers + new.unique_borrowers,
+        last_borrowed = new.last_borrowed
+""")
+
+RETURN_SQL = text("""
+    INSERT INTO book_borrow_stats (book_id, returned_count, late_returns, total_late_days)
+    SELECT * FROM (
+        SELECT bc.book_id, 1 AS returned_count,
+               DATEDIFF(br.return_date, br.due_date) > 0 AS late_returns,
+               GREATEST(DATEDIFF(br.return_date, br.due_date), 0) AS total_late_days
+        FROM borrows br
+        JOIN book_copies bc ON bc.copy_id = br.copy_id
+        WHERE br.borrow_id = :borrow_id AND br.return_date IS NOT NULL
+    ) AS new
+    ON DUPLICATE KEY UPDATE
+        returned_count = book_borrow_stats.returned_count + new.returned_count,
+        late_returns = book_borrow_stats.late_returns + new.late_returns,
+        total_late_days = book_borrow_stats.total_late_days + new.total_late_days
+""")
+
+MONTHLY_ISSUE_SQL = text("""
+    INSERT INTO book_borrow_monthly (book_id, month, borrows)
+    SELECT bc.book_id, DATE_FORMAT(br.borrow_date, '%Y-%m-01'), 1
+    FROM borrows br
+    JOIN book_copies bc ON bc.copy_id = br.copy_id
+    WHERE br.borrow_id = :borrow_id
+    ON DUPLICATE KEY UPDATE borrows = borrows + 1
+""")
+
+MONTHLY_RETURN_SQL = text("""
+    INSERT INTO book_borrow_monthly (book_id, month, returns, late_days)
+    SELECT * FROM (
+        SELECT bc.book_id, DATE_FORMAT(br.return_date, '%Y-%m-01') AS month, 1 AS returns,
+               GREATEST(DATEDIFF(br.return_date, br.due_date), 0) AS late_days
+        FROM borrows br
+        JOIN book_copies bc ON bc.copy_id = br.copy_id
+        WHERE br.borrow_id = :borrow_id AND br.return_date IS NOT NULL
+    ) AS new
+    ON DUPLICATE KEY UPDATE
+        returns = book_borrow_monthly.returns + 1,
+        late_days = book_borrow_monthly.late_days + new.late_days
+""")
+
+# Shared with async_service
+ISSUE_STATEMENTS = (ISSUE_SQL, MONTHLY_ISSUE_SQL)
+RETURN_STATEMENTS = (RETURN_SQL, MONTHLY_RETURN_SQL)
+
+
+def record_issue(session: Session, borrow_id):
+    """Call after inserting the borrow row."""
+    for statement in ISSUE_STATEMENTS:
+        session.execute(statement, {"borrow_id": borrow_id})
+
+
+def record_return(session: Session, borrow_id):
+    """Call after setting the borrow's return_date."""
+    for statement in RETURN_STATEMENTS:
+        session.execute(statement, {"borrow_id": borrow_id})
+
+
+# ---------- Reads ----------
+# Every book with its borrow count (0 when never borrowed), for rankings
+BORROW_COUNTS = """
+    SELECT b.book_id, b.title, COALESCE(s.total_borrows, 0) AS borrow_count
+    FROM books b
+    LEFT JOIN book_borrow_stats s ON s.book_id = b.book_id
+"""
+
+
+def most_borrowed(session: Session, limit: int = 5):
+    return session.execute(text("""
+        SELECT b.title, s.total_borrows AS borrow_count
+        FROM book_borrow_stats s
+        JOIN books b ON b.book_id = s.book_id
+        ORDER BY s.total_borrows DESC, s.book_id
+        LIMIT :limit
+    """), {"limit": limit}).fetchall()
+
+
+def least_borrowed(session: Session, limit: int = 5):
+    return session.execute(text(f"""
+        {BORROW_COUNTS}
+        ORDER BY borrow_count ASC, b.book_id
+        LIMIT :limit
+    """), {"limit": limit}).fetchall()
+
+
+# ---------- Rebuild ----------
+REBUILD_BOOKS = """
+    INSERT INTO book_borrow_stats
+        (book_id, total_borrows, unique_borrowers, returned_count, late_returns, total_late_days, last_borrowed)
+    SELECT bc.book_id,
+           COUNT(*),
+           COUNT(DISTINCT br.user_id),
+           SUM(br.return_date IS NOT NULL),
+           SUM(COALESCE(DATEDIFF(br.return_date, br.due_date), 0) > 0),
+           SUM(GREATEST(COALESCE(DATEDIFF(br.return_date, br.due_date), 0), 0)),
+           MAX(br.borrow_date)
+    FROM borrows_history br
+    JOIN book_copies bc ON bc.copy_id = br.copy_id
+    GROUP BY bc.book_id
+"""
+
+REBUILD_MONTHLY = """
+    INSERT INTO book_borrow_monthly (book_id, month, borrows, returns, late_days)
+    SELECT book_id, month, SUM(borrows), SUM(returns), SUM(late_days)
+    FROM (
+        SELECT bc.book_id, DATE_FORMAT(br.borrow_date, '%Y-%m-01') AS month,
+               1 AS borrows, 0 AS returns, 0 AS late_days
+        FROM borrows_history br
+        JOIN book_copies bc ON bc.copy_id = br.copy_id
+        UNION ALL
+        SELECT bc.book_id, DATE_FORMAT(br.return_date, '%Y-%m-01'),
+               0, 1, GREATEST(DATEDIFF(br.return_date, br.due_date), 0)
+        FROM borrows_history br
+        JOIN book_copies bc ON bc.copy_id = br.copy_id
+        WHERE br.return_date IS NOT NULL
+    ) events
+    GROUP BY book_id, month
+"""
+
+
+def rebuild(session: Session):
+    """
+    Recomputes both rollups from the full borrows history (hot and archived)
+    in one transaction.
+    Returns the number of (book, month) rows written per table.
+    """
+    try:
+        session.execute(text("DELETE FROM book_borrow_stats"))
+        session.execute(text("DELETE FROM book_borrow_monthly"))
+        books = session.execute(text(REBUILD_BOOKS)).rowcount
+        months = session.execute(text(REBUILD_MONTHLY)).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return {"book_borrow_stats": books, "book_borrow_monthly": months}
@@ -0,0 +1,109 @@
+import os
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+# Returned borrows older than this many days move from `borrows` (hot) to
+# `borrows_archive` (cold). Active loans and anything with a fine never move.
+HOT_DAYS = int(os.getenv("LMS_BORROWS_HOT_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = 5000
+
+ARCHIVE_COLUMNS = "borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date"
+
+
+# ---------- Mover ----------
+PICK_BATCH_SQL = text("""
+    SELECT br.borrow_id
+    FROM borrows br
+    WHERE br.active = 0
+      AND br.return_date < DATE_SUB(CURDATE(), INTERVAL :days DAY)
+      AND NOT EXISTS (SELECT 1 FROM fines f WHERE f.borrow_id = br.borrow_id)
+    ORDER BY br.borrow_id
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+""")
+
+COPY_BATCH_SQL = text(f"""
+    INSERT IGNORE INTO borrows_archive ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS} FROM borrows WHERE borrow_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+DELETE_BATCH_SQL = text(
+    "DELETE FROM borrows WHERE borrow_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def archive_returned(session: Session, older_than_days: int = HOT_DAYS,
+                     batch_size: int = ARCHIVE_BATCH_SIZE, max_rows: int = None):
+    """
+    Moves returned, fine-free borrows older than `older_than_days` into
+    borrows_archive, one committed batch at a time so locks stay short and
+    the job can be interrupted and resumed. Returns the number of rows moved.
+    Rollups (user_account_stats, book_borrow_stats) are unaffected.
+    """
+    moved = 0
+    while max_rows is None or moved < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - moved)
+        try:
+            ids = [row.borrow_id for row in session.execute(
+                PICK_BATCH_SQL, {"days": older_than_days, "batch_size": limit}
+            )]
+            if not ids:
+                session.rollback()
+                break
+            session.execute(COPY_BATCH_SQL, {"ids": ids})
+            session.execute(DELETE_BATCH_SQL, {"ids": ids})
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        moved += len(ids)
+    return moved
+
+
+RESTORE_SQL = text(f"""
+    INSERT INTO borrows ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS} FROM borrows_archive WHERE borrow_id = :borrow_id
+""")
+
+
+def restore(session: Session, borrow_id: int) -> bool:
+    """
+    Moves one archived borrow back into `borrows` (e.g. before it is fined:
+    fines reference the hot table). Runs in the caller's transaction; returns
+    False when the borrow isn't archived.
+    """
+    if not session.execute(RESTORE_SQL, {"borrow_id": borrow_id}).rowcount:
+        return False
+    session.execute(text("DELETE FROM borrows_archive WHERE borrow_id = :borrow_id"), {"borrow_id": borrow_id})
+    return True
+
+
+def archived_count(session: Session, user_id: int) -> int:
+    return session.execute(
+        text("SELECT COUNT(*) FROM borrows_archive WHERE user_id = :user_id"), {"user_id": user_id}
+    ).scalar()
+
+
+def archived_borrows(session: Session, user_id: int):
+    """A user's archived loans, newest first, in the shape my_borrowed_books displays."""
+    return session.execute(text("""
+        SELECT
+            ar.borrow_id,
+            b.book_id,
+            b.title,
+            GROUP_CONCAT(DISTINCT a.full_name) AS authors,
+            bc.barcode,
+            ar.borrow_date,
+            ar.due_date,
+            ar.return_date,
+            0 AS active
+        FROM borrows_archive ar
+        LEFT JOIN book_copies bc ON ar.copy_id = bc.copy_id
+        LEFT JOIN books b ON bc.book_id = b.book_id
+        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
+        LEFT JOIN authors a ON ba.author_id = a.author_id
+        WHERE ar.user_id = :user_id
+        GROUP BY ar.borrow_id
+        ORDER BY ar.borrow_date DESC
+    """), {"user_id": user_id}).fetchall()
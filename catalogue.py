@@ -0,0 +1,223 @@
+import uuid
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+
+import catalogue_cache
+
+
+# ---------- Helpers ----------
+def parse_names(raw):
+    """
+    Splits a comma separated prompt value (or accepts a list) into unique,
+    stripped names, keeping the order they were given in.
+    """
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    names = []
+    seen = set()
+    for name in raw:
+        name = str(name).strip()
+        if name and name.casefold() not in seen:
+            seen.add(name.casefold())
+            names.append(name)
+    return names
+
+
+def multi_values(rows, columns, prefix="v"):
+    """
+    Builds a multi-row VALUES clause with uniquely named bind parameters,
+    e.g. "(:v0_book_id, :v0_author_id), (:v1_book_id, ...)".
+    """
+    groups = []
+    params = {}
+    for i, row in enumerate(rows):
+        names = []
+        for col, value in zip(columns, row):
+            key = f"{prefix}{i}_{col}"
+            params[key] = value
+            names.append(f":{key}")
+        groups.append("(" + ", ".join(names) + ")")
+    return ", ".join(groups), params
+
+
+# ---------- Name Resolution ----------
+_NAME_TABLES = {
+    "authors": ("author_id", "full_name"),
+    "categories": ("category_id", "name"),
+}
+
+
+def _select_ids(session: Session, table, names):
+    id_col, name_col = _NAME_TABLES[table]
+    query = text(f"SELECT {id_col} AS id, {name_col} AS name FROM {table} WHERE {name_col} IN :names")
+    query = query.bindparams(bindparam("names", expanding=True))
+    return {row.name.casefold(): row.id for row in session.execute(query, {"names": list(names)})}
+
+
+def resolve_names(session: Session, table, names, cache=None):
+    """
+    Maps names to ids for `authors` or `categories` with one IN lookup and a
+    single INSERT IGNORE for the missing ones. `cache` (casefolded name -> id)
+    is consulted first and filled in, so batch callers can share it.
+    """
+    cache = {} if cache is None else cache
+    names = parse_names(names)
+    missing = [n for n in names if n.casefold() not in cache]
+
+    if missing:
+        cache.update(_select_ids(session, table, missing))
+        to_insert = [n for n in missing if n.casefold() not in cache]
+        if to_insert:
+            _, name_col = _NAME_TABLES[table]
+            insert_rows(session, f"INSERT IGNORE INTO {table} ({name_col}) VALUES",
+                        ["name"], [(n,) for n in to_insert])
+            cache.update(_select_ids(session, table, to_insert))
+
+    # Collation-equal spellings (accents etc.) that casefold differently
+    for name in names:
+        if name.casefold() not in cache:
+            id_col, name_col = _NAME_TABLES[table]
+            cache[name.casefold()] = session.execute(
+                text(f"SELECT {id_col} FROM {table} WHERE {name_col} = :name"), {"name": name}
+            ).scalar()
+
+    return {name: cache[name.casefold()] for name in names}
+
+
+def resolve_authors(session: Session, names, cache=None):
+    return resolve_names(session, "authors", names, cache)
+
+
+def resolve_categories(session: Session, names, cache=None):
+    return resolve_names(session, "categories", names, cache)
+
+
+# ---------- Link Rows & Copies ----------
+INSERT_BATCH_SIZE = 1000
+
+
+def insert_rows(session: Session, statement, columns, rows, batch_size: int = INSERT_BATCH_SIZE):
+    """
+    Executes `statement` ("INSERT ... (cols) VALUES") with multi-row VALUES,
+    splitting very large row sets so a single packet stays bounded.
+    """
+    for start in range(0, len(rows), batch_size):
+        values, params = multi_values(rows[start:start + batch_size], columns)
+        session.execute(text(f"{statement} {values}"), params)
+
+
+def link_authors_bulk(session: Session, pairs):
+    """Inserts (book_id, author_id) link rows."""
+    insert_rows(session, "INSERT IGNORE INTO book_authors (book_id, author_id) VALUES",
+                ["book_id", "author_id"], list(pairs))
+
+
+def link_categories_bulk(session: Session, pairs):
+    """Inserts (book_id, category_id) link rows."""
+    insert_rows(session, "INSERT IGNORE INTO book_categories (book_id, category_id) VALUES",
+                ["book_id", "category_id"], list(pairs))
+
+
+def link_authors(session: Session, book_id, author_ids):
+    link_authors_bulk(session, [(book_id, a) for a in author_ids])
+
+
+def link_categories(session: Session, book_id, category_ids):
+    link_categories_bulk(session, [(book_id, c) for c in category_ids])
+
+
+def new_barcode():
+    return uuid.uuid4().hex
+
+
+def add_copies_bulk(session: Session, copies_per_book):
+    """Inserts available copies for many books at once ({book_id: count})."""
+    rows = [
+        (book_id, new_barcode(), True)
+        for book_id, count in copies_per_book.items()
+        for _ in range(max(int(count or 0), 0))
+    ]
+    insert_rows(session, "INSERT INTO book_copies (book_id, barcode, is_available) VALUES",
+                ["book_id", "barcode", "is_available"], rows)
+
+
+def add_copies(session: Session, book_id, count: int):
+    """Inserts `count` available copies of a book in one statement."""
+    add_copies_bulk(session, {book_id: count})
+
+
+def set_copy_count(session: Session, book_id, total: int):
+    """Adds copies or removes available ones until the book has `total` copies."""
+    existing = session.execute(
+        text("SELECT COUNT(*) FROM book_copies WHERE book_id = :book_id"), {"book_id": book_id}
+    ).scalar()
+    diff = total - existing
+    if diff > 0:
+        add_copies(session, book_id, diff)
+    elif diff < 0:
+        session.execute(text("""
+            DELETE FROM book_copies
+            WHERE book_id = :book_id AND is_available = TRUE
+            LIMIT :limit
+        """), {"book_id": book_id, "limit": -diff})
+
+
+# ---------- Catalogue Writes ----------
+def create_book(session: Session, title, authors=None, categories=None, copies: int = 0, isbn=None,
+                author_cache=None, category_cache=None):
+    """
+    Inserts a book with its author/category links and copies without
+    committing, so callers decide the transaction boundary. Returns book_id.
+    """
+    result = session.execute(
+        text("INSERT INTO books (title, isbn) VALUES (:title, :isbn)"), {"title": title, "isbn": isbn}
+    )
+    book_id = result.lastrowid
+
+    link_authors(session, book_id, list(resolve_authors(session, authors, author_cache).values()))
+    link_categories(session, book_id, list(resolve_categories(session, categories, category_cache).values()))
+    add_copies(session, book_id, copies)
+    return book_id
+
+
+def replace_book_links(session: Session, book_id, authors=None, categories=None,
+                       author_cache=None, category_cache=None):
+    """Replaces a book's authors and/or categories; None leaves that side untouched."""
+    if authors is not None or categories is not None:
+        # Link changes don't touch the books row; bump it so catalogue_cache picks them up
+        session.execute(text("UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE book_id = :book_id"),
+                        {"book_id": book_id})
+    if authors is not None:
+        session.execute(text("DELETE FROM book_authors WHERE book_id = :book_id"), {"book_id": book_id})
+        link_authors(session, book_id, list(resolve_authors(session, authors, author_cache).values()))
+    if categories is not None:
+        session.execute(text("DELETE FROM book_categories WHERE book_id = :book_id"), {"book_id": book_id})
+        link_categories(session, book_id, list(resolve_categories(session, categories, category_cache).values()))
+
+
+def add_catalogue_entry(session: Session, title, authors=None, categories=None, copies: int = 0, isbn=None):
+    """Creates a book and everything linked to it in a single transaction."""
+    try:
+        book_id = create_book(session, title, authors, categories, copies, isbn)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    catalogue_cache.record_change(session, [book_id])
+    return book_id
+
+
+def update_catalogue_entry(session: Session, book_id, authors=None, categories=None, total_copies=None):
+    """Rewrites a book's links and copy count in a single transaction."""
+    try:
+        replace_book_links(session, book_id, authors, categories)
+        if total_copies is not None:
+            set_copy_count(session, book_id, total_copies)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    catalogue_cache.record_change(session, [book_id])
@@ -0,0 +1,523 @@
+"""
+In-process copy of the catalogue (titles, authors, categories) for the menus.
+
+Titles and names are kept in UTF-8 heaps with offset arrays, and
+author/category memberships as CSR arrays: per-book offsets into a flat array
+of member ids. This fits 1M books in well under 100 MB (see
+benchmarks/catalogue_memory.py). BookRecord objects are only built for the
+rows being shown.
+
+The cache is saved to a versioned snapshot file (LMS_CATALOGUE_SNAPSHOT).
+The next process maps that file instead of querying the book tables, so
+warm start costs milliseconds whatever the catalogue size. Books changed
+after a load (or after the snapshot was written) are re-read by refresh()
+into a small overlay that is kept until the next full reload.
+"""
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+REFRESH_SECONDS = float(os.getenv("LMS_CATALOGUE_REFRESH_SECONDS", "30"))
+# Author/category renames (no updated_at) are picked up by the full reload
+FULL_RELOAD_SECONDS = float(os.getenv("LMS_CATALOGUE_RELOAD_SECONDS", "3600"))
+# Changed books kept in the overlay before the arrays are rebuilt
+COMPACT_AFTER = 10000
+# updated_at is stamped when a statement runs, not when it commits: each refresh
+# re-reads this much history so slow transactions committing later are not missed
+WATERMARK_MARGIN_SECONDS = float(os.getenv("LMS_CATALOGUE_REFRESH_MARGIN", "300"))
+# Snapshot file for warm starts ("" disables) and the age after which it is rebuilt
+SNAPSHOT_PATH = os.getenv("LMS_CATALOGUE_SNAPSHOT", "catalogue.snap")
+SNAPSHOT_MAX_AGE = float(os.getenv("LMS_CATALOGUE_SNAPSHOT_MAX_AGE", "86400"))
+SNAPSHOT_MAGIC = b"LMSCATv1"
+SNAPSHOT_VERSION = 2
+_ALIGN = 64
+
+BOOKS_SQL = text("SELECT book_id, title FROM books ORDER BY book_id")
+AUTHOR_LINKS_SQL = text("SELECT book_id, author_id FROM book_authors")
+CATEGORY_LINKS_SQL = text("SELECT book_id, category_id FROM book_categories")
+AUTHORS_SQL = text("SELECT author_id, full_name FROM authors WHERE author_id > :after ORDER BY author_id")
+CATEGORIES_SQL = text("SELECT category_id, name FROM categories WHERE category_id > :after ORDER BY category_id")
+CHANGED_BOOKS_SQL = text("SELECT book_id, title FROM books WHERE updated_at >= :since")
+DELETED_BOOKS_SQL = text("SELECT book_id FROM book_tombstones WHERE deleted_at >= :since")
+# Both are single index lookups (primary key, idx_books_updated_at)
+STATE_SQL = text("""
+    SELECT (SELECT MAX(book_id) FROM books) AS max_book_id,
+           (SELECT MAX(updated_at) FROM books) AS max_updated_at
+""")
+BOOKS_BY_ID_SQL = text("SELECT book_id, title FROM books WHERE book_id IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+CHANGED_AUTHOR_LINKS_SQL = text(
+    "SELECT book_id, author_id FROM book_authors WHERE book_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+CHANGED_CATEGORY_LINKS_SQL = text(
+    "SELECT book_id, category_id FROM book_categories WHERE book_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def _id_dtype(max_value):
+    return np.int32 if max_value < 2 ** 31 else np.int64
+
+
+def _id_array(values):
+    values = np.asarray(list(values), dtype=np.int64)
+    return values.astype(_id_dtype(values.max() if values.size else 0))
+
+
+def _heap(strings):
+    """(uint8 heap, offsets) holding `strings` back to back as UTF-8."""
+    encoded = [s.encode("utf-8") for s in strings]
+    heap = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    offsets = np.zeros(len(encoded) + 1, dtype=_id_dtype(heap.size))
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return heap, offsets
+
+
+def _since(watermark, margin=WATERMARK_MARGIN_SECONDS):
+    """`watermark` (a datetime, or text from SQLite or a snapshot header) minus `margin`, as SQL text."""
+    if not isinstance(watermark, datetime):
+        watermark = datetime.fromisoformat(str(watermark)[:19])
+    return (watermark - timedelta(seconds=margin)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _timestamp_text(value):
+    """A DATETIME from MySQL, SQLite or a snapshot header as comparable "YYYY-MM-DD HH:MM:SS" text."""
+    return "" if value is None else str(value).replace("T", " ")[:19]
+
+
+def _title_hash(title):
+    # Stable across processes (unlike hash()), so the sorted hashes can be saved
+    digest = hashlib.blake2b(title.casefold().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class BookRecord:
+    """One catalogue entry; `authors`/`categories` match the GROUP_CONCAT columns of the SQL rows."""
+    __slots__ = ("book_id", "title", "author_names", "category_names")
+
+    def __init__(self, book_id, title, author_names, category_names):
+        self.book_id = book_id
+        self.title = title
+        self.author_names = author_names
+        self.category_names = category_names
+
+    @property
+    def authors(self):
+        return ",".join(self.author_names) or None
+
+    @property
+    def categories(self):
+        return ",".join(self.category_names) or None
+
+    def __repr__(self):
+        return f"BookRecord({self.book_id}, {self.title!r})"
+
+
+class _Names:
+    """id -> name for authors or categories: a sorted id array and a name heap."""
+
+    def __init__(self, ids, heap, offsets):
+        self.ids, self.heap, self.offsets = ids, heap, offsets
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls(_id_array(r[0] for r in rows), *_heap(r[1] for r in rows))
+
+    def extend(self, rows):
+        rows = list(rows)
+        if rows:
+            names = [self.name_at(p) for p in range(self.ids.size)] + [r[1] for r in rows]
+            self.ids = _id_array(self.ids.tolist() + [r[0] for r in rows])
+            self.heap, self.offsets = _heap(names)
+
+    @property
+    def max_id(self):
+        return int(self.ids[-1]) if self.ids.size else 0
+
+    def name_at(self, p):
+        return self.heap[self.offsets[p]:self.offsets[p + 1]].tobytes().decode("utf-8")
+
+    def lookup(self, ids):
+        ids = np.asarray(ids, dtype=self.ids.dtype)
+        positions = np.searchsorted(self.ids, ids)
+        return sorted(
+            self.name_at(p) for p, i in zip(positions, ids) if p < self.ids.size and self.ids[p] == i
+        )
+
+    def arrays(self, prefix):
+        return {f"{prefix}_ids": self.ids, f"{prefix}_heap": self.heap, f"{prefix}_offsets": self.offsets}
+
+
+def _csr(book_ids, links):
+    """(offsets, members) for `links` (book_id, member_id) pairs, rows aligned with `book_ids`."""
+    pairs = np.asarray(list(links), dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[np.isin(pairs[:, 0], book_ids)]
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    counts = np.bincount(np.searchsorted(book_ids, pairs[:, 0]), minlength=len(book_ids))
+    offsets = np.zeros(len(book_ids) + 1, dtype=_id_dtype(len(pairs)))
+    np.cumsum(counts, out=offsets[1:])
+    members = pairs[:, 1].astype(_id_dtype(pairs[:, 1].max() if len(pairs) else 0))
+    return offsets, members
+
+
+class CatalogueCache:
+    BOOK_ARRAYS = ("book_ids", "titles", "title_offsets", "title_order", "title_hashes",
+                   "author_offsets", "author_members", "category_offsets", "category_members")
+
+    def __init__(self, arrays, watermark=None):
+        self.arrays = arrays
+        self.book_ids = arrays["book_ids"]
+        self._titles, self._title_offsets = arrays["titles"], arrays["title_offsets"]
+        self._title_order, self._title_hashes = arrays["title_order"], arrays["title_hashes"]
+        self._author_offsets, self._author_members = arrays["author_offsets"], arrays["author_members"]
+        self._category_offsets, self._category_members = arrays["category_offsets"], arrays["category_members"]
+        self.authors = _Names(*(arrays[f"author_name_{k}"] for k in ("ids", "heap", "offsets")))
+        self.categories = _Names(*(arrays[f"category_name_{k}"] for k in ("ids", "heap", "offsets")))
+        # book_id -> (title, author ids, category ids) for books changed since the load; None = deleted
+        self._changed = {}
+        # The arrays are current as of base_watermark; refresh() moves watermark on
+        self.base_watermark = self.watermark = watermark
+        self.loaded_at = self.refreshed_at = time.monotonic()
+
+    # ---------- Loading ----------
+    @classmethod
+    def from_rows(cls, books, author_links, category_links, authors, categories, watermark=None):
+        books = list(books)
+        book_ids = _id_array(b[0] for b in books)
+        titles, title_offsets = _heap(b[1] for b in books)
+        # Title lookup: sorted title hashes (no per-title dict entries)
+        hashes = np.fromiter((_title_hash(b[1]) for b in books), dtype=np.int64, count=len(books))
+        title_order = np.argsort(hashes, kind="stable").astype(_id_dtype(len(books)))
+        author_offsets, author_members = _csr(book_ids, author_links)
+        category_offsets, category_members = _csr(book_ids, category_links)
+        arrays = {
+            "book_ids": book_ids, "titles": titles, "title_offsets": title_offsets,
+            "title_order": title_order, "title_hashes": hashes[title_order],
+            "author_offsets": author_offsets, "author_members": author_members,
+            "category_offsets": category_offsets, "category_members": category_members,
+        }
+        arrays.update(_Names.from_rows(authors).arrays("author_name"))
+        arrays.update(_Names.from_rows(categories).arrays("category_name"))
+        return cls(arrays, watermark)
+
+    @classmethod
+    def load(cls, session: Session):
+        """Builds the cache from the database."""
+        watermark = session.execute(text("SELECT CURRENT_TIMESTAMP")).scalar()
+        return cls.from_rows(
+            session.execute(BOOKS_SQL),
+            session.execute(AUTHOR_LINKS_SQL),
+            session.execute(CATEGORY_LINKS_SQL),
+            session.execute(AUTHORS_SQL, {"after": 0}),
+            session.execute(CATEGORIES_SQL, {"after": 0}),
+            watermark,
+        )
+
+    def refresh(self, session: Session):
+        """
+        Re-reads books whose updated_at is at or after the last refresh (less
+        WATERMARK_MARGIN_SECONDS), plus new authors/categories, and drops books
+        deleted since then (book_tombstones, filled by a trigger). Returns the
+        number of changed books (-1 when a full reload is needed).
+        """
+        watermark = session.execute(text("SELECT CURRENT_TIMESTAMP")).scalar()
+        since = _since(self.watermark)
+        changed = session.execute(CHANGED_BOOKS_SQL, {"since": since}).fetchall()
+        deleted = {r.book_id for r in session.execute(DELETED_BOOKS_SQL, {"since": since})}
+        if len(self._changed.keys() | {r.book_id for r in changed} | deleted) > COMPACT_AFTER:
+            return -1
+        self.authors.extend(session.execute(AUTHORS_SQL, {"after": self.authors.max_id}))
+        self.categories.extend(session.execute(CATEGORIES_SQL, {"after": self.categories.max_id}))
+        self._overlay(session, changed)
+        for book_id in deleted:
+            self._changed[book_id] = None
+        self.watermark = watermark
+        self.refreshed_at = time.monotonic()
+        return len(changed) + len(deleted)
+
+    def reread(self, session: Session, book_ids):
+        """Re-reads the given books now (a write in this process); ids no longer in `books` are dropped."""
+        book_ids = {int(b) for b in book_ids}
+        self.authors.extend(session.execute(AUTHORS_SQL, {"after": self.authors.max_id}))
+        self.categories.extend(session.execute(CATEGORIES_SQL, {"after": self.categories.max_id}))
+        rows = session.execute(BOOKS_BY_ID_SQL, {"ids": list(book_ids)}).fetchall() if book_ids else []
+        self._overlay(session, rows)
+        for book_id in book_ids - {r.book_id for r in rows}:
+            self._changed[book_id] = None
+
+    def _overlay(self, session: Session, rows):
+        """Puts (book_id, title) rows with their current links into the overlay."""
+        if not rows:
+            return
+        ids = [r.book_id for r in rows]
+        author_ids, category_ids = {i: [] for i in ids}, {i: [] for i in ids}
+        for book_id, author_id in session.execute(CHANGED_AUTHOR_LINKS_SQL, {"ids": ids}):
+            author_ids[book_id].append(author_id)
+        for book_id, category_id in session.execute(CHANGED_CATEGORY_LINKS_SQL, {"ids": ids}):
+            category_ids[book_id].append(category_id)
+        for r in rows:
+            self._changed[r.book_id] = (r.title, tuple(author_ids[r.book_id]), tuple(category_ids[r.book_id]))
+
+    # ---------- Snapshot File ----------
+    def save(self, path, stamp: str, state: dict):
+        """
+        Writes the arrays to `path` (atomically): magic, header length, JSON
+        header, then each array at a 64-byte aligned offset. Books in the
+        overlay are left out, and the snapshot keeps the watermark of the
+        load, so the next refresh() picks them up again. `state` is the
+        catalogue_state() taken before the load.
+        """
+        path = Path(path)
+        layout, offset = {}, 0
+        for name, array in self.arrays_for_save().items():
+            layout[name] = {"dtype": array.dtype.str, "count": int(array.size), "offset": offset}
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = {"version": SNAPSHOT_VERSION, "stamp": stamp, "state": state,
+                  "watermark": str(self.base_watermark),
+                  "created": datetime.now().isoformat(timespec="seconds"), "arrays": layout}
+        encoded = json.dumps(header).encode("utf-8")
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(encoded)) // _ALIGN) * _ALIGN
+        # A private staging file per writer: every process may rebuild the snapshot
+        fd, staging = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + len(encoded).to_bytes(8, "little") + encoded)
+                for name, array in self.arrays_for_save().items():
+                    f.seek(data_start + layout[name]["offset"])
+                    f.write(np.ascontiguousarray(array).tobytes())
+                f.truncate(data_start + offset)
+            os.chmod(staging, 0o644)
+            os.replace(staging, path)
+        except BaseException:
+            os.unlink(staging)
+            raise
+        return data_start + offset
+
+    def arrays_for_save(self):
+        # Name tables may have grown in refresh(); the book arrays never change
+        arrays = {name: self.arrays[name] for name in self.BOOK_ARRAYS}
+        arrays.update(self.authors.arrays("author_name"))
+        arrays.update(self.categories.arrays("category_name"))
+        return arrays
+
+    @classmethod
+    def open(cls, path, stamp: str, state: dict, max_age: float = SNAPSHOT_MAX_AGE):
+        """
+        Maps a snapshot written by save() without copying it. Returns None
+        when the file is missing, from another format version or database
+        (`stamp`), older than `max_age` seconds, or ahead of the database's
+        current `state` (restored or re-seeded since). A snapshot the
+        database has only moved on from is returned; refresh() catches it up.
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return None
+                header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+                data_start = f.tell()
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        age = (datetime.now() - datetime.fromisoformat(header["created"])).total_seconds()
+        if header["version"] != SNAPSHOT_VERSION or header["stamp"] != stamp or age > max_age:
+            return None
+        saved = header["state"]
+        if (state["max_book_id"] < saved["max_book_id"]
+                or state["max_updated_at"] < saved["max_updated_at"]):
+            return None
+        data_start = -(-data_start // _ALIGN) * _ALIGN
+        arrays = {
+            name: np.frombuffer(buffer, dtype=meta["dtype"], count=meta["count"], offset=data_start + meta["offset"])
+            for name, meta in header["arrays"].items()
+        }
+        return cls(arrays, header["watermark"])
+
+    # ---------- Lookups ----------
+    def __len__(self):
+        base = len(self.book_ids) - sum(1 for b in self._changed if self._position(b) is not None)
+        return base + sum(1 for entry in self._changed.values() if entry is not None)
+
+    def _position(self, book_id):
+        # Search with the array's own dtype; a mismatched key makes numpy copy the whole array
+        p = int(np.searchsorted(self.book_ids, self.book_ids.dtype.type(book_id)))
+        return p if p < len(self.book_ids) and self.book_ids[p] == book_id else None
+
+    def _title_at(self, p):
+        return self._titles[self._title_offsets[p]:self._title_offsets[p + 1]].tobytes().decode("utf-8")
+
+    def _entry(self, book_id):
+        """(title, author ids, category ids) for a book, or None if it isn't in the catalogue."""
+        if book_id in self._changed:
+            return self._changed[book_id]
+        p = self._position(book_id)
+        if p is None:
+            return None
+        return (
+            self._title_at(p),
+            self._author_members[self._author_offsets[p]:self._author_offsets[p + 1]],
+            self._category_members[self._category_offsets[p]:self._category_offsets[p + 1]],
+        )
+
+    def get(self, book_id):
+        book_id = int(book_id)
+        entry = self._entry(book_id)
+        if entry is None:
+            return None
+        title, author_ids, category_ids = entry
+        return BookRecord(book_id, title, self.authors.lookup(author_ids), self.categories.lookup(category_ids))
+
+    def category_ids(self, book_id):
+        """Category ids of a book ([] if it isn't in the catalogue)."""
+        entry = self._entry(int(book_id))
+        return [] if entry is None else [int(c) for c in entry[2]]
+
+    def books(self, book_ids):
+        """BookRecords for `book_ids` in the given order, skipping unknown ids."""
+        return [record for record in map(self.get, book_ids) if record is not None]
+
+    def ids_by_title(self, title):
+        """Ids of the books titled `title` (case-insensitive)."""
+        key, h = title.casefold(), _title_hash(title)
+        lo = np.searchsorted(self._title_hashes, h, side="left")
+        hi = np.searchsorted(self._title_hashes, h, side="right")
+        ids = [
+            int(self.book_ids[p]) for p in self._title_order[lo:hi].tolist()
+            if self._title_at(p).casefold() == key and int(self.book_ids[p]) not in self._changed
+        ]
+        ids += [b for b, entry in self._changed.items() if entry is not None and entry[0].casefold() == key]
+        return sorted(ids)
+
+    def similar(self, book_ids, limit: int = 3):
+        """Books sharing an author or category with `book_ids` (excluding them), lowest ids first."""
+        shown = {int(b) for b in book_ids}
+        author_ids, category_ids = set(), set()
+        for book_id in shown:
+            entry = self._entry(book_id)
+            if entry is not None:
+                author_ids.update(int(a) for a in entry[1])
+                category_ids.update(int(c) for c in entry[2])
+        if not author_ids and not category_ids:
+            return []
+
+        hit = np.zeros(len(self.book_ids), dtype=bool)
+        for ids, offsets, members in ((author_ids, self._author_offsets, self._author_members),
+                                      (category_ids, self._category_offsets, self._category_members)):
+            if ids:
+                matches = np.flatnonzero(np.isin(members, list(ids)))
+                hit[np.searchsorted(offsets, matches.astype(offsets.dtype), side="right") - 1] = True
+        excluded = [p for p in map(self._position, shown | set(self._changed)) if p is not None]
+        hit[excluded] = False
+        candidates = self.book_ids[np.flatnonzero(hit)[:limit]].tolist()
+        candidates += [
+            b for b, entry in self._changed.items()
+            if entry is not None and b not in shown
+            and (author_ids.intersection(entry[1]) or category_ids.intersection(entry[2]))
+        ]
+        return self.books(sorted(candidates)[:limit])
+
+    def memory_bytes(self):
+        return sum(a.nbytes for a in self.arrays_for_save().values())
+
+
+# ---------- Shared Instance ----------
+_cache = None
+_lock = threading.Lock()
+
+
+def database_stamp():
+    """Identifies the database a snapshot was built from: its URL without the password."""
+    from sqlalchemy.engine import make_url
+    from db import DATABASE_URL
+
+    url = make_url(DATABASE_URL).render_as_string(hide_password=True)
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def catalogue_state(session: Session):
+    """
+    The newest book id and updated_at. Both only grow while the catalogue is
+    written to; a snapshot saved with higher values than the database has now
+    belongs to a database that was restored or re-seeded at the same URL.
+    """
+    row = session.execute(STATE_SQL).one()
+    return {"max_book_id": int(row.max_book_id or 0), "max_updated_at": _timestamp_text(row.max_updated_at)}
+
+
+def _reload(session: Session):
+    # State before loading: a write in between only makes the snapshot look older than it is
+    state = catalogue_state(session)
+    cache = CatalogueCache.load(session)
+    if SNAPSHOT_PATH:
+        try:
+            cache.save(SNAPSHOT_PATH, database_stamp(), state)
+        except OSError:
+            pass  # a read-only working directory only costs the warm start
+    return cache
+
+
+def get_cache(session: Session) -> CatalogueCache:
+    """
+    Returns the process-wide cache. On first use it maps the snapshot file
+    when there is a valid one, else loads from the database (and writes the
+    snapshot). It is refreshed when older than REFRESH_SECONDS and fully
+    reloaded every FULL_RELOAD_SECONDS, or sooner when the overlay outgrows
+    COMPACT_AFTER.
+    """
+    global _cache
+    with _lock:
+        now = time.monotonic()
+        if _cache is None and SNAPSHOT_PATH:
+            _cache = CatalogueCache.open(SNAPSHOT_PATH, database_stamp(), catalogue_state(session))
+            if _cache is not None and _cache.refresh(session) < 0:
+                _cache = None
+        if _cache is None or now - _cache.loaded_at > FULL_RELOAD_SECONDS:
+            _cache = _reload(session)
+        elif now - _cache.refreshed_at > REFRESH_SECONDS and _cache.refresh(session) < 0:
+            _cache = _reload(session)
+        return _cache
+
+
+def write_snapshot(session: Session, path=None):
+    """Rebuilds the cache from the database and saves it; returns {books, bytes, seconds}."""
+    global _cache
+    started = time.perf_counter()
+    state = catalogue_state(session)
+    cache = CatalogueCache.load(session)
+    size = cache.save(path or SNAPSHOT_PATH, database_stamp(), state)
+    with _lock:
+        _cache = cache
+    return {"books": len(cache), "bytes": size, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def record_change(session: Session, book_ids):
+    """
+    Re-reads books this process just added, edited or deleted (after the
+    commit), so its menus show them at once. Other processes see the change
+    at their next refresh.
+    """
+    global _cache
+    book_ids = [int(b) for b in book_ids]
+    with _lock:
+        if _cache is None:
+            return
+        if len(_cache._changed.keys() | set(book_ids)) > COMPACT_AFTER:
+            _cache = None
+        else:
+            _cache.reread(session, book_ids)
+
+
+def invalidate():
+    """Drops the shared cache; the next get_cache() reloads it."""
+    global _cache
+    with _lock:
+        _cache = None
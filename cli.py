@@ -1,16 +1,23 @@
+import json
+from pathlib import Path
+from typing import List
+
 import typer
 from rich.console import Console
-from db import SessionLocal
-from auth import librarian_login, student_login
-from librarian import librarian_menu
-from student import student_menu
+from db import SessionLocal, ReadSessionLocal
+
+# Menu modules (SQLAlchemy, rich tables, recommenders...) are imported inside
+# the commands that need them to keep startup fast; see benchmarks/importtime.py.
 
 app = typer.Typer()
 console = Console()
 
-@app.command()
-def main():
-    session = SessionLocal()
+@app.callback(invoke_without_command=True)
+def main(ctx: typer.Context):
+    if ctx.invoked_subcommand is not None:
+        return
+
+    session = None
     while True:
         console.print("""
 ===================================
@@ -24,10 +31,20 @@ def main():
         choice = typer.prompt("Enter your choice")
 
         if choice == "1":
+            from auth import librarian_login
+            from librarian import librarian_menu
+
+            if session is None:
+                session = SessionLocal()
             if librarian_login(session):
                 librarian_menu(session)
 
         elif choice == "2":
+            from auth import student_login
+            from student import student_menu
+
+            if session is None:
+                session = SessionLocal()
             user_id = student_login(session)
             if user_id:
                 student_menu(user_id,session)
@@ -39,7 +56,312 @@ def main():
         else:
             console.print("[red]Invalid choice, try again[/red]")
 
-    session.close()
+    if session is not None:
+        session.close()
+
+
+# ---------- Non-interactive Subcommands ----------
+def emit(payload, exit_code: int = 0):
+    """Prints a JSON document on stdout (one per invocation) for scripts and load generators."""
+    typer.echo(json.dumps(payload, default=str))
+    if exit_code:
+        raise typer.Exit(exit_code)
+
+
+def rows_to_dicts(rows):
+    return [dict(row._mapping) for row in rows]
+
+
+@app.command()
+def search(
+    term: str = typer.Argument(..., help="Search term"),
+    by: str = typer.Option("title", "--by", help="title, author or category"),
+    copies: bool = typer.Option(False, "--copies", help="Include total/available copy counts"),
+):
+    """Search the catalogue and print matching books as JSON."""
+    from student import find_books
+
+    with ReadSessionLocal() as session:
+        try:
+            rows = find_books(session, by, term, with_copies=copies)
+        except ValueError as e:
+            emit({"error": str(e)}, exit_code=2)
+        emit({"by": by, "term": term, "results": rows_to_dicts(rows)})
+
+
+@app.command()
+def issue(
+    user_id: int = typer.Argument(..., help="Borrowing user's ID"),
+    book_id: int = typer.Argument(..., help="Book to lend"),
+    librarian_id: int = typer.Option(None, "--librarian-id", help="Issuing librarian"),
+):
+    """Issue an available copy of a book to a user."""
+    from student import borrow_book
+
+    with SessionLocal() as session:
+        borrow = borrow_book(session, user_id, book_id, librarian_id)
+    if borrow is None:
+        emit({"error": "no available copy", "book_id": book_id}, exit_code=1)
+    emit(borrow)
+
+
+@app.command("return")
+def return_cmd(
+    borrow_id: int = typer.Argument(..., help="Borrow to close"),
+    user_id: int = typer.Option(None, "--user-id", help="Only return if the borrow belongs to this user"),
+):
+    """Return a borrowed copy."""
+    from student import return_borrow
+
+    with SessionLocal() as session:
+        borrow = return_borrow(session, borrow_id, user_id)
+    if borrow is None:
+        emit({"error": "no such active borrow", "borrow_id": borrow_id}, exit_code=1)
+    emit(borrow)
+
+
+@app.command()
+def report(report_id: str = typer.Argument(..., help="Report number as listed in the Library Analytics menu")):
+    """Run one of the library reports and print its rows as JSON."""
+    from librarian import REPORTS, run_report
+
+    if report_id not in REPORTS:
+        emit({"error": f"unknown report '{report_id}'", "reports": sorted(REPORTS, key=int)}, exit_code=2)
+    with ReadSessionLocal() as session:
+        rows = run_report(session, report_id)
+    emit({"report": report_id, "title": REPORTS[report_id]["title"], "rows": rows_to_dicts(rows)})
+
+
+@app.command("import")
+def import_feed(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, help="CSV or JSONL catalogue feed"),
+    format: str = typer.Option(None, "--format", "-f", help="csv or jsonl (default: from file extension)"),
+    chunk_size: int = typer.Option(500, "--chunk-size", help="Books written per transaction"),
+    as_json: bool = typer.Option(False, "--json", help="Print only the final stats as JSON"),
+):
+    """Bulk-import a catalogue feed (title, isbn, authors, categories, copies)."""
+    from importer import import_catalogue
+
+    with SessionLocal() as session:
+        stats = import_catalogue(session, path, format, chunk_size, quiet=as_json)
+    if as_json:
+        emit(stats)
+        return
+    console.print(
+        f"[green]Imported {stats['inserted']:,} books[/green] "
+        f"({stats['duplicates']:,} duplicates, {stats['invalid']:,} invalid) in {stats['seconds']}s"
+    )
+
+
+@app.command("recompute-predictions")
+def recompute_predictions_cmd(
+    output_csv: str = typer.Option("borrow_predictions.csv", "--output-csv", help="Where to write predictions"),
+    horizon: int = typer.Option(8, "--horizon", min=1, help="Weeks to forecast (fewer than the 156 weeks of history)"),
+):
+    """Refit the weekly demand forecast and rewrite its predictions."""
+    from prediction import recompute_predictions
+
+    try:
+        emit(recompute_predictions(output_csv=output_csv, horizon=horizon))
+    except ValueError as e:
+        emit({"error": str(e)}, exit_code=2)
+
+
+@app.command("purchase-suggestions")
+def purchase_suggestions_cmd(
+    limit: int = typer.Option(20, "--limit", help="Titles to list"),
+):
+    """List titles whose forecast demand needs more copies (run recompute-predictions first)."""
+    import prediction
+
+    with ReadSessionLocal() as session:
+        emit({"suggestions": [
+            {"book_id": book_id, "copies": copies, "weekly_demand": demand, "buy": extra}
+            for book_id, copies, demand, extra in prediction.purchase_suggestions(session, limit=limit)
+        ]})
+
+
+@app.command("rebuild-account-stats")
+def rebuild_account_stats_cmd(
+    user_id: int = typer.Option(None, "--user-id", help="Rebuild a single user's counters"),
+):
+    """Recompute user_account_stats from the borrows/fines history."""
+    from account_stats import rebuild
+
+    with SessionLocal() as session:
+        emit({"rows": rebuild(session, user_id)})
+
+
+@app.command("rebuild-book-stats")
+def rebuild_book_stats_cmd():
+    """Recompute the book_borrow_stats / book_borrow_monthly rollups from borrows (reconciles unique_borrowers)."""
+    from book_stats import rebuild
+
+    with SessionLocal() as session:
+        emit(rebuild(session))
+
+
+@app.command()
+def trending(
+    limit: int = typer.Option(10, "--limit", help="Books (and categories) to list"),
+):
+    """Print the trending books and categories (time-decayed borrow counts) as JSON."""
+    import trending as trending_engine
+
+    with ReadSessionLocal() as session:
+        emit({
+            "half_life_days": trending_engine.HALF_LIFE_DAYS,
+            "books": [{"book_id": book.book_id, "title": book.title, "score": round(score, 2)}
+                      for book, score in trending_engine.trending_books(session, limit)],
+            "categories": [{"category": name, "score": round(score, 2)}
+                           for name, score in trending_engine.trending_categories(session, limit)],
+        })
+
+
+@app.command()
+def export(
+    source: str = typer.Argument(..., help="Report number (or report:<n>) or table name, e.g. fines"),
+    output: str = typer.Argument(..., help="Output file (.csv or .parquet), or - for CSV on stdout"),
+    format: str = typer.Option(None, "--format", "-f", help="csv or parquet (default: from extension)"),
+    chunk_size: int = typer.Option(10000, "--chunk-size", help="Rows fetched and written per chunk"),
+):
+    """Stream a report or table to CSV/Parquet with constant memory."""
+    from exporter import export as run_export
+
+    try:
+        stats = run_export(source, output, format, chunk_size)
+    except (ValueError, RuntimeError) as e:
+        emit({"error": str(e)}, exit_code=2)
+    if output != "-":
+        emit(stats)
+
+
+@app.command("archive-borrows")
+def archive_borrows_cmd(
+    older_than_days: int = typer.Option(None, "--older-than-days", help="Archive loans returned before this many days ago"),
+    batch_size: int = typer.Option(5000, "--batch-size", help="Rows moved per transaction"),
+    max_rows: int = typer.Option(None, "--max-rows", help="Stop after moving this many rows"),
+):
+    """Move old returned, fine-free borrows into borrows_archive."""
+    import borrow_archive
+
+    days = borrow_archive.HOT_DAYS if older_than_days is None else older_than_days
+    with SessionLocal() as session:
+        moved = borrow_archive.archive_returned(session, days, batch_size, max_rows)
+    emit({"moved": moved, "older_than_days": days})
+
+
+@app.command("snapshot-reports")
+def snapshot_reports_cmd(
+    report_ids: List[str] = typer.Argument(None, help="Reports to refresh (default: all snapshot reports)"),
+    schedule: bool = typer.Option(False, "--schedule", help="Keep running and refresh daily"),
+    at: str = typer.Option(None, "--at", help="Daily refresh time HH:MM (with --schedule)"),
+):
+    """Materialize the heavy library reports so the menu can serve them instantly."""
+    import report_snapshots
+
+    if schedule:
+        report_snapshots.run_scheduler(at or report_snapshots.SNAPSHOT_TIME)
+        return
+    unknown = [r for r in report_ids or [] if r not in report_snapshots.SNAPSHOT_REPORTS]
+    if unknown:
+        emit({"error": f"not a snapshot report: {', '.join(unknown)}",
+              "reports": list(report_snapshots.SNAPSHOT_REPORTS)}, exit_code=2)
+    durations = report_snapshots.refresh(report_ids or report_snapshots.SNAPSHOT_REPORTS, quiet=True)
+    emit({"refreshed": durations})
+
+
+@app.command("catalogue-snapshot")
+def catalogue_snapshot_cmd(
+    path: str = typer.Option(None, "--path", help="Snapshot file (default: LMS_CATALOGUE_SNAPSHOT)"),
+):
+    """Rebuild the catalogue cache snapshot that the menus map at startup."""
+    import catalogue_cache
+
+    with ReadSessionLocal() as session:
+        emit(catalogue_cache.write_snapshot(session, path))
+
+
+@app.command("train-recommender")
+def train_recommender_cmd(
+    factors: int = typer.Option(None, "--factors", help="Latent factors per user/book (default: LMS_RECOMMENDER_FACTORS)"),
+    iterations: int = typer.Option(None, "--iterations", help="ALS sweeps"),
+):
+    """Retrain the "Recommended for you" factors from borrows and reviews."""
+    import recommender
+
+    with ReadSessionLocal() as session:
+        emit(recommender.train(session, factors=factors or recommender.FACTORS,
+                               iterations=iterations or recommender.ITERATIONS))
+
+
+@app.command("analytics-snapshot")
+def analytics_snapshot_cmd(
+    schedule: bool = typer.Option(False, "--schedule", help="Keep running and rebuild daily"),
+    at: str = typer.Option(None, "--at", help="Daily rebuild time HH:MM (with --schedule)"),
+):
+    """Copy the analytics tables into the local DuckDB store (LMS_ANALYTICS_DB)."""
+    import analytics_store
+
+    if schedule:
+        analytics_store.run_scheduler(at or analytics_store.ANALYTICS_SNAPSHOT_TIME)
+        return
+    try:
+        emit(analytics_store.snapshot(quiet=True))
+    except RuntimeError as e:
+        emit({"error": str(e)}, exit_code=2)
+
+
+@app.command("analytics-parity")
+def analytics_parity_cmd(
+    fresh: bool = typer.Option(True, "--fresh/--no-fresh", help="Take a new snapshot before comparing"),
+):
+    """Run every analytics query on the database and the DuckDB store and compare the rows."""
+    import analytics_store
+
+    try:
+        if fresh:
+            analytics_store.snapshot(quiet=True)
+        analytics = analytics_store.AnalyticsSession()
+    except RuntimeError as e:
+        emit({"error": str(e)}, exit_code=2)
+    try:
+        with ReadSessionLocal() as session:
+            results = analytics_store.parity(session, analytics)
+    finally:
+        analytics.close()
+    mismatched = [name for name, _, _, matches in results if not matches]
+    emit({
+        "taken_at": analytics.taken_at,
+        "checked": len(results),
+        "mismatched": mismatched,
+        "queries": {name: {"database_rows": db_rows, "store_rows": store_rows, "matches": matches}
+                    for name, db_rows, store_rows, matches in results},
+    }, exit_code=1 if mismatched else 0)
+
+
+@app.command("init-db")
+def init_db():
+    """Create the tables in a local SQLite database (DATABASE_URL=sqlite:///lms.db)."""
+    import sql_dialect
+    from db import DATABASE_URL, get_engine
+
+    if not sql_dialect.is_sqlite(DATABASE_URL):
+        emit({"error": "init-db only manages SQLite databases; load schema.sql into MySQL instead"}, exit_code=2)
+    sql_dialect.init_sqlite(get_engine())
+    emit({"initialized": DATABASE_URL})
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to bind"),
+    port: int = typer.Option(8080, "--port", help="Port to listen on"),
+    max_in_flight: int = typer.Option(None, "--max-in-flight", help="Concurrent requests before answering 503"),
+):
+    """Serve search/issue/return/account/report over HTTP for branch-desk terminals."""
+    import server
+
+    server.serve(host, port, max_in_flight or server.MAX_IN_FLIGHT)
 
 
 if __name__ == "__main__":
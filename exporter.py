@@ -0,0 +1,180 @@
+import csv
+import sys
+import time
+
+from sqlalchemy import text
+
+# Tables that may be exported, with their columns ("*" for all). Users are
+# listed explicitly so password hashes never leave the database.
+EXPORT_TABLES = {
+    "books": "*",
+    "book_copies": "*",
+    "authors": "*",
+    "book_authors": "*",
+    "categories": "*",
+    "book_categories": "*",
+    "borrows": "borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date",
+    "borrows_archive": "*",
+    "borrows_history": "*",
+    "fines": "*",
+    "reviews": "*",
+    "reservations": "*",
+    "users": "user_id, full_name, username, email, phone, membership_type_id, membership_date, status",
+    "user_account_stats": "*",
+    "book_borrow_stats": "*",
+    "book_borrow_monthly": "*",
+}
+EXPORT_FORMATS = ("csv", "parquet")
+CHUNK_SIZE = 10000
+
+
+def source_sql(source: str):
+    """
+    Resolves an export source to (name, SQL): 'report:<id>' (or a bare report
+    number) runs a library report, anything else must be in EXPORT_TABLES.
+    """
+    from librarian import REPORTS
+
+    report_id = source.split(":", 1)[1] if source.startswith("report:") else source
+    if report_id in REPORTS:
+        return f"report_{report_id}", REPORTS[report_id]["sql"]
+    if source in EXPORT_TABLES:
+        return source, f"SELECT {EXPORT_TABLES[source]} FROM {source}"
+    raise ValueError(
+        f"Unknown export source '{source}' "
+        f"(reports: {', '.join(sorted(REPORTS, key=int))}; tables: {', '.join(EXPORT_TABLES)})"
+    )
+
+
+def detect_export_format(path: str, fmt: str = None) -> str:
+    fmt = (fmt or ("parquet" if str(path).endswith(".parquet") else "csv")).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (use csv or parquet)")
+    return fmt
+
+
+def stream_chunks(sql: str, chunk_size: int = CHUNK_SIZE, engine=None):
+    """
+    Runs `sql` on a server-side cursor (read replica when configured) and
+    yields (column names, list of row tuples) chunks; memory stays at one chunk.
+    A query without rows yields one empty chunk, so writers still see the columns.
+    """
+    if engine is None:
+        engine = _read_engine()
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(text(sql))
+        columns = list(result.keys())
+        empty = True
+        for partition in result.partitions(chunk_size):
+            empty = False
+            yield columns, partition
+        if empty:
+            yield columns, []
+
+
+def _read_engine():
+    from db import get_read_engine
+    return get_read_engine()
+
+
+def table_types(table: str, engine=None):
+    """{column: Python type} reflected from an exportable table; None for columns SQLAlchemy can't map."""
+    from sqlalchemy import inspect
+
+    types = {}
+    for column in inspect(engine or _read_engine()).get_columns(table):
+        try:
+            types[column["name"]] = column["type"].python_type
+        except NotImplementedError:
+            types[column["name"]] = None
+    return types
+
+
+# ---------- Writers ----------
+def write_csv(chunks, out):
+    rows = 0
+    writer = csv.writer(out)
+    header_written = False
+    for columns, partition in chunks:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(partition)
+        rows += len(partition)
+    return rows
+
+
+def _arrow_type(pa, python_type):
+    import datetime
+    import decimal
+
+    return {
+        bool: pa.bool_(), int: pa.int64(), float: pa.float64(), decimal.Decimal: pa.float64(),
+        datetime.date: pa.date32(), datetime.datetime: pa.timestamp("us"),
+    }.get(python_type, pa.string())
+
+
+def write_parquet(chunks, path, declared_types=None):
+    """
+    Writes each chunk as an Arrow record batch; the schema comes from the
+    first chunk. When the source has no rows, columns typed in
+    `declared_types` ({name: Python type}) keep that type and the rest are text.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    rows = 0
+    writer = None
+    schema = None
+    as_text = set()
+    try:
+        for columns, partition in chunks:
+            data = {name: [row[i] for row in partition] for i, name in enumerate(columns)}
+            if schema is None and not partition:
+                declared = declared_types or {}
+                schema = pa.schema([pa.field(name, _arrow_type(pa, declared.get(name))) for name in columns])
+                writer = pq.ParquetWriter(path, schema)
+            if schema is None:
+                inferred = pa.RecordBatch.from_pydict(data).schema
+                # Columns that were all NULL in the first chunk have no usable type; store them as text
+                as_text = {f.name for f in inferred if pa.types.is_null(f.type)}
+                schema = pa.schema([pa.field(f.name, pa.string()) if f.name in as_text else f for f in inferred])
+                writer = pq.ParquetWriter(path, schema)
+            for name in as_text:
+                data[name] = [None if v is None else str(v) for v in data[name]]
+            writer.write_batch(pa.RecordBatch.from_pydict(data, schema=schema))
+            rows += len(partition)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export(source: str, path: str, fmt: str = None, chunk_size: int = CHUNK_SIZE, engine=None):
+    """
+    Streams a report or table to CSV ('-' for stdout) or Parquet.
+    Returns {source, format, path, rows, seconds}.
+    """
+    name, sql = source_sql(source)
+    fmt = detect_export_format(path, fmt)
+    started = time.perf_counter()
+    engine = engine or _read_engine()
+    chunks = stream_chunks(sql, chunk_size, engine)
+
+    if fmt == "parquet":
+        if path == "-":
+            raise ValueError("Parquet export needs a file path")
+        # Reports have no declared schema; an empty report is written as text columns
+        declared = table_types(source, engine) if source in EXPORT_TABLES else None
+        rows = write_parquet(chunks, path, declared)
+    elif path == "-":
+        rows = write_csv(chunks, sys.stdout)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            rows = write_csv(chunks, out)
+
+    return {"source": name, "format": fmt, "path": path, "rows": rows,
+            "seconds": round(time.perf_counter() - started, 2)}
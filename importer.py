@@ -0,0 +1,240 @@
+import csv
+import json
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from rich.console import Console
+
+import catalogue
+import catalogue_cache
+
+console = Console()
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+# ---------- Feed Reading ----------
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt.lower()
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix in (".csv", ".tsv"):
+        return "csv"
+    raise ValueError(f"Cannot tell the feed format of '{path}', pass --format csv|jsonl")
+
+
+def read_feed(path, fmt=None):
+    """Yields raw records one at a time, never holding the whole feed in memory."""
+    fmt = detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            dialect = "excel-tab" if str(path).lower().endswith(".tsv") else "excel"
+            yield from csv.DictReader(f, dialect=dialect)
+        elif fmt == "jsonl":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported feed format '{fmt}'")
+
+
+def clean_isbn(value):
+    if value is None:
+        return None
+    isbn = str(value).strip().upper()
+    if not isbn or isbn in ("NAN", "NONE", "NULL") or len(isbn) > 20:
+        return None
+    return isbn
+
+
+def clean_isbn13(value):
+    """
+    An `isbn13` feed value, accepted only when all 13 digits survived.
+    Spreadsheet exports often hold it as a float such as 9.78043902348e+12,
+    which has lost the last digit and is not a usable ISBN.
+    """
+    if value is None:
+        return None
+    raw = str(value).strip()
+    try:
+        number = Decimal(raw)
+    except InvalidOperation:
+        return clean_isbn(raw)
+    if not number.is_finite() or number != number.to_integral_value() or len(number.as_tuple().digits) < 13:
+        return None
+    digits = str(int(number))
+    return digits if len(digits) == 13 else None
+
+
+def title_key(record):
+    """Dedupe key for books without an ISBN: case-folded title and first author."""
+    return record["title"].casefold(), (record["authors"][0] if record["authors"] else "").casefold()
+
+
+def normalize_record(raw):
+    """
+    Maps a feed record onto title / isbn / authors / categories / copies,
+    taking the ISBN from `isbn13` when `isbn` is empty. Returns None for
+    records without a title.
+    """
+    title = (raw.get("title") or "").strip()
+    if not title:
+        return None
+    copies = raw.get("copies", raw.get("copy_count", 1))
+    try:
+        copies = max(int(float(copies)), 0) if copies not in (None, "") else 1
+    except (TypeError, ValueError):
+        copies = 1
+    return {
+        "title": title[:255],
+        "isbn": clean_isbn(raw.get("isbn")) or clean_isbn13(raw.get("isbn13")),
+        "authors": catalogue.parse_names(raw.get("authors")),
+        "categories": catalogue.parse_names(raw.get("categories")),
+        "copies": copies,
+    }
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------- Chunk Writer ----------
+def _existing_isbns(session: Session, isbns):
+    if not isbns:
+        return set()
+    query = text("SELECT isbn FROM books WHERE isbn IN :isbns").bindparams(bindparam("isbns", expanding=True))
+    return {row.isbn.upper() for row in session.execute(query, {"isbns": list(isbns)})}
+
+
+def _existing_title_keys(session: Session, titles):
+    """title_key()s of the books in `books` with one of these titles."""
+    if not titles:
+        return set()
+    query = text("""
+        SELECT b.title, a.full_name
+        FROM books b
+        LEFT JOIN book_authors ba ON ba.book_id = b.book_id
+        LEFT JOIN authors a ON a.author_id = ba.author_id
+        WHERE b.title IN :titles
+    """).bindparams(bindparam("titles", expanding=True))
+    return {(row.title.casefold(), (row.full_name or "").casefold())
+            for row in session.execute(query, {"titles": list(titles)})}
+
+
+def _insert_books(session: Session, records):
+    """
+    Inserts a chunk of books in multi-row batches and returns their ids in
+    record order. Books without an ISBN get a unique staging ISBN so their
+    ids can be read back in one query; it is cleared before the chunk commits.
+    """
+    staging = "~" + uuid.uuid4().hex[:12]
+    keys = [r["isbn"] or f"{staging}{i:06d}" for i, r in enumerate(records)]
+    catalogue.insert_rows(session, "INSERT INTO books (title, isbn) VALUES",
+                          ["title", "isbn"], [(r["title"], key) for r, key in zip(records, keys)])
+    query = text("SELECT book_id, isbn FROM books WHERE isbn IN :isbns").bindparams(
+        bindparam("isbns", expanding=True))
+    ids = {row.isbn.upper(): row.book_id for row in session.execute(query, {"isbns": keys})}
+    book_ids = [ids[key.upper()] for key in keys]
+
+    staged = [book_id for book_id, r in zip(book_ids, records) if not r["isbn"]]
+    if staged:
+        clear = text("UPDATE books SET isbn = NULL WHERE book_id IN :ids").bindparams(
+            bindparam("ids", expanding=True))
+        session.execute(clear, {"ids": staged})
+    return book_ids
+
+
+def write_chunk(session: Session, records, author_cache, category_cache):
+    """Writes one chunk of normalized, de-duplicated records in a single transaction."""
+    try:
+        book_ids = _insert_books(session, records)
+
+        author_ids = catalogue.resolve_authors(
+            session, [a for r in records for a in r["authors"]], author_cache)
+        category_ids = catalogue.resolve_categories(
+            session, [c for r in records for c in r["categories"]], category_cache)
+
+        catalogue.link_authors_bulk(session, [
+            (book_id, author_ids[a]) for book_id, r in zip(book_ids, records) for a in r["authors"]
+        ])
+        catalogue.link_categories_bulk(session, [
+            (book_id, category_ids[c]) for book_id, r in zip(book_ids, records) for c in r["categories"]
+        ])
+        catalogue.add_copies_bulk(session, {
+            book_id: r["copies"] for book_id, r in zip(book_ids, records)
+        })
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(book_ids)
+
+
+# ---------- Import ----------
+def import_catalogue(session: Session, path, fmt=None, chunk_size: int = DEFAULT_CHUNK_SIZE, quiet=False):
+    """
+    Streams a CSV/JSONL catalogue feed into the database in chunked
+    transactions, skipping books already in the feed or in `books`: by ISBN,
+    or by title and first author for books without one. Returns a stats dict.
+    """
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "seconds": 0.0}
+    author_cache = {}
+    category_cache = {}
+    seen_isbns = set()
+    seen_keys = set()
+    started = time.perf_counter()
+
+    for raw_chunk in chunked(read_feed(path, fmt), chunk_size):
+        stats["read"] += len(raw_chunk)
+        records = []
+        for raw in raw_chunk:
+            record = normalize_record(raw)
+            if record is None:
+                stats["invalid"] += 1
+            elif record["isbn"] in seen_isbns if record["isbn"] else title_key(record) in seen_keys:
+                stats["duplicates"] += 1
+            else:
+                if record["isbn"]:
+                    seen_isbns.add(record["isbn"])
+                else:
+                    seen_keys.add(title_key(record))
+                records.append(record)
+
+        existing = _existing_isbns(session, [r["isbn"] for r in records if r["isbn"]])
+        existing_keys = _existing_title_keys(session, {r["title"] for r in records if not r["isbn"]})
+        if existing or existing_keys:
+            kept = [r for r in records
+                    if (r["isbn"] not in existing if r["isbn"] else title_key(r) not in existing_keys)]
+            stats["duplicates"] += len(records) - len(kept)
+            records = kept
+
+        if records:
+            stats["inserted"] += write_chunk(session, records, author_cache, category_cache)
+
+        elapsed = time.perf_counter() - started
+        if not quiet:
+            console.print(
+                f"[cyan]{stats['read']:,} read[/cyan] · [green]{stats['inserted']:,} inserted[/green] · "
+                f"[yellow]{stats['duplicates']:,} duplicates[/yellow] · "
+                f"{stats['read'] / elapsed if elapsed else 0:,.0f} rows/sec"
+            )
+
+    if stats["inserted"]:
+        # Usually more books than the cache's overlay holds; reload on next use
+        catalogue_cache.invalidate()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
@@ -4,6 +4,18 @@ from rich.console import Console
 from rich.table import Table
 import typer
 
+import account_stats
+import analytics_store
+import book_stats
+import borrow_archive
+import catalogue
+import catalogue_cache
+import report_snapshots
+import trending
+from db import read_session
+from query_tracer import traced
+from student import SEARCH_MODES, available_books, find_books, borrow_book, return_borrow, return_book
+
 console = Console()
 
 
@@ -23,65 +35,12 @@ def search_books_librarian(session: Session):
         if choice == "4":
             break
 
-        term = typer.prompt("Enter search term")
-
-        if choice == "1":  # Title
-            like_term = f"%{term}%"
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories,
-                       COUNT(bc.copy_id) AS total_copies,
-                       SUM(bc.is_available) AS available_copies
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bcg ON b.book_id = bcg.book_id
-                LEFT JOIN categories c ON bcg.category_id = c.category_id
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                WHERE b.title LIKE :term
-                GROUP BY b.book_id
-            """)
-        elif choice == "2":  # Author
-            search_term = term.lower().replace(".", "").replace(" ", "")
-            like_term = f"%{search_term}%"
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories,
-                       COUNT(bc.copy_id) AS total_copies,
-                       SUM(bc.is_available) AS available_copies
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bcg ON b.book_id = bcg.book_id
-                LEFT JOIN categories c ON bcg.category_id = c.category_id
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                WHERE REPLACE(REPLACE(LOWER(a.full_name), '.', ''), ' ', '') LIKE :term
-                GROUP BY b.book_id
-            """)
-        elif choice == "3":  # Category
-            like_term = f"%{term}%"
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories,
-                       COUNT(bc.copy_id) AS total_copies,
-                       SUM(bc.is_available) AS available_copies
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bcg ON b.book_id = bcg.book_id
-                LEFT JOIN categories c ON bcg.category_id = c.category_id
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                WHERE c.name LIKE :term
-                GROUP BY b.book_id
-            """)
-        else:
+        if choice not in SEARCH_MODES:
             console.print("[red]Invalid choice![/red]")
             continue
 
-        results = session.execute(query, {"term": like_term}).fetchall()
+        term = typer.prompt("Enter search term")
+        results = find_books(session, SEARCH_MODES[choice], term, with_copies=True)
         display_books_librarian(results)
 
 
@@ -113,54 +72,26 @@ def display_books_librarian(results):
 
 
 # ---------- Add Book ----------
+@traced()
 def add_book(session: Session):
     title = typer.prompt("Enter book title")
     authors = typer.prompt("Enter authors (comma separated)")
     categories = typer.prompt("Enter categories (comma separated)")
     copies = int(typer.prompt("Enter number of copies"))
 
-    # Insert book
-    session.execute(text("INSERT INTO books (title) VALUES (:title)"), {"title": title})
-    session.commit()
-
-    # Get book_id of newly inserted book
-    book_id = session.execute(text("SELECT LAST_INSERT_ID()")).scalar()
-
-    # Insert authors
-    for author in [a.strip() for a in authors.split(",")]:
-        # Check if author exists
-        existing = session.execute(text("SELECT author_id FROM authors WHERE full_name = :name"), {"name": author}).fetchone()
-        if existing:
-            author_id = existing.author_id
-        else:
-            session.execute(text("INSERT INTO authors (full_name) VALUES (:name)"), {"name": author})
-            session.commit()
-            author_id = session.execute(text("SELECT LAST_INSERT_ID()")).scalar()
-        session.execute(text("INSERT INTO book_authors (book_id, author_id) VALUES (:book_id, :author_id)"),
-                        {"book_id": book_id, "author_id": author_id})
-
-    # Insert categories
-    for cat in [c.strip() for c in categories.split(",")]:
-        existing = session.execute(text("SELECT category_id FROM categories WHERE name = :name"), {"name": cat}).fetchone()
-        if existing:
-            cat_id = existing.category_id
-        else:
-            session.execute(text("INSERT INTO categories (name) VALUES (:name)"), {"name": cat})
-            session.commit()
-            cat_id = session.execute(text("SELECT LAST_INSERT_ID()")).scalar()
-        session.execute(text("INSERT INTO book_categories (book_id, category_id) VALUES (:book_id, :cat_id)"),
-                        {"book_id": book_id, "cat_id": cat_id})
-
-    # Insert book copies
-    for _ in range(copies):
-        session.execute(text("INSERT INTO book_copies (book_id, is_available) VALUES (:book_id, TRUE)"),
-                        {"book_id": book_id})
-
-    session.commit()
+    catalogue.add_catalogue_entry(session, title, authors, categories, copies)
     console.print(f"[green]Book '{title}' added successfully![/green]")
 
 
 # ---------- Update Book ----------
+def _book_by_title(session: Session, title: str):
+    """The book titled exactly `title` (case-insensitive, from the catalogue cache), else the first partial match."""
+    ids = catalogue_cache.get_cache(session).ids_by_title(title.strip())
+    if ids:
+        return session.execute(text("SELECT * FROM books WHERE book_id = :book_id"), {"book_id": ids[0]}).fetchone()
+    return session.execute(text("SELECT * FROM books WHERE title LIKE :title"), {"title": f"%{title}%"}).fetchone()
+
+
 def update_book(session: Session):
     console.print("[bold green]Update Book[/bold green]")
     choice = typer.prompt("Do you want to update by (1) Book ID or (2) Book Title?")
@@ -171,8 +102,7 @@ def update_book(session: Session):
         book = session.execute(book_query, {"book_id": book_id}).fetchone()
     elif choice == "2":
         title = typer.prompt("Enter Book Title")
-        book_query = text("SELECT * FROM books WHERE title LIKE :title")
-        book = session.execute(book_query, {"title": f"%{title}%"}).fetchone()
+        book = _book_by_title(session, title)
     else:
         console.print("[red]Invalid choice[/red]")
         return
@@ -196,6 +126,7 @@ def update_book(session: Session):
 
 
 # ---------- Delete Book ----------
+@traced()
 def update_book(session: Session):
     # Ask for book identification
     choice = typer.prompt("Update by (1) Book ID or (2) Book Title? [1/2]")
@@ -208,10 +139,7 @@ def update_book(session: Session):
         ).fetchone()
     else:
         title = typer.prompt("Enter Book Title")
-        book = session.execute(
-            text("SELECT * FROM books WHERE title LIKE :title"),
-            {"title": f"%{title}%"}
-        ).fetchone()
+        book = _book_by_title(session, title)
     
     if not book:
         console.print("[red]Book not found![/red]")
@@ -219,60 +147,17 @@ def update_book(session: Session):
 
     console.print(f"[green]Selected Book:[/green] {book.title}")
 
-    # --- Update Authors ---
     authors = typer.prompt("Enter authors (comma separated)", default="")
-    if authors:
-        # Remove existing authors
-        session.execute(text("DELETE FROM book_authors WHERE book_id = :book_id"), {"book_id": book.book_id})
-        # Add new authors
-        for a in authors.split(","):
-            a = a.strip()
-            # Check if author exists
-            author_row = session.execute(text("SELECT author_id FROM authors WHERE full_name = :name"), {"name": a}).fetchone()
-            if not author_row:
-                # Insert new author
-                session.execute(text("INSERT INTO authors (full_name) VALUES (:name)"), {"name": a})
-                author_row = session.execute(text("SELECT author_id FROM authors WHERE full_name = :name"), {"name": a}).fetchone()
-            session.execute(text("INSERT INTO book_authors (book_id, author_id) VALUES (:book_id, :author_id)"),
-                            {"book_id": book.book_id, "author_id": author_row.author_id})
-
-    # --- Update Categories ---
     categories = typer.prompt("Enter categories (comma separated)", default="")
-    if categories:
-        session.execute(text("DELETE FROM book_categories WHERE book_id = :book_id"), {"book_id": book.book_id})
-        for c in categories.split(","):
-            c = c.strip()
-            cat_row = session.execute(text("SELECT category_id FROM categories WHERE name = :name"), {"name": c}).fetchone()
-            if not cat_row:
-                session.execute(text("INSERT INTO categories (name) VALUES (:name)"), {"name": c})
-                cat_row = session.execute(text("SELECT category_id FROM categories WHERE name = :name"), {"name": c}).fetchone()
-            session.execute(text("INSERT INTO book_categories (book_id, category_id) VALUES (:book_id, :category_id)"),
-                            {"book_id": book.book_id, "category_id": cat_row.category_id})
-
-    # --- Update Copies ---
     total_copies = typer.prompt("Enter total number of copies (leave blank to skip)", default="")
-    if total_copies.isdigit():
-        total_copies = int(total_copies)
-        existing_copies = session.execute(
-            text("SELECT COUNT(*) as cnt FROM book_copies WHERE book_id = :book_id"),
-            {"book_id": book.book_id}
-        ).fetchone().cnt
-        diff = total_copies - existing_copies
-        if diff > 0:
-            # Add copies
-            for _ in range(diff):
-                session.execute(text("INSERT INTO book_copies (book_id, is_available) VALUES (:book_id, TRUE)"),
-                                {"book_id": book.book_id})
-        elif diff < 0:
-            # Remove available copies
-            to_remove = abs(diff)
-            session.execute(text("""
-                DELETE FROM book_copies
-                WHERE book_id = :book_id AND is_available = TRUE
-                LIMIT :limit
-            """), {"book_id": book.book_id, "limit": to_remove})
 
-    session.commit()
+    catalogue.update_catalogue_entry(
+        session,
+        book.book_id,
+        authors=authors or None,
+        categories=categories or None,
+        total_copies=int(total_copies) if total_copies.isdigit() else None,
+    )
     console.print("[green]Book updated successfully![/green]")
 
 from rich.console import Console
@@ -335,20 +220,10 @@ def view_all_borrows(session):
 
 
 # ---------------- Issue a book to a student ----------------
+@traced()
 def issue_book(user_id: int, session: Session):
     # List all books with available copies
-    results = session.execute(text("""
-        SELECT b.book_id, b.title,
-               GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-               COUNT(bc.copy_id) AS total_copies,
-               SUM(bc.is_available) AS available_copies
-        FROM books b
-        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-        LEFT JOIN authors a ON ba.author_id = a.author_id
-        LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-        GROUP BY b.book_id
-        HAVING available_copies > 0
-    """)).fetchall()
+    results = available_books(session)
 
     if not results:
         console.print("[yellow]No available books to issue.[/yellow]")
@@ -362,13 +237,13 @@ def issue_book(user_id: int, session: Session):
     table.add_column("Authors", style="magenta")
     table.add_column("Available Copies", style="yellow")
 
-    for idx, row in enumerate(results, start=1):
+    for idx, (book, available_copies) in enumerate(results, start=1):
         table.add_row(
             str(idx),
-            str(row.book_id),
-            row.title,
-            row.authors or "N/A",
-            str(row.available_copies)
+            str(book.book_id),
+            book.title,
+            book.authors or "N/A",
+            str(available_copies)
         )
 
     console.print(table)
@@ -378,35 +253,19 @@ def issue_book(user_id: int, session: Session):
         console.print("[red]Invalid selection[/red]")
         return
 
-    selected_book = results[index - 1]
+    selected_book = results[index - 1][0]
 
-    # Pick one available copy
-    copy = session.execute(text("""
-        SELECT copy_id FROM book_copies 
-        WHERE book_id = :book_id AND is_available = TRUE
-        LIMIT 1
-    """), {"book_id": selected_book.book_id}).fetchone()
-
-    if not copy:
+    # Issue one available copy
+    if not borrow_book(session, user_id, selected_book.book_id):
         console.print("[red]No copies available![/red]")
         return
 
-    # Issue the book
-    session.execute(text("""
-        INSERT INTO borrows (user_id, copy_id, borrow_date, due_date)
-        VALUES (:user_id, :copy_id, CURDATE(), DATE_ADD(CURDATE(), INTERVAL 14 DAY))
-    """), {"user_id": user_id, "copy_id": copy.copy_id})
-
-    session.execute(text("""
-        UPDATE book_copies SET is_available = FALSE WHERE copy_id = :copy_id
-    """), {"copy_id": copy.copy_id})
-
-    session.commit()
     console.print(f"[green]Book '{selected_book.title}' issued successfully![/green]")
 
 
 
 # ---------------- Return a book on behalf of a student ----------------
+@traced()
 def return_book_librarian(session):
     # List all active borrowed books
     results = session.execute(text("""
@@ -416,7 +275,7 @@ def return_book_librarian(session):
         JOIN book_copies bc ON br.copy_id = bc.copy_id
         JOIN books b ON bc.book_id = b.book_id
         JOIN users u ON br.user_id = u.user_id
-        WHERE br.return_date IS NULL
+        WHERE br.active = 1
         ORDER BY br.borrow_date
     """)).fetchall()
 
@@ -443,16 +302,70 @@ def return_book_librarian(session):
 
     selected = results[index - 1]
 
-    session.execute(text("""
-        UPDATE borrows SET return_date = CURDATE() WHERE borrow_id = :borrow_id
-    """), {"borrow_id": selected.borrow_id})
+    if not return_borrow(session, selected.borrow_id):
+        console.print("[red]This book has already been returned.[/red]")
+        return
 
-    session.execute(text("""
-        UPDATE book_copies SET is_available = TRUE WHERE copy_id = :copy_id
-    """), {"copy_id": selected.copy_id})
+    console.print(f"[green]Book '{selected.title}' returned successfully on behalf of {selected.student_name}![/green]")
 
+# ---------------- Fines ----------------
+def add_fine(session: Session, borrow_id: int, amount):
+    """
+    Creates an unpaid fine for a borrow and updates the user's account stats.
+    An archived borrow is moved back to `borrows` first, since fines reference
+    the hot table and fined borrows are never archived.
+    """
+    borrow = session.execute(
+        text("SELECT user_id FROM borrows_history WHERE borrow_id = :borrow_id"), {"borrow_id": borrow_id}
+    ).fetchone()
+    if not borrow:
+        return None
+    borrow_archive.restore(session, borrow_id)
+    result = session.execute(
+        text("INSERT INTO fines (borrow_id, amount, paid) VALUES (:borrow_id, :amount, FALSE)"),
+        {"borrow_id": borrow_id, "amount": amount}
+    )
+    account_stats.record_fine(session, borrow.user_id, amount)
     session.commit()
-    console.print(f"[green]Book '{selected.title}' returned successfully on behalf of {selected.student_name}![/green]")
+    return result.lastrowid
+
+
+def pay_fine(session: Session, fine_id: int):
+    """Marks an unpaid fine as paid and updates the user's account stats."""
+    fine = session.execute(text("""
+        SELECT f.amount, br.user_id
+        FROM fines f
+        JOIN borrows br ON f.borrow_id = br.borrow_id
+        WHERE f.fine_id = :fine_id AND f.paid = FALSE
+        FOR UPDATE
+    """), {"fine_id": fine_id}).fetchone()
+    if not fine:
+        session.rollback()
+        return False
+    session.execute(
+        text("UPDATE fines SET paid = TRUE, payment_date = NOW() WHERE fine_id = :fine_id"),
+        {"fine_id": fine_id}
+    )
+    account_stats.record_payment(session, fine.user_id, fine.amount)
+    session.commit()
+    return True
+
+
+def record_fine(session: Session):
+    borrow_id = int(typer.prompt("Enter Borrow ID"))
+    amount = float(typer.prompt("Enter fine amount"))
+    if add_fine(session, borrow_id, amount):
+        console.print("[green]Fine recorded successfully![/green]")
+    else:
+        console.print("[red]Borrow not found![/red]")
+
+
+def record_fine_payment(session: Session):
+    fine_id = int(typer.prompt("Enter Fine ID"))
+    if pay_fine(session, fine_id):
+        console.print("[green]Fine marked as paid![/green]")
+    else:
+        console.print("[red]No unpaid fine with that ID![/red]")
 
 def view_all_students(session: Session):
     query = text("""
@@ -495,7 +408,9 @@ def manage_borrows(session: Session):
 1. View All Borrows
 2. Issue Book
 3. Return Book
-4. Back
+4. Record Fine
+5. Record Fine Payment
+6. Back
 ====================================================
         """)
         choice = typer.prompt("Enter your choice")
@@ -510,6 +425,10 @@ def manage_borrows(session: Session):
             user_id = typer.prompt("Enter Student User ID")
             return_book(user_id, session)       # same for returning
         elif choice == "4":
+            record_fine(session)
+        elif choice == "5":
+            record_fine_payment(session)
+        elif choice == "6":
             break
         else:
             console.print("[red]Invalid choice![/red]")
@@ -544,13 +463,16 @@ import typer
 
 console = Console()
 
-def analytics_menu(session):
+def analytics_menu(session, database=None):
+    """`session` may be the DuckDB store; `database` is the live database the trending rankings need."""
     while True:
         console.print("""
 ============== Analytics Menu ==============
 1. Books Analytics
 2. Users Analytics
 3. Library Analytics
+4. Trending Now
+5. Demand Forecast
 0. Back
 ==========================================
         """)
@@ -568,10 +490,102 @@ def analytics_menu(session):
         elif choice == "3":  # Library Analytics (queries)
             library_reports(session)
 
+        elif choice == "4":  # Time-decayed borrows, from memory
+            trending_now(database or session)
+
+        elif choice == "5":  # Purchases and hold ETAs from prediction.py
+            demand_forecast(database or session)
+
         else:
             console.print("[red]Invalid choice![/red]")
 
-# ----------------- Books Analytics -----------------
+def trending_now(session):
+    half_life = f"{trending.HALF_LIFE_DAYS:g}-day half-life"
+    table = Table(title=f"Trending Books ({half_life})", show_lines=True)
+    table.add_column("Title")
+    table.add_column("Authors", style="magenta")
+    table.add_column("Score")
+    for book, score in trending.trending_books(session, 10):
+        table.add_row(book.title, book.authors or "N/A", f"{score:.1f}")
+    console.print(table)
+
+    table = Table(title=f"Trending Categories ({half_life})", show_lines=True)
+    table.add_column("Category")
+    table.add_column("Score")
+    for name, score in trending.trending_categories(session, 5):
+        table.add_row(name, f"{score:.1f}")
+    console.print(table)
+    console.print("[dim]Score = borrows, each weighted by how recent it is.[/dim]")
+
+HOLDERS_SQL = text("""
+    SELECT user_id, full_name FROM users
+    WHERE user_id IN (SELECT user_id FROM reservations WHERE status = 1)
+""")
+
+
+def demand_forecast(session):
+    import catalogue_cache
+    import prediction
+
+    forecast = prediction.load_forecast()
+    if forecast is None:
+        console.print("[yellow]No forecast yet; run `python cli.py recompute-predictions`.[/yellow]")
+        return
+    catalogue = catalogue_cache.get_cache(session)
+    console.print(f"[dim]Forecast generated {forecast['generated']}[/dim]")
+
+    table = Table(title="Suggested Purchases", show_lines=True)
+    table.add_column("Title")
+    table.add_column("Copies")
+    table.add_column("Borrows / Week")
+    table.add_column("Buy", style="green")
+    for book_id, copies, demand, extra in prediction.purchase_suggestions(session, forecast, 10):
+        book = catalogue.get(book_id)
+        table.add_row(book.title if book else str(book_id), str(copies), f"{demand:.1f}", str(extra))
+    console.print(table)
+
+    names = {r.user_id: r.full_name for r in session.execute(HOLDERS_SQL)}
+    table = Table(title="Hold Queue", show_lines=True)
+    table.add_column("Student")
+    table.add_column("Book Title")
+    table.add_column("Position")
+    table.add_column("Expected", style="cyan")
+    for _, user_id, book_id, position, eta in prediction.hold_etas(session, forecast):
+        book = catalogue.get(book_id)
+        table.add_row(names.get(user_id, str(user_id)), book.title if book else str(book_id),
+                      str(position), str(eta) if eta else "-")
+    console.print(table)
+
+# ----------------- Books / Users Analytics -----------------
+# Queries behind the analytics menus. They are kept portable (every selected
+# column grouped, ties broken by id) so they also run on the DuckDB store and
+# return the same rows; see analytics_store.parity().
+ANALYTICS_SQL = {
+    "total_copies": "SELECT COUNT(*) AS total FROM book_copies",
+    "total_titles": "SELECT COUNT(*) AS total FROM books",
+    "copies_issued": "SELECT COUNT(*) AS issued FROM book_copies WHERE is_available = FALSE",
+    "copies_available": "SELECT COUNT(*) AS available FROM book_copies WHERE is_available = TRUE",
+    "books_per_category": """
+        SELECT c.name AS category, COUNT(bc.book_id) AS total_books
+        FROM categories c
+        LEFT JOIN book_categories bc ON c.category_id = bc.category_id
+        GROUP BY c.category_id, c.name
+        ORDER BY total_books DESC
+    """,
+    "total_students": "SELECT COUNT(*) AS total FROM users WHERE membership_type_id = 2",
+    "students_borrowing": "SELECT COUNT(*) AS total FROM user_account_stats WHERE currently_borrowed > 0",
+    "students_with_fines": "SELECT COUNT(*) AS total FROM user_account_stats WHERE fines_due > 0",
+    "most_active_students": """
+        SELECT u.full_name, s.total_borrowed AS total_borrows
+        FROM user_account_stats s
+        JOIN users u ON s.user_id = u.user_id
+        WHERE s.total_borrowed > 0
+        ORDER BY s.total_borrowed DESC, s.user_id
+        LIMIT 5
+    """,
+}
+
+
 def books_analytics(session):
     while True:
         console.print("""
@@ -592,31 +606,23 @@ def books_analytics(session):
             break
 
         elif choice == "1":
-            row = session.execute(text("SELECT COUNT(*) AS total FROM book_copies")).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["total_copies"])).fetchone()
             console.print(f"Total Book Copies: [green]{row.total}[/green]")
 
         elif choice == "2":
-            row = session.execute(text("SELECT COUNT(*) AS total FROM books")).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["total_titles"])).fetchone()
             console.print(f"Total Unique Titles: [green]{row.total}[/green]")
 
         elif choice == "3":
-            row = session.execute(text("SELECT COUNT(*) AS issued FROM book_copies WHERE is_available = FALSE")).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["copies_issued"])).fetchone()
             console.print(f"Books Currently Issued: [red]{row.issued}[/red]")
 
         elif choice == "4":
-            row = session.execute(text("SELECT COUNT(*) AS available FROM book_copies WHERE is_available = TRUE")).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["copies_available"])).fetchone()
             console.print(f"Books Available: [green]{row.available}[/green]")
 
         elif choice == "5":
-            rows = session.execute(text("""
-                SELECT b.title, COUNT(br.borrow_id) AS borrow_count
-                FROM books b
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                LEFT JOIN borrows br ON bc.copy_id = br.copy_id
-                GROUP BY b.book_id
-                ORDER BY borrow_count DESC
-                LIMIT 5
-            """)).fetchall()
+            rows = book_stats.most_borrowed(session, 5)
             table = Table(title="Most Borrowed Books", show_lines=True)
             table.add_column("Title")
             table.add_column("Borrow Count")
@@ -625,15 +631,7 @@ def books_analytics(session):
             console.print(table)
 
         elif choice == "6":
-            rows = session.execute(text("""
-                SELECT b.title, COUNT(br.borrow_id) AS borrow_count
-                FROM books b
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                LEFT JOIN borrows br ON bc.copy_id = br.copy_id
-                GROUP BY b.book_id
-                ORDER BY borrow_count ASC
-                LIMIT 5
-            """)).fetchall()
+            rows = book_stats.least_borrowed(session, 5)
             table = Table(title="Least Borrowed Books", show_lines=True)
             table.add_column("Title")
             table.add_column("Borrow Count")
@@ -642,13 +640,7 @@ def books_analytics(session):
             console.print(table)
 
         elif choice == "7":
-            rows = session.execute(text("""
-                SELECT c.name AS category, COUNT(bc.book_id) AS total_books
-                FROM categories c
-                LEFT JOIN book_categories bc ON c.category_id = bc.category_id
-                GROUP BY c.category_id
-                ORDER BY total_books DESC
-            """)).fetchall()
+            rows = session.execute(text(ANALYTICS_SQL["books_per_category"])).fetchall()
             table = Table(title="Books per Category", show_lines=True)
             table.add_column("Category")
             table.add_column("Total Books")
@@ -659,7 +651,6 @@ def books_analytics(session):
         else:
             console.print("[red]Invalid choice![/red]")
 
-# ----------------- Users Analytics -----------------
 def users_analytics(session):
     while True:
         console.print("""
@@ -677,36 +668,19 @@ def users_analytics(session):
             break
 
         elif choice == "1":
-            row = session.execute(text("SELECT COUNT(*) AS total FROM users WHERE membership_type_id = 2")).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["total_students"])).fetchone()
             console.print(f"Total Students: [green]{row.total}[/green]")
 
         elif choice == "2":
-            row = session.execute(text("""
-                SELECT COUNT(DISTINCT user_id) AS total
-                FROM borrows
-                WHERE return_date IS NULL
-            """)).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["students_borrowing"])).fetchone()
             console.print(f"Students with Pending Borrows: [yellow]{row.total}[/yellow]")
 
         elif choice == "3":
-            row = session.execute(text("""
-                SELECT COUNT(DISTINCT u.user_id) AS total
-                FROM fines f
-                JOIN borrows br ON f.borrow_id = br.borrow_id
-                JOIN users u ON br.user_id = u.user_id
-                WHERE f.paid = FALSE
-            """)).fetchone()
+            row = session.execute(text(ANALYTICS_SQL["students_with_fines"])).fetchone()
             console.print(f"Students with Pending Fines: [red]{row.total}[/red]")
 
         elif choice == "4":
-            rows = session.execute(text("""
-                SELECT u.full_name, COUNT(*) AS total_borrows
-                FROM borrows br
-                JOIN users u ON br.user_id = u.user_id
-                GROUP BY u.user_id
-                ORDER BY total_borrows DESC
-                LIMIT 5
-            """)).fetchall()
+            rows = session.execute(text(ANALYTICS_SQL["most_active_students"])).fetchall()
             table = Table(title="Most Active Students", show_lines=True)
             table.add_column("Student")
             table.add_column("Total Borrows")
@@ -718,6 +692,177 @@ def users_analytics(session):
             console.print("[red]Invalid choice![/red]")
 
 # ----------------- Library Analytics (Queries) -----------------
+# report id -> title, SQL and (column header, row field) pairs
+REPORTS = {
+    "1": {
+        "title": "Overdue Books",
+        "sql": """
+            SELECT u.full_name, b.title, br.due_date
+            FROM borrows br
+            JOIN users u ON br.user_id = u.user_id
+            JOIN book_copies bc ON br.copy_id = bc.copy_id
+            JOIN books b ON bc.book_id = b.book_id
+            WHERE br.active = 1 AND br.due_date < CURDATE()
+        """,
+        "columns": [("Student", "full_name"), ("Book Title", "title"), ("Due Date", "due_date")],
+    },
+    "2": {
+        "title": "Top 5 Most Borrowed Books",
+        "sql": """
+            SELECT b.title, s.total_borrows AS borrow_count
+            FROM book_borrow_stats s
+            JOIN books b ON b.book_id = s.book_id
+            ORDER BY s.total_borrows DESC, s.book_id
+            LIMIT 5
+        """,
+        "columns": [("Title", "title"), ("Borrow Count", "borrow_count")],
+    },
+    "3": {
+        "title": "Users with Unpaid Fines",
+        "sql": """
+            SELECT u.full_name, SUM(f.amount) AS total_fines
+            FROM fines f
+            JOIN borrows br ON f.borrow_id = br.borrow_id
+            JOIN users u ON br.user_id = u.user_id
+            WHERE f.paid = FALSE
+            GROUP BY u.user_id, u.full_name
+            ORDER BY total_fines DESC
+        """,
+        "columns": [("Student", "full_name"), ("Total Fines", "total_fines")],
+    },
+    "4": {
+        "title": "Books & Average Rating",
+        "sql": """
+            SELECT b.title, ROUND(AVG(r.rating),2) AS avg_rating, COUNT(r.review_id) AS review_count
+            FROM books b
+            LEFT JOIN reviews r ON b.book_id = r.book_id
+            GROUP BY b.book_id, b.title
+            ORDER BY avg_rating DESC
+        """,
+        "columns": [("Title", "title"), ("Avg Rating", "avg_rating"), ("Review Count", "review_count")],
+    },
+    "5": {
+        "title": "Most Popular Authors",
+        "sql": """
+            SELECT a.full_name, SUM(s.total_borrows) AS times_borrowed
+            FROM book_borrow_stats s
+            JOIN book_authors ba ON s.book_id = ba.book_id
+            JOIN authors a ON ba.author_id = a.author_id
+            GROUP BY a.author_id, a.full_name
+            ORDER BY times_borrowed DESC, a.author_id
+            LIMIT 5
+        """,
+        "columns": [("Author", "full_name"), ("Times Borrowed", "times_borrowed")],
+    },
+    "6": {
+        "title": "Active Reservations",
+        "sql": """
+            SELECT u.full_name, b.title, r.reservation_date
+            FROM reservations r
+            JOIN users u ON r.user_id = u.user_id
+            JOIN books b ON r.book_id = b.book_id
+            WHERE r.status = 1
+            ORDER BY r.reservation_date DESC
+        """,
+        "columns": [("Student", "full_name"), ("Book Title", "title"), ("Reservation Date", "reservation_date")],
+    },
+    "7": {
+        "title": "Books per Category",
+        "sql": ANALYTICS_SQL["books_per_category"],
+        "columns": [("Category", "category"), ("Total Books", "total_books")],
+    },
+    "8": {
+        "title": "Users with Most Borrows",
+        "sql": """
+            SELECT u.full_name, s.total_borrowed AS total_borrows
+            FROM user_account_stats s
+            JOIN users u ON s.user_id = u.user_id
+            ORDER BY s.total_borrowed DESC, s.user_id
+            LIMIT 5
+        """,
+        "columns": [("Student", "full_name"), ("Total Borrows", "total_borrows")],
+    },
+    "9": {
+        "title": "Books Currently Available vs Borrowed",
+        "sql": """
+            SELECT 
+                SUM(CASE WHEN bc.is_available = TRUE THEN 1 ELSE 0 END) AS available,
+                SUM(CASE WHEN bc.is_available = FALSE THEN 1 ELSE 0 END) AS borrowed
+            FROM book_copies bc
+        """,
+        "columns": [("Available", "available"), ("Borrowed", "borrowed")],
+    },
+    "10": {
+        "title": "Fines Collected Per Month",
+        "sql": """
+            SELECT DATE_FORMAT(payment_date, '%Y-%m') AS month, SUM(amount) AS total_collected
+            FROM fines
+            WHERE paid = TRUE
+            GROUP BY DATE_FORMAT(payment_date, '%Y-%m')
+            ORDER BY month
+        """,
+        "columns": [("Month", "month"), ("Total Collected", "total_collected")],
+    },
+    "11": {
+        "title": "Users Who Never Borrowed a Book",
+        "sql": """
+            SELECT u.full_name
+            FROM users u
+            LEFT JOIN user_account_stats s ON s.user_id = u.user_id
+            WHERE COALESCE(s.total_borrowed, 0) = 0
+        """,
+        "columns": [("Student", "full_name")],
+    },
+    "12": {
+        "title": "Top 3 Users with Highest Total Fines",
+        "sql": """
+            WITH user_fines AS (
+                SELECT u.user_id, u.full_name, SUM(f.amount) AS total_fines
+                FROM fines f
+                JOIN borrows br ON f.borrow_id = br.borrow_id
+                JOIN users u ON br.user_id = u.user_id
+                GROUP BY u.user_id, u.full_name
+            )
+            SELECT * FROM user_fines
+            ORDER BY total_fines DESC, user_id
+            LIMIT 3
+        """,
+        "columns": [("Student", "full_name"), ("Total Fines", "total_fines")],
+    },
+    "13": {
+        "title": "Books Ranked by Borrow Count",
+        "sql": f"""
+            SELECT title, borrow_count,
+                   RANK() OVER (ORDER BY borrow_count DESC) AS rank_position
+            FROM ({book_stats.BORROW_COUNTS}) counts
+            ORDER BY borrow_count DESC
+        """,
+        "columns": [("Rank", "rank_position"), ("Title", "title"), ("Borrow Count", "borrow_count")],
+    },
+}
+
+
+def run_report(session, report_id: str):
+    """Executes one of the library reports and returns its rows."""
+    report = REPORTS.get(str(report_id))
+    if report is None:
+        raise KeyError(f"Unknown report '{report_id}'")
+    return session.execute(text(report["sql"])).fetchall()
+
+
+def display_report(report_id: str, rows, title=None):
+    report = REPORTS[str(report_id)]
+    table = Table(title=title or report["title"], show_lines=True)
+    for header, _ in report["columns"]:
+        table.add_column(header)
+    for r in rows:
+        table.add_row(*[
+            "-" if getattr(r, field) is None else str(getattr(r, field))
+            for _, field in report["columns"]
+        ])
+    console.print(table)
+
+
 def library_reports(session):
     while True:
         console.print("""
@@ -735,6 +880,7 @@ def library_reports(session):
 11. Users Who Never Borrowed a Book
 12. Top 3 Users with Highest Total Fines
 13. Books Ranked by Borrow Count
+R. Refresh Report Snapshots
 0. Back
 ==========================================
         """)
@@ -743,214 +889,30 @@ def library_reports(session):
         if choice == "0":
             break
 
-        elif choice == "1":  # Overdue Books
-            rows = session.execute(text("""
-                SELECT u.full_name, b.title, br.due_date
-                FROM borrows br
-                JOIN users u ON br.user_id = u.user_id
-                JOIN book_copies bc ON br.copy_id = bc.copy_id
-                JOIN books b ON bc.book_id = b.book_id
-                WHERE br.return_date IS NULL AND br.due_date < CURDATE()
-            """)).fetchall()
-            table = Table(title="Overdue Books", show_lines=True)
-            table.add_column("Student")
-            table.add_column("Book Title")
-            table.add_column("Due Date")
-            for r in rows:
-                table.add_row(r.full_name, r.title, str(r.due_date))
-            console.print(table)
-
-        elif choice == "2":  # Top 5 Most Borrowed Books
-            rows = session.execute(text("""
-                SELECT b.title, COUNT(*) AS borrow_count
-                FROM borrows br
-                JOIN book_copies bc ON br.copy_id = bc.copy_id
-                JOIN books b ON bc.book_id = b.book_id
-                GROUP BY b.book_id
-                ORDER BY borrow_count DESC
-                LIMIT 5
-            """)).fetchall()
-            table = Table(title="Top 5 Most Borrowed Books", show_lines=True)
-            table.add_column("Title")
-            table.add_column("Borrow Count")
-            for r in rows:
-                table.add_row(r.title, str(r.borrow_count))
-            console.print(table)
-
-        elif choice == "3":  # Users with Unpaid Fines
-            rows = session.execute(text("""
-                SELECT u.full_name, SUM(f.amount) AS total_fines
-                FROM fines f
-                JOIN borrows br ON f.borrow_id = br.borrow_id
-                JOIN users u ON br.user_id = u.user_id
-                WHERE f.paid = FALSE
-                GROUP BY u.user_id
-                ORDER BY total_fines DESC
-            """)).fetchall()
-            table = Table(title="Users with Unpaid Fines", show_lines=True)
-            table.add_column("Student")
-            table.add_column("Total Fines")
-            for r in rows:
-                table.add_row(r.full_name, str(r.total_fines))
-            console.print(table)
-
-        elif choice == "4":  # Books & Average Review Rating
-            rows = session.execute(text("""
-                SELECT b.title, ROUND(AVG(r.rating),2) AS avg_rating, COUNT(r.review_id) AS review_count
-                FROM books b
-                LEFT JOIN reviews r ON b.book_id = r.book_id
-                GROUP BY b.book_id
-                ORDER BY avg_rating DESC
-            """)).fetchall()
-            table = Table(title="Books & Average Rating", show_lines=True)
-            table.add_column("Title")
-            table.add_column("Avg Rating")
-            table.add_column("Review Count")
-            for r in rows:
-                table.add_row(r.title, str(r.avg_rating or 0), str(r.review_count))
-            console.print(table)
-
-        elif choice == "5":  # Most Popular Authors
-            rows = session.execute(text("""
-                SELECT a.full_name, COUNT(*) AS times_borrowed
-                FROM borrows br
-                JOIN book_copies bc ON br.copy_id = bc.copy_id
-                JOIN books b ON bc.book_id = b.book_id
-                JOIN book_authors ba ON b.book_id = ba.book_id
-                JOIN authors a ON ba.author_id = a.author_id
-                GROUP BY a.author_id
-                ORDER BY times_borrowed DESC
-                LIMIT 5
-            """)).fetchall()
-            table = Table(title="Most Popular Authors", show_lines=True)
-            table.add_column("Author")
-            table.add_column("Times Borrowed")
-            for r in rows:
-                table.add_row(r.full_name, str(r.times_borrowed))
-            console.print(table)
-
-        elif choice == "6":  # Active Reservations
-            rows = session.execute(text("""
-                SELECT u.full_name, b.title, r.reservation_date
-                FROM reservations r
-                JOIN users u ON r.user_id = u.user_id
-                JOIN books b ON r.book_id = b.book_id
-                WHERE r.status = 1
-                ORDER BY r.reservation_date DESC
-            """)).fetchall()
-            table = Table(title="Active Reservations", show_lines=True)
-            table.add_column("Student")
-            table.add_column("Book Title")
-            table.add_column("Reservation Date")
-            for r in rows:
-                table.add_row(r.full_name, r.title, str(r.reservation_date))
-            console.print(table)
-
-        elif choice == "7":  # Books per Category
-            rows = session.execute(text("""
-                SELECT c.name AS category, COUNT(bc.book_id) AS total_books
-                FROM categories c
-                LEFT JOIN book_categories bc ON c.category_id = bc.category_id
-                GROUP BY c.category_id
-                ORDER BY total_books DESC
-            """)).fetchall()
-            table = Table(title="Books per Category", show_lines=True)
-            table.add_column("Category")
-            table.add_column("Total Books")
-            for r in rows:
-                table.add_row(r.category, str(r.total_books))
-            console.print(table)
-
-        elif choice == "8":  # Users with Most Borrows
-            rows = session.execute(text("""
-                SELECT u.full_name, COUNT(*) AS total_borrows
-                FROM borrows br
-                JOIN users u ON br.user_id = u.user_id
-                GROUP BY u.user_id
-                ORDER BY total_borrows DESC
-                LIMIT 5
-            """)).fetchall()
-            table = Table(title="Users with Most Borrows", show_lines=True)
-            table.add_column("Student")
-            table.add_column("Total Borrows")
-            for r in rows:
-                table.add_row(r.full_name, str(r.total_borrows))
-            console.print(table)
-
-        elif choice == "9":  # Books Currently Available vs Borrowed
-            row = session.execute(text("""
-                SELECT 
-                    SUM(CASE WHEN bc.is_available = TRUE THEN 1 ELSE 0 END) AS available,
-                    SUM(CASE WHEN bc.is_available = FALSE THEN 1 ELSE 0 END) AS borrowed
-                FROM book_copies bc
-            """)).fetchone()
-            console.print(f"Books Available: [green]{row.available}[/green], Borrowed: [red]{row.borrowed}[/red]")
-
-        elif choice == "10":  # Fines Collected per Month
-            rows = session.execute(text("""
-                SELECT DATE_FORMAT(payment_date, '%Y-%m') AS month, SUM(amount) AS total_collected
-                FROM fines
-                WHERE paid = TRUE
-                GROUP BY DATE_FORMAT(payment_date, '%Y-%m')
-                ORDER BY month
-            """)).fetchall()
-            table = Table(title="Fines Collected Per Month", show_lines=True)
-            table.add_column("Month")
-            table.add_column("Total Collected")
-            for r in rows:
-                table.add_row(r.month, str(r.total_collected))
-            console.print(table)
-
-        elif choice == "11":  # Users who never borrowed a book
-            rows = session.execute(text("""
-                SELECT full_name
-                FROM users
-                WHERE user_id NOT IN (SELECT DISTINCT user_id FROM borrows)
-            """)).fetchall()
-            table = Table(title="Users Who Never Borrowed a Book", show_lines=True)
-            table.add_column("Student")
-            for r in rows:
-                table.add_row(r.full_name)
-            console.print(table)
-
-        elif choice == "12":  # Top 3 Users with Highest Total Fines
-            rows = session.execute(text("""
-                WITH user_fines AS (
-                    SELECT u.user_id, u.full_name, SUM(f.amount) AS total_fines
-                    FROM fines f
-                    JOIN borrows br ON f.borrow_id = br.borrow_id
-                    JOIN users u ON br.user_id = u.user_id
-                    GROUP BY u.user_id
-                )
-                SELECT * FROM user_fines
-                ORDER BY total_fines DESC
-                LIMIT 3
-            """)).fetchall()
-            table = Table(title="Top 3 Users with Highest Total Fines", show_lines=True)
-            table.add_column("Student")
-            table.add_column("Total Fines")
-            for r in rows:
-                table.add_row(r.full_name, str(r.total_fines))
-            console.print(table)
-
-        elif choice == "13":  # Books Ranked by Borrow Count
-            rows = session.execute(text("""
-                SELECT b.title,
-                       COUNT(br.borrow_id) AS borrow_count,
-                       RANK() OVER (ORDER BY COUNT(br.borrow_id) DESC) AS rank_position
-                FROM books b
-                LEFT JOIN book_copies bc ON b.book_id = bc.book_id
-                LEFT JOIN borrows br ON bc.copy_id = br.copy_id
-                GROUP BY b.book_id
-                ORDER BY borrow_count DESC
-            """)).fetchall()
-            table = Table(title="Books Ranked by Borrow Count", show_lines=True)
-            table.add_column("Rank")
-            table.add_column("Title")
-            table.add_column("Borrow Count")
-            for r in rows:
-                table.add_row(str(r.rank_position), r.title, str(r.borrow_count))
-            console.print(table)
+        elif choice.upper() == "R":
+            if analytics_store.is_analytics(session):
+                analytics_store.snapshot()
+                session.reload()
+                console.print("[green]Analytics snapshot refreshed.[/green]")
+            else:
+                report_snapshots.refresh()
+                console.print("[green]Report snapshots refreshed.[/green]")
+
+        elif analytics_store.is_analytics(session) and choice in REPORTS:
+            title = f"{REPORTS[choice]['title']} (as of {session.taken_at:%Y-%m-%d %H:%M})"
+            display_report(choice, run_report(session, choice), title=title)
+
+        elif choice in report_snapshots.SNAPSHOT_REPORTS:
+            snapshot = report_snapshots.latest(session, choice)
+            if snapshot is None:
+                console.print("[dim]No snapshot yet; running live (press R to take one).[/dim]")
+                display_report(choice, run_report(session, choice))
+            else:
+                rows, taken_at = snapshot
+                display_report(choice, rows, title=f"{REPORTS[choice]['title']} (as of {taken_at:%Y-%m-%d %H:%M})")
+
+        elif choice in REPORTS:
+            display_report(choice, run_report(session, choice))
 
         else:
             console.print("[red]Invalid choice![/red]")
@@ -973,7 +935,8 @@ def librarian_menu(session: Session):
         choice = typer.prompt("Enter your choice")
 
         if choice == "1":
-            search_books_librarian(session)
+            with read_session(session) as reader:
+                search_books_librarian(reader)
         elif choice == "2":
             add_book(session)
         elif choice == "3":
@@ -985,7 +948,8 @@ def librarian_menu(session: Session):
         elif choice == "6":
             manage_users(session)
         elif choice == "7":
-            analytics_menu(session)
+            with read_session(session) as reader, analytics_store.analytics_session(reader) as analytics:
+                analytics_menu(analytics, reader)
         elif choice == "8":
             console.print("[yellow]Logging out...[/yellow]")
             break
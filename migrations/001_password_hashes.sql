@@ -0,0 +1,15 @@
+-- =========================================================
+-- Salted scrypt password hashes (existing databases)
+-- =========================================================
+-- scrypt hashes are ~90 characters, longer than the old CHAR(60) column.
+-- Legacy sha256 digests keep working and are rehashed on the next login.
+ALTER TABLE librarians MODIFY password_hash VARCHAR(255) NOT NULL;
+
+-- Student logins read users.username / users.password_hash. Databases loaded
+-- from data/users.sql already have both columns; only widen the hash there:
+ALTER TABLE users MODIFY password_hash VARCHAR(255);
+
+-- Databases created from an older schema.sql without them need instead:
+-- ALTER TABLE users
+--   ADD COLUMN username VARCHAR(64) UNIQUE AFTER full_name,
+--   ADD COLUMN password_hash VARCHAR(255) AFTER username;
@@ -0,0 +1,18 @@
+-- =========================================================
+-- Per-user account summary table (existing databases)
+-- =========================================================
+CREATE TABLE IF NOT EXISTS user_account_stats (
+  user_id BIGINT UNSIGNED PRIMARY KEY,
+  total_borrowed INT NOT NULL DEFAULT 0,
+  currently_borrowed INT NOT NULL DEFAULT 0,
+  fines_due DECIMAL(10,2) NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_uas_total_borrowed (total_borrowed),
+  KEY idx_uas_currently_borrowed (currently_borrowed),
+  KEY idx_uas_fines_due (fines_due),
+  FOREIGN KEY (user_id) REFERENCES users(user_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Then backfill from history:
+--   python cli.py rebuild-account-stats
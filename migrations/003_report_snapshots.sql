@@ -0,0 +1,13 @@
+-- =========================================================
+-- Materialized library report snapshots (existing databases)
+-- =========================================================
+CREATE TABLE IF NOT EXISTS report_snapshots (
+  report_id VARCHAR(8) PRIMARY KEY,
+  taken_at DATETIME NOT NULL,
+  duration_ms INT UNSIGNED NOT NULL,
+  row_count INT UNSIGNED NOT NULL,
+  rows_json JSON NOT NULL
+) ENGINE=InnoDB;
+
+-- Then take the first snapshots:
+--   python cli.py snapshot-reports
@@ -0,0 +1,35 @@
+-- =========================================================
+-- Per-book borrow rollups (existing databases)
+-- Replaces any hand-made book_borrow_stats view that prediction.py used to read.
+-- =========================================================
+DROP VIEW IF EXISTS book_borrow_stats;
+
+CREATE TABLE IF NOT EXISTS book_borrow_stats (
+  book_id BIGINT UNSIGNED PRIMARY KEY,
+  total_borrows INT UNSIGNED NOT NULL DEFAULT 0,
+  unique_borrowers INT UNSIGNED NOT NULL DEFAULT 0,
+  returned_count INT UNSIGNED NOT NULL DEFAULT 0,
+  late_returns INT UNSIGNED NOT NULL DEFAULT 0,
+  total_late_days INT UNSIGNED NOT NULL DEFAULT 0,
+  avg_late_days DECIMAL(8,2) AS (IF(returned_count > 0, total_late_days / returned_count, NULL)) STORED,
+  last_borrowed DATE,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_bbs_total_borrows (total_borrows),
+  FOREIGN KEY (book_id) REFERENCES books(book_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS book_borrow_monthly (
+  book_id BIGINT UNSIGNED NOT NULL,
+  month DATE NOT NULL,
+  borrows INT UNSIGNED NOT NULL DEFAULT 0,
+  returns INT UNSIGNED NOT NULL DEFAULT 0,
+  late_days INT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (book_id, month),
+  KEY idx_bbm_month (month),
+  FOREIGN KEY (book_id) REFERENCES books(book_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Then backfill from history:
+--   python cli.py rebuild-book-stats
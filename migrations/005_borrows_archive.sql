@@ -0,0 +1,33 @@
+-- =========================================================
+-- Hot/cold split for borrows (existing databases)
+-- =========================================================
+-- MySQL cannot RANGE-partition borrows because it has foreign keys (and
+-- fines references it), so old returned loans move to a plain archive table.
+ALTER TABLE borrows
+  ADD KEY idx_borrows_active_user (active, user_id),
+  ADD KEY idx_borrows_active_due (active, due_date);
+
+CREATE TABLE IF NOT EXISTS borrows_archive (
+  borrow_id BIGINT UNSIGNED PRIMARY KEY,
+  user_id BIGINT UNSIGNED NOT NULL,
+  copy_id BIGINT UNSIGNED NOT NULL,
+  librarian_id BIGINT UNSIGNED,
+  borrow_date DATE NOT NULL,
+  due_date DATE NOT NULL,
+  return_date DATE NOT NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_borrows_archive_user (user_id, borrow_date),
+  KEY idx_borrows_archive_copy (copy_id),
+  KEY idx_borrows_archive_borrow_date (borrow_date)
+) ENGINE=InnoDB;
+
+-- Hot and archived loans together, for full-history reads
+CREATE OR REPLACE VIEW borrows_history AS
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows
+  UNION ALL
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows_archive;
+
+-- Then move history out of the hot table (repeatable, batched):
+--   python cli.py archive-borrows
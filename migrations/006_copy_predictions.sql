@@ -0,0 +1,7 @@
+-- =========================================================
+-- Prediction columns used by recommend.py / update.py (existing databases)
+-- Skip if your book_copies table already has them.
+-- =========================================================
+ALTER TABLE book_copies
+  ADD COLUMN predicted_borrow_prob FLOAT,
+  ADD COLUMN predicted_damage_prob FLOAT;
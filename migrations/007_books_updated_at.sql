@@ -0,0 +1,6 @@
+-- =========================================================
+-- Change tracking for the in-process catalogue cache (existing databases)
+-- =========================================================
+ALTER TABLE books
+  ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  ADD KEY idx_books_updated_at (updated_at);
@@ -0,0 +1,5 @@
+-- =========================================================
+-- Recent-window index for the trending rebuild (existing databases)
+-- =========================================================
+ALTER TABLE borrows
+  ADD KEY idx_borrows_borrow_date (borrow_date);
@@ -0,0 +1,11 @@
+-- =========================================================
+-- Deleted-book tracking for the catalogue cache refresh (existing databases)
+-- =========================================================
+CREATE TABLE book_tombstones (
+  book_id BIGINT UNSIGNED NOT NULL,
+  deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_book_tombstones_deleted_at (deleted_at)
+) ENGINE=InnoDB;
+
+CREATE TRIGGER books_tombstone AFTER DELETE ON books
+  FOR EACH ROW INSERT INTO book_tombstones (book_id) VALUES (OLD.book_id);
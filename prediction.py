@@ -1,64 +1,323 @@
 # prediction.py
-import pandas as pd
-from sqlalchemy import create_engine
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from joblib import dump
-
-# ---- 1. Database connection ----
-db_user = 'root'
-db_pass = 'Harsh5764'
-db_host = 'localhost'
-db_name = 'lms'
-
-# SQLAlchemy engine
-engine = create_engine(f"mysql+pymysql://{db_user}:{db_pass}@{db_host}/{db_name}")
-
-try:
-    # Test connection
+"""
+Weekly borrow-demand forecast per title, for copy purchasing and hold ETAs.
+
+Every title is forecast in one vectorized batch:
+  1. Weekly borrow counts per title (hot and archived borrows) form an
+     n_titles x weeks matrix.
+  2. Seasonality is fitted per category, where there is enough signal. Every
+     category's weekly totals are regressed on one shared design matrix
+     (level, trend, annual harmonics) in a single multi-output lstsq, and
+     the resulting multipliers are shrunk toward the library-wide pattern
+     for thin categories. A title gets the mean index of its categories.
+  3. A title's level is the exponentially weighted mean of its
+     deseasonalized counts. The half-life is picked by backtesting the
+     last `horizon` weeks.
+  4. forecast[title, h] = level x seasonal index of week h.
+
+recompute_predictions() writes the forecast to borrow_predictions.csv and to
+demand_forecast.npz, which purchase_suggestions() and hold_etas() read.
+benchmarks/forecast.py reports training time and accuracy at 100k titles.
+"""
+import csv
+import math
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+PREDICTIONS_CSV = "borrow_predictions.csv"
+MODEL_PATH = "demand_forecast.npz"
+HISTORY_WEEKS = 156
+HORIZON_WEEKS = 8
+HARMONICS = 3
+WEEKS_PER_YEAR = 365.25 / 7
+# Category borrows at which its own seasonality gets half the weight (the rest is library-wide)
+SEASON_SHRINK = 200.0
+SEASON_CLIP = (0.25, 4.0)
+HALF_LIFE_CANDIDATES = (4, 8, 16, 32, 64)
+# Spare demand covered when suggesting purchases
+SAFETY = 0.2
+# Share of returned copies assumed to reach the hold queue however busy walk-ins are
+MIN_HOLD_SHARE = 0.25
+
+BOOKS_SQL = text("SELECT book_id FROM books ORDER BY book_id")
+DAILY_BORROWS_SQL = text("""
+    SELECT bc.book_id, br.borrow_date, COUNT(*) AS borrows
+    FROM (
+        SELECT copy_id, borrow_date FROM borrows WHERE borrow_date >= :since AND borrow_date < :until
+        UNION ALL
+        SELECT copy_id, borrow_date FROM borrows_archive WHERE borrow_date >= :since AND borrow_date < :until
+    ) br
+    JOIN book_copies bc ON bc.copy_id = br.copy_id
+    GROUP BY bc.book_id, br.borrow_date
+""")
+CATEGORY_LINKS_SQL = text("SELECT book_id, category_id FROM book_categories")
+
+
+def get_engine():
+    # Training only reads, so it runs against the read replica when one is configured
+    from db import get_read_engine
+    return get_read_engine()
+
+
+def _day(value):
+    if isinstance(value, str):  # SQLite returns dates as text
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+# ---------- Data ----------
+def week_end(today=None):
+    """First day after the last complete week (weeks run Monday to Sunday)."""
+    today = today or date.today()
+    return today - timedelta(days=today.weekday())
+
+
+def weekly_counts(conn, weeks=HISTORY_WEEKS, until=None):
+    """(book_ids, float32 books x weeks borrow counts, until) for the `weeks` complete weeks before `until`."""
+    until = until or week_end()
+    since = until - timedelta(weeks=weeks)
+    book_ids = np.fromiter((r[0] for r in conn.execute(BOOKS_SQL)), dtype=np.int64)
+    counts = np.zeros((len(book_ids), weeks), dtype=np.float32)
+    rows = conn.execute(DAILY_BORROWS_SQL, {"since": since, "until": until})
+    while True:
+        chunk = rows.fetchmany(50000)
+        if not chunk:
+            break
+        ids = np.fromiter((r[0] for r in chunk), dtype=np.int64, count=len(chunk))
+        week = np.fromiter(((_day(r[1]) - since.toordinal()) // 7 for r in chunk), dtype=np.int64, count=len(chunk))
+        n = np.fromiter((r[2] for r in chunk), dtype=np.float32, count=len(chunk))
+        p = np.searchsorted(book_ids, ids)
+        known = (p < len(book_ids)) & (book_ids[np.minimum(p, len(book_ids) - 1)] == ids)
+        np.add.at(counts, (p[known], week[known]), n[known])
+    return book_ids, counts, until
+
+
+def category_membership(conn, book_ids):
+    """csr books x categories with each book's row summing to 1 (empty for uncategorized books)."""
+    links = np.array([tuple(r) for r in conn.execute(CATEGORY_LINKS_SQL)], dtype=np.int64).reshape(-1, 2)
+    return membership_matrix(book_ids, links)
+
+
+def membership_matrix(book_ids, links):
+    from scipy import sparse
+
+    p = np.searchsorted(book_ids, links[:, 0])
+    known = (p < len(book_ids)) & (book_ids[np.minimum(p, len(book_ids) - 1)] == links[:, 0])
+    rows, categories = p[known], links[known, 1]
+    _, columns = np.unique(categories, return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)),
+                               shape=(len(book_ids), int(columns.max()) + 1 if len(columns) else 0))
+    per_book = np.asarray(matrix.sum(axis=1)).ravel()
+    return sparse.diags(1 / np.where(per_book == 0, 1, per_book)).astype(np.float32) @ matrix
+
+
+# ---------- Model ----------
+def design(weeks, start=0):
+    """Shared design matrix for weeks start..start+weeks-1: level, trend, annual sin/cos pairs."""
+    t = np.arange(start, start + weeks, dtype=np.float64)
+    columns = [np.ones_like(t), t / WEEKS_PER_YEAR]
+    for k in range(1, HARMONICS + 1):
+        angle = 2 * math.pi * k * t / WEEKS_PER_YEAR
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+def seasonal_index(counts, membership, horizon):
+    """
+    float32 books x (weeks + horizon) multiplicative seasonal index. One lstsq
+    fits every category's weekly totals (plus the library total) at once.
+    """
+    weeks = counts.shape[1]
+    totals = np.column_stack([(membership.T @ counts).T, counts.sum(axis=0)])  # weeks x (categories + 1)
+    coef, *_ = np.linalg.lstsq(design(weeks), totals, rcond=None)
+    full = design(weeks + horizon)
+    base = full[:, :2] @ coef[:2]
+    season = full[:, 2:] @ coef[2:]
+    index = np.clip(1 + season / np.where(base > 1e-6, base, np.inf), *SEASON_CLIP)
+    volume = totals.sum(axis=0)
+    weight = volume / (volume + SEASON_SHRINK)
+    index = weight * index + (1 - weight) * index[:, -1:]
+    category_index, library_index = index[:, :-1], index[:, -1]
+    has_category = np.asarray(membership.sum(axis=1)).ravel() > 0
+    books = np.asarray(membership @ category_index.T, dtype=np.float32)
+    books[~has_category] = library_index
+    return books
+
+
+def _levels(deseasonalized, half_lives):
+    """books x len(half_lives) exponentially weighted means (latest week weighs most)."""
+    age = np.arange(deseasonalized.shape[1])[::-1]
+    weights = np.column_stack([0.5 ** (age / h) for h in half_lives]).astype(np.float32)
+    return deseasonalized @ (weights / weights.sum(axis=0))
+
+
+def fit(counts, membership, horizon=HORIZON_WEEKS, half_life=None):
+    """
+    Returns (forecast float32 books x horizon, chosen half-life in weeks).
+    Without `half_life`, each candidate is scored on the last `horizon`
+    weeks and the best one is used. Squared error is used because purchasing
+    needs the mean demand; absolute error would favour forecasting 0 for
+    rarely borrowed titles.
+    """
+    if half_life is None:
+        train, held_out = counts[:, :-horizon], counts[:, -horizon:]
+        index = seasonal_index(train, membership, horizon)
+        levels = _levels(train / index[:, :train.shape[1]], HALF_LIFE_CANDIDATES)
+        future = index[:, train.shape[1]:]
+        errors = [np.square(levels[:, [c]] * future - held_out).sum() for c in range(len(HALF_LIFE_CANDIDATES))]
+        half_life = HALF_LIFE_CANDIDATES[int(np.argmin(errors))]
+    index = seasonal_index(counts, membership, horizon)
+    level = _levels(counts / index[:, :counts.shape[1]], [half_life])
+    return (level * index[:, counts.shape[1]:]).astype(np.float32), half_life
+
+
+def wape(forecast, actual):
+    """Weighted absolute percentage error: sum |error| / sum actual."""
+    total = float(np.sum(actual))
+    return float(np.abs(forecast - actual).sum()) / total if total else 0.0
+
+
+# ---------- Pipeline ----------
+def recompute_predictions(engine=None, output_csv=PREDICTIONS_CSV, model_path=MODEL_PATH, horizon=HORIZON_WEEKS):
+    """Refits the demand forecast, writes the CSV and the .npz used by the menus, returns a summary."""
+    # The backtest holds out `horizon` weeks and needs at least one week before them
+    if not 1 <= horizon < HISTORY_WEEKS:
+        raise ValueError(f"horizon must be between 1 and {HISTORY_WEEKS - 1} weeks, got {horizon}")
+    engine = engine or get_engine()
+    started = time.perf_counter()
     with engine.connect() as conn:
-        print("Connected successfully to LMS database!")
-except Exception as e:
-    print("Error connecting to database:", e)
-    exit(1)
-
-# ---- 2. Load data ----
-try:
-    book_copies_df = pd.read_sql("SELECT * FROM book_copies", engine)
-    borrow_stats_df = pd.read_sql("SELECT * FROM book_borrow_stats", engine)
-except Exception as e:
-    print("Error reading tables/views:", e)
-    exit(1)
-
-print("Data loaded successfully!")
-print("Book copies preview:\n", book_copies_df.head())
-print("Borrow stats preview:\n", borrow_stats_df.head())
-
-# ---- 3. Prepare dataset for prediction ----
-# Predicting 'total_borrows' using available features
-if 'total_borrows' not in borrow_stats_df.columns:
-    print("Column 'total_borrows' not found in borrow_stats")
-    exit(1)
-
-# Features: book_id, unique_borrowers, avg_late_days (fill NaN with 0)
-X = borrow_stats_df[['book_id', 'unique_borrowers', 'avg_late_days']].fillna(0)  
-y = borrow_stats_df['total_borrows']  # Target
-
-# Split into training and testing
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# ---- 4. Train model ----
-model = LinearRegression()
-model.fit(X_train, y_train)
-
-# Evaluate
-score = model.score(X_test, y_test)
-print(f"Model R^2 score: {score:.2f}")
-
-# ---- 5. Make predictions ----
-borrow_stats_df['predicted_borrows'] = model.predict(X)
-
-# ---- 6. Save predictions ----
-borrow_stats_df.to_csv("borrow_predictions.csv", index=False)
-dump(model, "borrow_model.joblib")  # Save the trained model
-print("Predictions saved to borrow_predictions.csv and model saved as borrow_model.joblib")
+        book_ids, counts, until = weekly_counts(conn)
+        membership = category_membership(conn, book_ids)
+    forecast, half_life = fit(counts, membership, horizon)
+    recent = counts[:, -horizon:].mean(axis=1)
+
+    np.savez(model_path, book_ids=book_ids, forecast=forecast, recent=recent,
+             generated=np.array(datetime.now().isoformat(timespec="seconds")), first_week=np.array(until.isoformat()))
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["book_id", "recent_weekly", *[f"week_{h + 1}" for h in range(horizon)], "forecast_total"])
+        for book_id, last, row in zip(book_ids.tolist(), recent.tolist(), forecast.tolist()):
+            writer.writerow([book_id, round(last, 3), *[round(v, 3) for v in row], round(sum(row), 3)])
+    return {"rows": len(book_ids), "weeks": counts.shape[1], "horizon": horizon, "half_life_weeks": half_life,
+            "seconds": round(time.perf_counter() - started, 1), "predictions_csv": output_csv, "model_path": model_path}
+
+
+def load_forecast(model_path=MODEL_PATH):
+    """{book_ids, forecast, recent, generated} from the last recompute, or None."""
+    try:
+        with np.load(model_path) as data:
+            return {name: data[name] for name in data.files}
+    except OSError:
+        return None
+
+
+def weekly_demand(forecast, book_ids):
+    """Mean forecast borrows per week over the horizon for `book_ids` (0 for unknown books)."""
+    ids = np.asarray(list(book_ids), dtype=np.int64)
+    known_ids, mean = forecast["book_ids"], forecast["forecast"].mean(axis=1)
+    if not len(known_ids):
+        return np.zeros(len(ids))
+    p = np.minimum(np.searchsorted(known_ids, ids), len(known_ids) - 1)
+    return np.where(known_ids[p] == ids, mean[p], 0.0)
+
+
+# ---------- Purchasing and Hold ETAs ----------
+COPIES_SQL = text("""
+    SELECT bc.book_id, COUNT(*) AS copies, SUM(CASE WHEN bc.is_available THEN 1 ELSE 0 END) AS available,
+           COALESCE(MAX(s.avg_late_days), 0) AS late_days
+    FROM book_copies bc
+    LEFT JOIN book_borrow_stats s ON s.book_id = bc.book_id
+    GROUP BY bc.book_id
+""")
+ACTIVE_HOLDS_SQL = text("""
+    SELECT r.reservation_id, r.user_id, r.book_id, r.reservation_date
+    FROM reservations r
+    WHERE r.status = 1
+    ORDER BY r.book_id, r.reservation_date, r.reservation_id
+""")
+NEXT_RETURN_SQL = text("""
+    SELECT bc.book_id, MIN(br.due_date) AS next_due
+    FROM borrows br
+    JOIN book_copies bc ON bc.copy_id = br.copy_id
+    WHERE br.active = 1
+    GROUP BY bc.book_id
+""")
+
+
+def _loan_weeks(late_days):
+    from student import LOAN_DAYS
+
+    return (LOAN_DAYS + float(late_days or 0)) / 7
+
+
+def purchase_suggestions(session, forecast=None, limit: int = 20):
+    """
+    Titles whose forecast peak weekly demand, times the time a copy stays out
+    plus SAFETY, needs more copies than the library owns. Returns
+    [(book_id, copies, weekly demand, suggested extra copies)], largest gap first.
+    """
+    forecast = forecast if forecast is not None else load_forecast()
+    if forecast is None:
+        return []
+    peak = dict(zip(forecast["book_ids"].tolist(), forecast["forecast"].max(axis=1).tolist()))
+    suggestions = []
+    for row in session.execute(COPIES_SQL):
+        demand = peak.get(row.book_id, 0.0)
+        needed = math.ceil(demand * _loan_weeks(row.late_days) * (1 + SAFETY))
+        if needed > row.copies:
+            suggestions.append((row.book_id, int(row.copies), round(demand, 2), needed - int(row.copies)))
+    suggestions.sort(key=lambda s: (-s[3], -s[2], s[0]))
+    return suggestions[:limit]
+
+
+def hold_etas(session, forecast=None, today=None):
+    """
+    Expected date each active reservation can be served, as
+    [(reservation_id, user_id, book_id, position, eta)].
+
+    Issuing does not check holds, so walk-in borrowers compete for every
+    returned copy. With all copies out, copies come back at
+    copies / loan_weeks per week. The forecast demand is the walk-in share
+    of those, and the rest (at least MIN_HOLD_SHARE) serve the queue in
+    order. No ETA is earlier than the title's next due date.
+    """
+    forecast = forecast if forecast is not None else load_forecast()
+    today = today or date.today()
+    holds = session.execute(ACTIVE_HOLDS_SQL).fetchall()
+    if not holds:
+        return []
+    copies = {r.book_id: r for r in session.execute(COPIES_SQL)}
+    next_due = {r.book_id: r.next_due for r in session.execute(NEXT_RETURN_SQL)}
+    book_ids = sorted({h.book_id for h in holds})
+    demand = dict(zip(book_ids, weekly_demand(forecast, book_ids).tolist())) if forecast is not None else {}
+
+    etas, position, previous = [], 0, None
+    for hold in holds:
+        position = position + 1 if hold.book_id == previous else 1
+        previous = hold.book_id
+        stock = copies.get(hold.book_id)
+        if stock is None or not stock.copies:
+            etas.append((hold.reservation_id, hold.user_id, hold.book_id, position, None))
+            continue
+        if position <= int(stock.available or 0):
+            etas.append((hold.reservation_id, hold.user_id, hold.book_id, position, today))
+            continue
+        returns_per_week = stock.copies / _loan_weeks(stock.late_days)
+        to_queue = max(returns_per_week - demand.get(hold.book_id, 0.0), returns_per_week * MIN_HOLD_SHARE)
+        waiting = position - int(stock.available or 0)
+        eta = today + timedelta(days=math.ceil(7 * waiting / to_queue))
+        due = next_due.get(hold.book_id)
+        if due is not None:
+            eta = max(eta, date.fromordinal(_day(due)))
+        etas.append((hold.reservation_id, hold.user_id, hold.book_id, position, eta))
+    return etas
+
+
+if __name__ == "__main__":
+    summary = recompute_predictions()
+    print(f"Forecast {summary['rows']} titles for {summary['horizon']} weeks "
+          f"(half-life {summary['half_life_weeks']} weeks) in {summary['seconds']}s")
+    print(f"Predictions saved to {PREDICTIONS_CSV} and {MODEL_PATH}")
@@ -0,0 +1,125 @@
+import os
+import re
+import hashlib
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+
+from sqlalchemy import event
+from rich.console import Console
+
+console = Console()
+
+# An action issuing the same statement shape more than this many times is reported.
+N_PLUS_ONE_THRESHOLD = int(os.getenv("LMS_N_PLUS_ONE_THRESHOLD", "5"))
+TRACING_ENABLED = os.getenv("LMS_QUERY_TRACE", "1") != "0"
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+# ---------- Statement Fingerprinting ----------
+_COMMENT_RE = re.compile(r"(--[^\n]*)|(/\*.*?\*/)", re.S)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_BIND_RE = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\?")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_RE = re.compile(r"\bvalues\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """
+    Reduces a statement to its shape: literals and bind markers become '?',
+    IN lists and multi-row VALUES collapse, whitespace and case are folded.
+    """
+    sql = _COMMENT_RE.sub(" ", statement)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _BIND_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _SPACE_RE.sub(" ", sql).strip().lower()
+    sql = _IN_LIST_RE.sub("in (?+)", sql)
+    sql = _VALUES_RE.sub(r"values \1+", sql)
+    return sql
+
+
+def fingerprint(statement: str) -> str:
+    """Short stable id for the normalized shape of a statement."""
+    return hashlib.sha1(normalize_sql(statement).encode()).hexdigest()[:12]
+
+
+# ---------- Per-action Trace ----------
+class QueryTrace:
+    def __init__(self, action: str):
+        self.action = action
+        self.counts = Counter()
+        self.samples = {}
+        self.total = 0
+
+    def record(self, statement: str):
+        fp = fingerprint(statement)
+        self.counts[fp] += 1
+        self.samples.setdefault(fp, normalize_sql(statement))
+        self.total += 1
+
+    def repeated(self, threshold: int = None):
+        """Statement shapes issued more than `threshold` times, most frequent first."""
+        limit = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(self.samples[fp], count) for fp, count in self.counts.most_common() if count > limit]
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def report(trace: QueryTrace, threshold: int = None):
+    for sql, count in trace.repeated(threshold):
+        console.print(
+            f"[bold yellow]⚠ Possible N+1 in '{trace.action}':[/bold yellow] "
+            f"{count}× [dim]{sql[:160]}[/dim]"
+        )
+
+
+@contextmanager
+def trace_action(action: str, threshold: int = None):
+    """
+    Collects every statement executed inside the block and warns about
+    statement shapes repeated more than `threshold` times.
+    """
+    trace = QueryTrace(action)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        report(trace, threshold)
+
+
+def traced(action: str = None, threshold: int = None):
+    """Decorator form of trace_action for CLI action functions."""
+    def decorator(func):
+        name = action or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED or _current_trace.get() is not None:
+                return func(*args, **kwargs)
+            with trace_action(name, threshold):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- Engine Hook ----------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(statement)
+
+
+def install(engine):
+    """Registers the tracer on an engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    return engine
@@ -0,0 +1,138 @@
+"""
+Recommendation lists per search result set, so repeated searches for the
+same (usually popular) titles skip both recommenders.
+
+Entries are keyed by a hash of the sorted, de-duplicated shown book ids and
+evicted least-recently-used beyond MAX_ENTRIES or after TTL_SECONDS. A
+borrow drops the entries for result sets showing the borrowed book or any
+book the borrower borrowed before, since it changes their "readers also
+borrowed" counts. When that list is empty, the most borrowed books of the
+last few months (recomputed once a day) are shown as "popular" instead.
+
+The cache is per process, so a borrow through another process (the HTTP
+server, a second CLI) is only seen once TTL_SECONDS has passed.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+MAX_ENTRIES = int(os.getenv("LMS_RECOMMENDATION_CACHE_SIZE", "10000"))
+TTL_SECONDS = float(os.getenv("LMS_RECOMMENDATION_CACHE_TTL", "600"))
+POPULAR_MAX_AGE = float(os.getenv("LMS_POPULAR_MAX_AGE", "86400"))
+POPULAR_MONTHS = 3
+POPULAR_SIZE = 50
+
+POPULAR_SQL = text("""
+    SELECT book_id, SUM(borrows) AS borrows
+    FROM book_borrow_monthly
+    WHERE month >= DATE_SUB(CURDATE(), INTERVAL :months MONTH)
+    GROUP BY book_id
+    ORDER BY borrows DESC, book_id
+    LIMIT :limit
+""")
+
+_entries = OrderedDict()  # key -> (expires_at, shown book ids, {list name: books})
+_by_book = {}  # book_id -> keys of the entries showing it
+_popular = (None, [])  # (computed_at or None before the first load, [book_id]) most borrowed first
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+
+def result_key(book_ids):
+    """Canonical key for a result set: the same books in any order give the same key."""
+    ids = sorted({int(b) for b in book_ids})
+    return hashlib.blake2b(",".join(map(str, ids)).encode("ascii"), digest_size=16).digest(), ids
+
+
+def _drop(key):
+    _, shown, _ = _entries.pop(key)
+    for book_id in shown:
+        keys = _by_book.get(book_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _by_book[book_id]
+
+
+def get_or_compute(book_ids, compute):
+    """
+    Returns the cached {list name: books} for this result set, calling
+    compute() on a miss. compute() runs outside the lock, so two threads
+    missing on the same key may both compute it.
+    """
+    key, shown = result_key(book_ids)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(key)
+            stats["hits"] += 1
+            return entry[2]
+        if entry is not None:
+            _drop(key)
+        stats["misses"] += 1
+    lists = compute()
+    with _lock:
+        if key in _entries:
+            _drop(key)
+        _entries[key] = (now + TTL_SECONDS, shown, lists)
+        for book_id in shown:
+            _by_book.setdefault(book_id, set()).add(key)
+        while len(_entries) > MAX_ENTRIES:
+            _drop(next(iter(_entries)))
+    return lists
+
+
+def record_borrow(book_id: int, borrower_book_ids=()):
+    """
+    Drops the cached lists of every result set that shows `book_id` or a
+    book the borrower borrowed before (`borrower_book_ids`): the new borrow
+    changes "readers also borrowed" for all of them.
+    """
+    with _lock:
+        keys = set()
+        for shown in {int(book_id), *(int(b) for b in borrower_book_ids)}:
+            keys.update(_by_book.get(shown, ()))
+        for key in keys:
+            _drop(key)
+        stats["invalidated"] += len(keys)
+
+
+def size():
+    """Number of cached result sets."""
+    return len(_entries)
+
+
+def clear():
+    global _popular
+    with _lock:
+        _entries.clear()
+        _by_book.clear()
+        _popular = (None, [])
+
+
+# ---------- Popularity Fallback ----------
+def popular_ids(session: Session):
+    """Most borrowed book ids of the last POPULAR_MONTHS months, recomputed once per POPULAR_MAX_AGE."""
+    global _popular
+    computed_at, ids = _popular
+    # An empty list is a valid result (no borrows yet) and is kept until it ages out too
+    if computed_at is None or time.monotonic() - computed_at > POPULAR_MAX_AGE:
+        rows = session.execute(POPULAR_SQL, {"months": POPULAR_MONTHS, "limit": POPULAR_SIZE})
+        ids = [row.book_id for row in rows]
+        _popular = (time.monotonic(), ids)
+    return ids
+
+
+def popular_books(session: Session, exclude=(), limit: int = 3):
+    """The top `limit` popular books not in `exclude`, as catalogue BookRecords."""
+    import catalogue_cache
+
+    excluded = {int(b) for b in exclude}
+    picked = [b for b in popular_ids(session) if b not in excluded][:limit]
+    return catalogue_cache.get_cache(session).books(picked)
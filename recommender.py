@@ -0,0 +1,246 @@
+"""
+"Recommended for you": implicit-feedback matrix factorization (ALS) over
+borrows and reviews.
+
+train() builds a sparse user x book matrix of interaction strength from the
+borrow history (hot and archived) and the reviews, factorizes it with
+alternating least squares (Hu, Koren & Volinsky's implicit-feedback
+weighting) and saves the user/book factors as .npy files under
+LMS_RECOMMENDER_DIR, with an ann_index over the book factors for "readers
+with similar taste" lookups. The menus map those files read-only and score
+every book with one matrix-vector product per request (see
+benchmarks/recommender.py for training time and recall@K).
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+FACTORS_DIR = Path(os.getenv("LMS_RECOMMENDER_DIR", "recommender"))
+FACTORS = int(os.getenv("LMS_RECOMMENDER_FACTORS", "32"))
+ITERATIONS = 15
+REGULARIZATION = 0.05
+# Confidence per unit of strength: c = 1 + ALPHA * strength
+ALPHA = 10.0
+FORMAT_VERSION = 1
+
+# One row per (user, book): times borrowed plus (rating - 3) when reviewed,
+# so a 5-star review counts as two extra borrows and a 1-star one cancels two.
+INTERACTIONS_SQL = text("""
+    SELECT user_id, book_id, SUM(strength) AS strength
+    FROM (
+        SELECT br.user_id, bc.book_id, 1 AS strength
+        FROM borrows br JOIN book_copies bc ON bc.copy_id = br.copy_id
+        UNION ALL
+        SELECT ba.user_id, bc.book_id, 1 AS strength
+        FROM borrows_archive ba JOIN book_copies bc ON bc.copy_id = ba.copy_id
+        UNION ALL
+        SELECT user_id, book_id, rating - 3 AS strength
+        FROM reviews
+    ) interactions
+    GROUP BY user_id, book_id
+""")
+
+SEEN_SQL = text("""
+    SELECT bc.book_id FROM borrows br JOIN book_copies bc ON bc.copy_id = br.copy_id WHERE br.user_id = :user_id
+    UNION
+    SELECT bc.book_id FROM borrows_archive ba JOIN book_copies bc ON bc.copy_id = ba.copy_id WHERE ba.user_id = :user_id
+    UNION
+    SELECT book_id FROM reviews WHERE user_id = :user_id
+""")
+
+
+# ---------- Training ----------
+def interaction_matrix(rows):
+    """
+    (user_ids, book_ids, csr user x book strength) from (user_id, book_id,
+    strength) rows. Pairs with no positive strength (only low ratings) are
+    dropped. Ids are sorted so they can be searched.
+    """
+    from scipy import sparse
+
+    data = np.array([(u, b, s) for u, b, s in rows if s and s > 0], dtype=np.float64).reshape(-1, 3)
+    user_ids, user_rows = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    book_ids, book_cols = np.unique(data[:, 1].astype(np.int64), return_inverse=True)
+    matrix = sparse.csr_matrix((data[:, 2], (user_rows, book_cols)), shape=(len(user_ids), len(book_ids)))
+    return user_ids, book_ids, matrix
+
+
+def _solve(matrix, fixed, regularization, alpha):
+    """
+    One ALS half-step: the factors for every row of `matrix` given the
+    `fixed` factors of its columns. Each row only adds a correction on the
+    rows it touched to the shared Gram matrix.
+    """
+    k = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(k)
+    solved = np.zeros((matrix.shape[0], k))
+    indptr, indices, strength = matrix.indptr, matrix.indices, matrix.data
+    for row in range(matrix.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        touched = fixed[indices[start:end]]
+        confidence = 1.0 + alpha * strength[start:end]
+        a = gram + (touched.T * (confidence - 1.0)) @ touched
+        solved[row] = np.linalg.solve(a, touched.T @ confidence)
+    return solved
+
+
+def factorize(matrix, factors=FACTORS, iterations=ITERATIONS, regularization=REGULARIZATION,
+              alpha=ALPHA, seed=42):
+    """(user factors, book factors) as float32 arrays for a csr user x book matrix."""
+    rng = np.random.default_rng(seed)
+    users = rng.normal(0, 0.01, (matrix.shape[0], factors))
+    books = rng.normal(0, 0.01, (matrix.shape[1], factors))
+    by_book = matrix.T.tocsr()
+    for _ in range(iterations):
+        users = _solve(matrix, books, regularization, alpha)
+        books = _solve(by_book, users, regularization, alpha)
+    return users.astype(np.float32), books.astype(np.float32)
+
+
+def save(path, user_ids, user_factors, book_ids, book_factors, index=None):
+    """
+    Writes the factors as .npy files into `path` (and `index` into
+    path/ann). They are written to a staging directory that is then renamed
+    over the old one, so a reader never maps files from two trainings.
+    """
+    path = Path(path)
+    staging = path.with_name(path.name + ".staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for name, array in (("user_ids", user_ids), ("user_factors", user_factors),
+                        ("book_ids", book_ids), ("book_factors", book_factors)):
+        np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+    if index is not None:
+        index.save(staging / "ann")
+    (staging / "meta.json").write_text(json.dumps({
+        "version": FORMAT_VERSION, "factors": int(user_factors.shape[1]),
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }))
+    previous = path.with_name(path.name + ".old")
+    if path.exists():
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(path, previous)
+    os.replace(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def train(session: Session, path=FACTORS_DIR, factors=FACTORS, iterations=ITERATIONS):
+    """Trains on the current history and saves the factors and their index; returns {users, books, interactions, seconds}."""
+    from ann_index import IVFIndex
+
+    started = time.perf_counter()
+    user_ids, book_ids, matrix = interaction_matrix(session.execute(INTERACTIONS_SQL))
+    user_factors, book_factors = factorize(matrix, factors, iterations)
+    save(path, user_ids, user_factors, book_ids, book_factors, IVFIndex.build(book_ids, book_factors))
+    invalidate()
+    return {"users": len(user_ids), "books": len(book_ids), "interactions": int(matrix.nnz),
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+# ---------- Serving ----------
+class Factors:
+    """User and book factors mapped read-only from a directory written by save()."""
+
+    def __init__(self, user_ids, user_factors, book_ids, book_factors, trained_at=None, index=None):
+        self.user_ids, self.user_factors = user_ids, user_factors
+        self.book_ids, self.book_factors = book_ids, book_factors
+        self.trained_at = trained_at
+        self.index = index
+
+    @classmethod
+    def open(cls, path=FACTORS_DIR):
+        """Returns None when nothing (or an older format) has been trained at `path`."""
+        from ann_index import IVFIndex
+
+        path = Path(path)
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            if meta["version"] != FORMAT_VERSION:
+                return None
+            arrays = [np.load(path / f"{name}.npy", mmap_mode="r")
+                      for name in ("user_ids", "user_factors", "book_ids", "book_factors")]
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(*arrays, trained_at=meta.get("trained_at"), index=IVFIndex.open(path / "ann"))
+
+    def user_vector(self, user_id):
+        p = int(np.searchsorted(self.user_ids, np.int64(user_id)))
+        if p == len(self.user_ids) or self.user_ids[p] != user_id:
+            return None
+        return self.user_factors[p]
+
+    def top_k(self, user_id, k=5, exclude=()):
+        """[(book_id, score)] best first; [] for users the model has not seen."""
+        vector = self.user_vector(user_id)
+        if vector is None or not len(self.book_ids):
+            return []
+        scores = self.book_factors @ vector
+        if exclude:
+            excluded = np.searchsorted(self.book_ids, np.fromiter(exclude, dtype=np.int64))
+            excluded = excluded[excluded < len(self.book_ids)]
+            excluded = excluded[np.isin(self.book_ids[excluded], list(exclude))]
+            scores[excluded] = -np.inf
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.book_ids[p]), float(scores[p])) for p in best if np.isfinite(scores[p])]
+
+
+_factors = None
+_loaded_mtime = None
+_lock = threading.Lock()
+
+
+def get_factors():
+    """The process-wide factors, remapped when a newer training has been saved; None if untrained."""
+    global _factors, _loaded_mtime
+    with _lock:
+        try:
+            mtime = (FACTORS_DIR / "meta.json").stat().st_mtime
+        except OSError:
+            return None
+        if _factors is None or mtime != _loaded_mtime:
+            _factors, _loaded_mtime = Factors.open(FACTORS_DIR), mtime
+        return _factors
+
+
+def invalidate():
+    global _factors, _loaded_mtime
+    with _lock:
+        _factors, _loaded_mtime = None, None
+
+
+def recommended_for_user(session: Session, user_id: int, k: int = 5):
+    """Top-k books the user has not borrowed or reviewed, as catalogue BookRecords."""
+    import catalogue_cache
+
+    factors = get_factors()
+    if factors is None:
+        return []
+    seen = {row.book_id for row in session.execute(SEEN_SQL, {"user_id": user_id})}
+    ranked = factors.top_k(user_id, k, exclude=seen)
+    return catalogue_cache.get_cache(session).books(book_id for book_id, _ in ranked)
+
+
+def similar_books(session: Session, book_ids, k: int = 3):
+    """
+    Books whose factors point the same way as `book_ids` (read by the same
+    people), via the approximate index; [] until the model has been trained.
+    """
+    import catalogue_cache
+
+    factors = get_factors()
+    if factors is None or factors.index is None:
+        return []
+    ranked = factors.index.similar([int(b) for b in book_ids], k)
+    return catalogue_cache.get_cache(session).books(book_id for book_id, _ in ranked)
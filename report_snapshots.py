@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from rich.console import Console
+
+from db import SessionLocal, read_session
+
+console = Console()
+
+# Reports that aggregate the whole borrows/reviews/fines history; the menu
+# serves these from their latest snapshot instead of re-running them.
+SNAPSHOT_REPORTS = ("2", "4", "5", "7", "8", "10", "12", "13")
+# Daily refresh time (HH:MM, server local time) for the scheduler
+SNAPSHOT_TIME = os.getenv("LMS_REPORT_SNAPSHOT_TIME", "02:00")
+
+
+# ---------- Store ----------
+UPSERT_SQL = text("""
+    INSERT INTO report_snapshots (report_id, taken_at, duration_ms, row_count, rows_json)
+    VALUES (:report_id, NOW(), :duration_ms, :row_count, :rows_json) AS new
+    ON DUPLICATE KEY UPDATE
+        taken_at = new.taken_at,
+        duration_ms = new.duration_ms,
+        row_count = new.row_count,
+        rows_json = new.rows_json
+""")
+
+LATEST_SQL = text("""
+    SELECT taken_at, duration_ms, row_count, rows_json
+    FROM report_snapshots
+    WHERE report_id = :report_id
+""")
+
+
+def store(session: Session, report_id: str, rows, duration_ms: int):
+    """Replaces a report's snapshot with `rows` (no commit)."""
+    data = [dict(row._mapping) for row in rows]
+    session.execute(UPSERT_SQL, {
+        "report_id": report_id,
+        "duration_ms": duration_ms,
+        "row_count": len(data),
+        "rows_json": json.dumps(data, default=str),
+    })
+
+
+def latest(session: Session, report_id: str):
+    """
+    Returns (rows, taken_at) for a report's latest snapshot, or None if it
+    has never been taken. Rows support attribute access like result rows.
+    """
+    snap = session.execute(LATEST_SQL, {"report_id": str(report_id)}).fetchone()
+    if snap is None:
+        return None
+    rows = [SimpleNamespace(**row) for row in json.loads(snap.rows_json)]
+    taken_at = snap.taken_at
+    if isinstance(taken_at, str):  # SQLite stores datetimes as text
+        taken_at = datetime.fromisoformat(taken_at)
+    return rows, taken_at
+
+
+# ---------- Refresh ----------
+def refresh(report_ids=SNAPSHOT_REPORTS, session: Session = None, quiet: bool = False):
+    """
+    Re-runs reports and stores their rows, committing once at the end.
+    The report queries go to the read replica when one is configured; the
+    snapshots are written through `session` (a new primary session if None).
+    Returns {report_id: duration_ms}.
+    """
+    from librarian import REPORTS, run_report
+
+    own_session = session is None
+    if own_session:
+        session = SessionLocal()
+    durations = {}
+    try:
+        with read_session(session) as reader:
+            for report_id in report_ids:
+                started = time.perf_counter()
+                rows = run_report(reader, report_id)
+                durations[report_id] = int((time.perf_counter() - started) * 1000)
+                store(session, report_id, rows, durations[report_id])
+                if not quiet:
+                    console.print(
+                        f"[dim]Snapshot {report_id} ({REPORTS[report_id]['title']}): "
+                        f"{len(rows)} rows in {durations[report_id]} ms[/dim]"
+                    )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
+    return durations
+
+
+def run_scheduler(at: str = SNAPSHOT_TIME, run_now: bool = True):
+    """Refreshes every snapshot report daily at `at` (HH:MM); blocks forever."""
+    import schedule
+
+    if run_now:
+        refresh()
+    schedule.every().day.at(at).do(refresh)
+    console.print(f"[green]Report snapshots scheduled daily at {at}[/green]")
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
@@ -22,6 +22,8 @@ VALUES (1,'Student'),(2,'Teacher'),(3,'Guest');
 CREATE TABLE users (
   user_id BIGINT UNSIGNED PRIMARY KEY AUTO_INCREMENT,
   full_name VARCHAR(120) NOT NULL,
+  username VARCHAR(64) UNIQUE,
+  password_hash VARCHAR(255),
   email VARCHAR(190) NOT NULL UNIQUE,
   phone VARCHAR(24) NULL UNIQUE,
   membership_type_id TINYINT UNSIGNED NOT NULL,
@@ -41,7 +43,8 @@ CREATE TABLE librarians (
   full_name VARCHAR(120) NOT NULL,
   email VARCHAR(190) NOT NULL UNIQUE,
   username VARCHAR(64) NOT NULL UNIQUE,
-  password_hash CHAR(60) NOT NULL
+  -- scrypt$n$r$p$salt$hash (legacy sha256 hex digests are upgraded on login)
+  password_hash VARCHAR(255) NOT NULL
 ) ENGINE=InnoDB;
 
 -- Authors
@@ -80,10 +83,23 @@ CREATE TABLE books (
   published_year YEAR,
   language VARCHAR(48) DEFAULT 'English',
   edition VARCHAR(48),
+  -- Bumped on any change to the book or its author/category links (catalogue_cache refresh)
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_books_updated_at (updated_at),
   FOREIGN KEY (publisher_id) REFERENCES publishers(publisher_id)
     ON UPDATE CASCADE ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Deleted book ids, so catalogue_cache refresh() drops them without counting books
+CREATE TABLE book_tombstones (
+  book_id BIGINT UNSIGNED NOT NULL,
+  deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_book_tombstones_deleted_at (deleted_at)
+) ENGINE=InnoDB;
+
+CREATE TRIGGER books_tombstone AFTER DELETE ON books
+  FOR EACH ROW INSERT INTO book_tombstones (book_id) VALUES (OLD.book_id);
+
 -- M:N Books ↔ Authors
 CREATE TABLE book_authors (
   book_id BIGINT UNSIGNED NOT NULL,
@@ -114,6 +130,9 @@ CREATE TABLE book_copies (
   shelf_location VARCHAR(64),
   condition_code TINYINT UNSIGNED NOT NULL DEFAULT 2,
   is_available BOOLEAN NOT NULL DEFAULT TRUE,
+  -- Written by recommend.py/update.py from the prediction models
+  predicted_borrow_prob FLOAT,
+  predicted_damage_prob FLOAT,
   FOREIGN KEY (book_id) REFERENCES books(book_id)
     ON UPDATE CASCADE ON DELETE RESTRICT,
   CONSTRAINT chk_condition CHECK (condition_code BETWEEN 1 AND 4)
@@ -131,7 +150,12 @@ CREATE TABLE borrows (
   active TINYINT(1) AS (CASE WHEN return_date IS NULL THEN 1 ELSE 0 END) STORED,
   FOREIGN KEY (user_id) REFERENCES users(user_id),
   FOREIGN KEY (copy_id) REFERENCES book_copies(copy_id),
-  FOREIGN KEY (librarian_id) REFERENCES librarians(librarian_id)
+  FOREIGN KEY (librarian_id) REFERENCES librarians(librarian_id),
+  -- Active-loan lookups (return lists, overdue report) stay on a small index range
+  KEY idx_borrows_active_user (active, user_id),
+  KEY idx_borrows_active_due (active, due_date),
+  -- Recent-window scans (trending rebuild)
+  KEY idx_borrows_borrow_date (borrow_date)
 ) ENGINE=InnoDB;
 
 -- Reservations
@@ -178,3 +202,83 @@ CREATE TABLE book_damages (
     FOREIGN KEY (copy_id) REFERENCES book_copies(copy_id)
       ON DELETE CASCADE
 );
+
+-- Per-user account counters, kept current in the same transaction as
+-- issue/return/fine events (rebuild with: python cli.py rebuild-account-stats)
+CREATE TABLE user_account_stats (
+  user_id BIGINT UNSIGNED PRIMARY KEY,
+  total_borrowed INT NOT NULL DEFAULT 0,
+  currently_borrowed INT NOT NULL DEFAULT 0,
+  fines_due DECIMAL(10,2) NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_uas_total_borrowed (total_borrowed),
+  KEY idx_uas_currently_borrowed (currently_borrowed),
+  KEY idx_uas_fines_due (fines_due),
+  FOREIGN KEY (user_id) REFERENCES users(user_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Latest materialized result of each heavy library report, served by the
+-- Library Analytics menu (refresh with: python cli.py snapshot-reports)
+CREATE TABLE report_snapshots (
+  report_id VARCHAR(8) PRIMARY KEY,
+  taken_at DATETIME NOT NULL,
+  duration_ms INT UNSIGNED NOT NULL,
+  row_count INT UNSIGNED NOT NULL,
+  rows_json JSON NOT NULL
+) ENGINE=InnoDB;
+
+-- Per-book borrow rollups (all time and per calendar month), updated in the
+-- issue/return transaction; feeds prediction.py, the most/least borrowed
+-- analytics and reports 2 and 13 (rebuild with: python cli.py rebuild-book-stats)
+CREATE TABLE book_borrow_stats (
+  book_id BIGINT UNSIGNED PRIMARY KEY,
+  total_borrows INT UNSIGNED NOT NULL DEFAULT 0,
+  unique_borrowers INT UNSIGNED NOT NULL DEFAULT 0,
+  returned_count INT UNSIGNED NOT NULL DEFAULT 0,
+  late_returns INT UNSIGNED NOT NULL DEFAULT 0,
+  total_late_days INT UNSIGNED NOT NULL DEFAULT 0,
+  avg_late_days DECIMAL(8,2) AS (IF(returned_count > 0, total_late_days / returned_count, NULL)) STORED,
+  last_borrowed DATE,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY idx_bbs_total_borrows (total_borrows),
+  FOREIGN KEY (book_id) REFERENCES books(book_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE book_borrow_monthly (
+  book_id BIGINT UNSIGNED NOT NULL,
+  month DATE NOT NULL,
+  borrows INT UNSIGNED NOT NULL DEFAULT 0,
+  returns INT UNSIGNED NOT NULL DEFAULT 0,
+  late_days INT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (book_id, month),
+  KEY idx_bbm_month (month),
+  FOREIGN KEY (book_id) REFERENCES books(book_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Cold storage for loans returned more than LMS_BORROWS_HOT_DAYS ago and
+-- without fines (moved by: python cli.py archive-borrows). No foreign keys so
+-- batches move cheaply; borrow ids keep their original values.
+CREATE TABLE borrows_archive (
+  borrow_id BIGINT UNSIGNED PRIMARY KEY,
+  user_id BIGINT UNSIGNED NOT NULL,
+  copy_id BIGINT UNSIGNED NOT NULL,
+  librarian_id BIGINT UNSIGNED,
+  borrow_date DATE NOT NULL,
+  due_date DATE NOT NULL,
+  return_date DATE NOT NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_borrows_archive_user (user_id, borrow_date),
+  KEY idx_borrows_archive_copy (copy_id),
+  KEY idx_borrows_archive_borrow_date (borrow_date)
+) ENGINE=InnoDB;
+
+-- Hot and archived loans together, for full-history reads
+CREATE OR REPLACE VIEW borrows_history AS
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows
+  UNION ALL
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows_archive;
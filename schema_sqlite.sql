@@ -0,0 +1,240 @@
+-- =========================================================
+-- Library Management System (SQLite stand-in for local runs)
+-- Mirrors schema.sql; keep the two in step. Create with:
+--   DATABASE_URL=sqlite:///lms.db python cli.py init-db
+-- =========================================================
+
+-- Lookup tables
+CREATE TABLE IF NOT EXISTS membership_types (
+  membership_type_id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL UNIQUE
+);
+
+INSERT OR IGNORE INTO membership_types (membership_type_id, name)
+VALUES (1,'Student'),(2,'Teacher'),(3,'Guest');
+
+-- Users
+CREATE TABLE IF NOT EXISTS users (
+  user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  full_name TEXT NOT NULL,
+  username TEXT UNIQUE,
+  password_hash TEXT,
+  email TEXT NOT NULL UNIQUE,
+  phone TEXT UNIQUE,
+  membership_type_id INTEGER NOT NULL REFERENCES membership_types (membership_type_id),
+  membership_date DATE NOT NULL,
+  status TEXT NOT NULL DEFAULT 'A' CHECK (status IN ('A','I')),
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Librarians
+CREATE TABLE IF NOT EXISTS librarians (
+  librarian_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  full_name TEXT NOT NULL,
+  email TEXT NOT NULL UNIQUE,
+  username TEXT NOT NULL UNIQUE,
+  password_hash TEXT NOT NULL
+);
+
+-- Authors
+CREATE TABLE IF NOT EXISTS authors (
+  author_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  full_name TEXT NOT NULL UNIQUE,
+  nationality TEXT,
+  birth_year INTEGER,
+  death_year INTEGER
+);
+
+-- Publishers
+CREATE TABLE IF NOT EXISTS publishers (
+  publisher_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL UNIQUE,
+  city TEXT,
+  country TEXT
+);
+
+-- Categories
+CREATE TABLE IF NOT EXISTS categories (
+  category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL UNIQUE,
+  parent_id INTEGER REFERENCES categories(category_id) ON UPDATE CASCADE ON DELETE SET NULL
+);
+
+-- Books
+CREATE TABLE IF NOT EXISTS books (
+  book_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  title TEXT NOT NULL,
+  isbn TEXT UNIQUE,
+  publisher_id INTEGER REFERENCES publishers(publisher_id) ON UPDATE CASCADE ON DELETE SET NULL,
+  published_year INTEGER,
+  language TEXT DEFAULT 'English',
+  edition TEXT,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_books_updated_at ON books (updated_at);
+-- SQLite has no ON UPDATE CURRENT_TIMESTAMP
+CREATE TRIGGER IF NOT EXISTS books_touch_updated_at AFTER UPDATE OF title, isbn, publisher_id, published_year, language, edition ON books
+BEGIN
+  UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE book_id = NEW.book_id;
+END;
+-- Deleted book ids, so catalogue_cache refresh() drops them without counting books
+CREATE TABLE IF NOT EXISTS book_tombstones (
+  book_id INTEGER NOT NULL,
+  deleted_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_book_tombstones_deleted_at ON book_tombstones (deleted_at);
+CREATE TRIGGER IF NOT EXISTS books_tombstone AFTER DELETE ON books
+BEGIN
+  INSERT INTO book_tombstones (book_id) VALUES (OLD.book_id);
+END;
+
+-- M:N Books ↔ Authors
+CREATE TABLE IF NOT EXISTS book_authors (
+  book_id INTEGER NOT NULL REFERENCES books(book_id) ON UPDATE CASCADE ON DELETE CASCADE,
+  author_id INTEGER NOT NULL REFERENCES authors(author_id) ON UPDATE CASCADE ON DELETE RESTRICT,
+  PRIMARY KEY (book_id, author_id)
+);
+
+-- M:N Books ↔ Categories
+CREATE TABLE IF NOT EXISTS book_categories (
+  book_id INTEGER NOT NULL REFERENCES books(book_id) ON UPDATE CASCADE ON DELETE CASCADE,
+  category_id INTEGER NOT NULL REFERENCES categories(category_id) ON UPDATE CASCADE ON DELETE RESTRICT,
+  PRIMARY KEY (book_id, category_id)
+);
+
+-- Book copies
+CREATE TABLE IF NOT EXISTS book_copies (
+  copy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  book_id INTEGER NOT NULL REFERENCES books(book_id) ON UPDATE CASCADE ON DELETE RESTRICT,
+  barcode TEXT NOT NULL UNIQUE,
+  shelf_location TEXT,
+  condition_code INTEGER NOT NULL DEFAULT 2 CHECK (condition_code BETWEEN 1 AND 4),
+  is_available INTEGER NOT NULL DEFAULT TRUE,
+  predicted_borrow_prob REAL,
+  predicted_damage_prob REAL
+);
+CREATE INDEX IF NOT EXISTS idx_book_copies_book ON book_copies (book_id);
+
+-- Borrow records
+CREATE TABLE IF NOT EXISTS borrows (
+  borrow_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL REFERENCES users(user_id),
+  copy_id INTEGER NOT NULL REFERENCES book_copies(copy_id),
+  librarian_id INTEGER REFERENCES librarians(librarian_id),
+  borrow_date DATE NOT NULL,
+  due_date DATE NOT NULL,
+  return_date DATE,
+  active INTEGER GENERATED ALWAYS AS (CASE WHEN return_date IS NULL THEN 1 ELSE 0 END) STORED
+);
+CREATE INDEX IF NOT EXISTS idx_borrows_user ON borrows (user_id);
+CREATE INDEX IF NOT EXISTS idx_borrows_copy ON borrows (copy_id);
+CREATE INDEX IF NOT EXISTS idx_borrows_active_user ON borrows (active, user_id);
+CREATE INDEX IF NOT EXISTS idx_borrows_active_due ON borrows (active, due_date);
+CREATE INDEX IF NOT EXISTS idx_borrows_borrow_date ON borrows (borrow_date);
+
+-- Reservations
+CREATE TABLE IF NOT EXISTS reservations (
+  reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL REFERENCES users(user_id),
+  book_id INTEGER NOT NULL REFERENCES books(book_id),
+  reservation_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  status INTEGER NOT NULL DEFAULT 1
+);
+
+-- Fines
+CREATE TABLE IF NOT EXISTS fines (
+  fine_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  borrow_id INTEGER NOT NULL REFERENCES borrows(borrow_id) ON DELETE CASCADE,
+  amount DECIMAL(8,2) NOT NULL,
+  paid INTEGER NOT NULL DEFAULT FALSE,
+  payment_date DATE
+);
+CREATE INDEX IF NOT EXISTS idx_fines_borrow ON fines (borrow_id);
+
+-- Reviews
+CREATE TABLE IF NOT EXISTS reviews (
+  review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL REFERENCES users(user_id),
+  book_id INTEGER NOT NULL REFERENCES books(book_id),
+  rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+  comment TEXT,
+  review_date DATE NOT NULL DEFAULT (CURRENT_DATE),
+  UNIQUE (user_id, book_id)
+);
+
+CREATE TABLE IF NOT EXISTS book_damages (
+  damage_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  copy_id INTEGER NOT NULL REFERENCES book_copies(copy_id) ON DELETE CASCADE,
+  damage_date DATE NOT NULL,
+  description TEXT
+);
+
+-- Per-user account counters
+CREATE TABLE IF NOT EXISTS user_account_stats (
+  user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  total_borrowed INTEGER NOT NULL DEFAULT 0,
+  currently_borrowed INTEGER NOT NULL DEFAULT 0,
+  fines_due DECIMAL(10,2) NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_uas_total_borrowed ON user_account_stats (total_borrowed);
+CREATE INDEX IF NOT EXISTS idx_uas_currently_borrowed ON user_account_stats (currently_borrowed);
+CREATE INDEX IF NOT EXISTS idx_uas_fines_due ON user_account_stats (fines_due);
+
+-- Materialized library report snapshots
+CREATE TABLE IF NOT EXISTS report_snapshots (
+  report_id TEXT PRIMARY KEY,
+  taken_at DATETIME NOT NULL,
+  duration_ms INTEGER NOT NULL,
+  row_count INTEGER NOT NULL,
+  rows_json TEXT NOT NULL
+);
+
+-- Per-book borrow rollups
+CREATE TABLE IF NOT EXISTS book_borrow_stats (
+  book_id INTEGER PRIMARY KEY REFERENCES books(book_id) ON DELETE CASCADE,
+  total_borrows INTEGER NOT NULL DEFAULT 0,
+  unique_borrowers INTEGER NOT NULL DEFAULT 0,
+  returned_count INTEGER NOT NULL DEFAULT 0,
+  late_returns INTEGER NOT NULL DEFAULT 0,
+  total_late_days INTEGER NOT NULL DEFAULT 0,
+  avg_late_days REAL GENERATED ALWAYS AS (
+    CASE WHEN returned_count > 0 THEN ROUND(CAST(total_late_days AS REAL) / returned_count, 2) END
+  ) STORED,
+  last_borrowed DATE,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_bbs_total_borrows ON book_borrow_stats (total_borrows);
+
+CREATE TABLE IF NOT EXISTS book_borrow_monthly (
+  book_id INTEGER NOT NULL REFERENCES books(book_id) ON DELETE CASCADE,
+  month TEXT NOT NULL,
+  borrows INTEGER NOT NULL DEFAULT 0,
+  returns INTEGER NOT NULL DEFAULT 0,
+  late_days INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (book_id, month)
+);
+CREATE INDEX IF NOT EXISTS idx_bbm_month ON book_borrow_monthly (month);
+
+-- Cold storage for old returned loans
+CREATE TABLE IF NOT EXISTS borrows_archive (
+  borrow_id INTEGER PRIMARY KEY,
+  user_id INTEGER NOT NULL,
+  copy_id INTEGER NOT NULL,
+  librarian_id INTEGER,
+  borrow_date DATE NOT NULL,
+  due_date DATE NOT NULL,
+  return_date DATE NOT NULL,
+  archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_user ON borrows_archive (user_id, borrow_date);
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_copy ON borrows_archive (copy_id);
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_borrow_date ON borrows_archive (borrow_date);
+
+CREATE VIEW IF NOT EXISTS borrows_history AS
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows
+  UNION ALL
+  SELECT borrow_id, user_id, copy_id, librarian_id, borrow_date, due_date, return_date
+  FROM borrows_archive;
@@ -0,0 +1,228 @@
+"""
+HTTP/JSON front end for branch-desk terminals.
+
+One process owns the connection pool and the in-process caches (lookup
+tables, user identities); every terminal talks to it over HTTP instead of
+holding its own database session.
+
+    python cli.py serve --port 8080
+
+    GET  /search?term=potter&by=title&copies=1
+    POST /issue     {"user_id": 12, "book_id": 345, "librarian_id": 1}
+    POST /return    {"borrow_id": 6789, "user_id": 12}
+    GET  /account/<user_id>
+    GET  /reports/<report_id>
+    GET  /health
+"""
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import query_tracer
+
+# Requests processed at once; beyond this the server answers 503 instead of
+# queueing on the pool. Defaults to the pool's hard limit.
+MAX_IN_FLIGHT = int(os.getenv("LMS_HTTP_MAX_IN_FLIGHT", str(db.POOL_SIZE + db.MAX_OVERFLOW)))
+# How long a request may wait for a free slot before being turned away
+QUEUE_WAIT = float(os.getenv("LMS_HTTP_QUEUE_WAIT", "0.5"))
+RETRY_AFTER = 1
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message, **extra}
+
+
+def _rows(rows):
+    return [dict(row._mapping) for row in rows]
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be an integer")
+
+
+# ---------- Handlers ----------
+# Each takes (session, params, body) and returns a JSON-serialisable payload.
+def handle_search(session, params, body):
+    from student import find_books
+
+    term = params.get("term")
+    if not term:
+        raise HTTPError(400, "missing 'term'")
+    by = params.get("by", "title")
+    copies = params.get("copies", "0") not in ("0", "false", "")
+    try:
+        rows = find_books(session, by, term, with_copies=copies)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return {"by": by, "term": term, "results": _rows(rows)}
+
+
+def handle_issue(session, params, body):
+    from student import borrow_book
+
+    user_id = _int(body.get("user_id"), "user_id")
+    book_id = _int(body.get("book_id"), "book_id")
+    librarian_id = body.get("librarian_id")
+    if librarian_id is not None:
+        librarian_id = _int(librarian_id, "librarian_id")
+    borrow = borrow_book(session, user_id, book_id, librarian_id)
+    if borrow is None:
+        raise HTTPError(409, "no available copy", book_id=book_id)
+    return borrow
+
+
+def handle_return(session, params, body):
+    from student import return_borrow
+
+    borrow_id = _int(body.get("borrow_id"), "borrow_id")
+    user_id = body.get("user_id")
+    if user_id is not None:
+        user_id = _int(user_id, "user_id")
+    borrow = return_borrow(session, borrow_id, user_id)
+    if borrow is None:
+        raise HTTPError(404, "no such active borrow", borrow_id=borrow_id)
+    return borrow
+
+
+def handle_account(session, params, body, user_id):
+    import session_cache
+
+    cached = session_cache.identity(_int(user_id, "user_id"))
+    profile = cached.profile(session)
+    if profile is None:
+        raise HTTPError(404, "no such user", user_id=user_id)
+    return {"user_id": cached.user_id, **profile, **cached.counters(session)}
+
+
+def handle_report(session, params, body, report_id):
+    from librarian import REPORTS, run_report
+
+    if report_id not in REPORTS:
+        raise HTTPError(404, f"unknown report '{report_id}'", reports=sorted(REPORTS, key=int))
+    return {"report": report_id, "title": REPORTS[report_id]["title"], "rows": _rows(run_report(session, report_id))}
+
+
+# (method, path, handler, read_only); read-only routes use the replica when configured
+ROUTES = [
+    ("GET", re.compile(r"^/search$"), handle_search, True),
+    ("POST", re.compile(r"^/issue$"), handle_issue, False),
+    ("POST", re.compile(r"^/return$"), handle_return, False),
+    ("GET", re.compile(r"^/account/(\w+)$"), handle_account, False),
+    ("GET", re.compile(r"^/reports/(\w+)$"), handle_report, True),
+]
+
+
+# ---------- Server ----------
+class LibraryRequestHandler(BaseHTTPRequestHandler):
+    server_version = "LibraryHTTP/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+
+        if url.path == "/health":
+            return self.send_json(200, {"status": "ok", "in_flight": self.server.in_flight()}, started)
+
+        for route_method, pattern, handler, read_only in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            return self.send_json(404, {"error": f"no route for {url.path}"}, started)
+        if route_method != method:
+            return self.send_json(405, {"error": f"use {route_method} for {url.path}"}, started)
+
+        if not self.server.slots.acquire(timeout=QUEUE_WAIT):
+            return self.send_json(503, {"error": "server busy"}, started, {"Retry-After": str(RETRY_AFTER)})
+        try:
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            body = self.read_body() if method == "POST" else {}
+            new_session = db.ReadSessionLocal if read_only else db.SessionLocal
+            with query_tracer.trace_action(f"{method} {url.path}") as trace, new_session() as session:
+                db_started = time.perf_counter()
+                payload = handler(session, params, body, *match.groups())
+                db_ms = (time.perf_counter() - db_started) * 1000
+            status = 200
+        except HTTPError as e:
+            status, payload, trace, db_ms = e.status, e.payload, None, None
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            status, payload, trace, db_ms = 500, {"error": "internal error"}, None, None
+        finally:
+            self.server.slots.release()
+
+        timing = {}
+        if db_ms is not None:
+            timing["Server-Timing"] = f'db;dur={db_ms:.1f};desc="{trace.total} queries"'
+        self.send_json(status, payload, started, timing)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload, started, headers=None):
+        data = json.dumps(payload, default=str).encode()
+        total_ms = (time.perf_counter() - started) * 1000
+        headers = dict(headers or {})
+        timing = headers.pop("Server-Timing", None)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Response-Time", f"{total_ms:.1f}ms")
+        self.send_header("Server-Timing", ", ".join(filter(None, [timing, f"total;dur={total_ms:.1f}"])))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class LibraryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_in_flight: int = MAX_IN_FLIGHT):
+        super().__init__(address, LibraryRequestHandler)
+        self.max_in_flight = max_in_flight
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+
+    def in_flight(self):
+        return self.max_in_flight - self.slots._value
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, max_in_flight: int = MAX_IN_FLIGHT):
+    """Runs the server until interrupted, then releases the pool."""
+    httpd = LibraryServer((host, port), max_in_flight)
+    print(f"Serving on http://{host}:{port} (max {max_in_flight} requests in flight)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if db._engine is not None:
+            db._engine.dispose()
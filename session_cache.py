@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import account_stats
+
+
+# Long-lived processes (the HTTP server) see profile edits made elsewhere after this long
+PROFILE_TTL_SECONDS = float(os.getenv("LMS_PROFILE_TTL", "60"))
+MAX_IDENTITIES = int(os.getenv("LMS_IDENTITY_CACHE_SIZE", "10000"))
+
+
+# ---------- Lookup Tables ----------
+# Static reference data, loaded once per process: table -> (id column, name column)
+LOOKUP_TABLES = {
+    "membership_types": ("membership_type_id", "name"),
+}
+
+_lookups = {}
+
+
+def lookup(session: Session, table: str):
+    """Returns {id: name} for a static lookup table, querying it only once."""
+    if table not in _lookups:
+        id_col, name_col = LOOKUP_TABLES[table]
+        rows = session.execute(text(f"SELECT {id_col} AS id, {name_col} AS name FROM {table}"))
+        _lookups[table] = {row.id: row.name for row in rows}
+    return _lookups[table]
+
+
+def clear_lookups():
+    _lookups.clear()
+
+
+# ---------- Per-user Identity ----------
+PROFILE_SQL = text("""
+    SELECT full_name, email, phone, membership_type_id, membership_date, status
+    FROM users
+    WHERE user_id = :user_id
+""")
+
+
+class Identity:
+    """
+    Cached profile for one user, reloaded after invalidate() or once it is
+    PROFILE_TTL_SECONDS old, so edits made by other processes show up.
+    Borrow/fine counters are not cached here: they come from the
+    user_account_stats counter store, which is a single primary-key read.
+    """
+    __slots__ = ("user_id", "_profile", "_loaded_at")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._profile = None
+        self._loaded_at = 0.0
+
+    def profile(self, session: Session):
+        if self._profile is None or time.monotonic() - self._loaded_at > PROFILE_TTL_SECONDS:
+            row = session.execute(PROFILE_SQL, {"user_id": self.user_id}).fetchone()
+            if row is None:
+                self._profile = None
+                forget(self.user_id)
+                return None
+            profile = dict(row._mapping)
+            profile["membership_type"] = lookup(session, "membership_types").get(row.membership_type_id, "-")
+            self._profile, self._loaded_at = profile, time.monotonic()
+            _remember(self)
+        return self._profile
+
+    def counters(self, session: Session):
+        return account_stats.get_stats(session, self.user_id)
+
+    def invalidate(self):
+        self._profile = None
+
+
+# Least recently used first; only users whose profile loaded are kept
+_identities = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(cached: Identity):
+    with _lock:
+        _identities[cached.user_id] = cached
+        _identities.move_to_end(cached.user_id)
+        while len(_identities) > MAX_IDENTITIES:
+            _identities.popitem(last=False)
+
+
+def identity(user_id: int) -> Identity:
+    """
+    Returns the cached Identity for a user, or a new empty one. A new
+    Identity joins the cache only once its profile loads, so lookups of
+    unknown ids leave nothing behind.
+    """
+    user_id = int(user_id)
+    with _lock:
+        cached = _identities.get(user_id)
+        if cached is not None:
+            _identities.move_to_end(user_id)
+            return cached
+    return Identity(user_id)
+
+
+def forget(user_id: int):
+    """Drops a user's cached identity (on logout)."""
+    with _lock:
+        _identities.pop(int(user_id), None)
+
+
+# ---------- Change Hooks ----------
+def invalidate_profile(user_id: int):
+    """Reloads the profile on next use in this process; others pick the change up within PROFILE_TTL_SECONDS."""
+    with _lock:
+        cached = _identities.get(int(user_id))
+    if cached:
+        cached.invalidate()
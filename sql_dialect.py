@@ -0,0 +1,209 @@
+"""
+Runs the app's MySQL-flavoured SQL on SQLite.
+
+The SQL in the modules stays written for MySQL. When DATABASE_URL points at
+SQLite, install_sqlite() registers the MySQL functions the app uses as SQLite
+functions and rewrites the few constructs SQLite can't parse just before
+each statement reaches the driver:
+
+    INSERT IGNORE                     -> INSERT OR IGNORE
+    ON DUPLICATE KEY UPDATE VALUES(c) -> ON CONFLICT DO UPDATE SET excluded.c
+    VALUES (...) AS new ON DUPLICATE KEY UPDATE new.c
+                                      -> VALUES (...) ON CONFLICT DO UPDATE SET excluded.c
+    SELECT * FROM (...) AS new ON DUPLICATE KEY UPDATE new.c
+                                      -> ... AS new WHERE true ON CONFLICT DO UPDATE SET excluded.c
+    DATE_ADD/DATE_SUB(d, INTERVAL n X)-> _date_add(d, n, 'X')
+    DELETE ... WHERE ... LIMIT n      -> DELETE ... WHERE rowid IN (SELECT ... LIMIT n)
+    SELECT ... FOR UPDATE [SKIP LOCKED] -> SELECT ... (SQLite serializes writers)
+"""
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import event
+
+
+def is_sqlite(url) -> bool:
+    return str(url).startswith("sqlite")
+
+
+# ---------- MySQL Functions ----------
+# Dates are stored as ISO text ('YYYY-MM-DD[ HH:MM:SS]').
+def _to_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value if isinstance(value, datetime) else datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value)[:19])
+
+
+def _curdate():
+    return date.today().isoformat()
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _datediff(a, b):
+    a, b = _to_date(a), _to_date(b)
+    if a is None or b is None:
+        return None
+    return (a.date() - b.date()).days
+
+
+def _date_add(value, amount, unit):
+    d = _to_date(value)
+    if d is None or amount is None:
+        return None
+    amount, unit = int(amount), unit.upper()
+    if unit == "DAY":
+        d += timedelta(days=amount)
+    elif unit == "WEEK":
+        d += timedelta(weeks=amount)
+    elif unit in ("MONTH", "YEAR"):
+        months = d.month - 1 + amount * (12 if unit == "YEAR" else 1)
+        year, month = d.year + months // 12, months % 12 + 1
+        d = d.replace(year=year, month=month, day=min(d.day, calendar.monthrange(year, month)[1]))
+    else:
+        raise ValueError(f"Unsupported INTERVAL unit {unit}")
+    is_date_only = isinstance(value, date) and not isinstance(value, datetime) or len(str(value)) == 10
+    return d.date().isoformat() if is_date_only else d.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _date_format(value, fmt):
+    d = _to_date(value)
+    if d is None:
+        return None
+    # MySQL's %i (minutes) is strftime's %M; MySQL's %M (month name) is %B
+    fmt = fmt.replace("%M", "%B").replace("%i", "%M").replace("%s", "%S")
+    return d.strftime(fmt)
+
+
+def _greatest(*args):
+    return None if any(a is None for a in args) else max(args)
+
+
+def _least(*args):
+    return None if any(a is None for a in args) else min(args)
+
+
+def _if(condition, then, otherwise):
+    return then if condition else otherwise
+
+
+FUNCTIONS = [
+    ("CURDATE", 0, _curdate, False),
+    ("NOW", 0, _now, False),
+    ("DATEDIFF", 2, _datediff, True),
+    ("DATE_FORMAT", 2, _date_format, True),
+    ("_date_add", 3, _date_add, True),
+    ("GREATEST", -1, _greatest, True),
+    ("LEAST", -1, _least, True),
+    ("IF", 3, _if, True),
+]
+
+
+# ---------- Statement Rewriting ----------
+_INSERT_IGNORE_RE = re.compile(r"\bINSERT\s+IGNORE\b", re.I)
+_ON_DUPLICATE_RE = re.compile(r"(?:\bAS\s+(\w+)\s+)?\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_FN_RE = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE(\s+(SKIP\s+LOCKED|NOWAIT))?", re.I)
+_DELETE_LIMIT_RE = re.compile(r"^\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.*?)\s+LIMIT\s+(\S+)\s*$", re.I | re.S)
+_DATE_ARITH_RE = re.compile(r"\bDATE_(ADD|SUB)\s*\(", re.I)
+_INTERVAL_RE = re.compile(r"^\s*INTERVAL\s+(.+?)\s+(DAY|WEEK|MONTH|YEAR)\s*$", re.I | re.S)
+
+
+def _split_args(sql, start):
+    """Splits the call whose '(' is at sql[start-1] into top-level args; returns (args, end index)."""
+    depth, args, current = 0, [], start
+    for i in range(start, len(sql)):
+        ch = sql[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            if depth == 0:
+                args.append(sql[current:i])
+                return args, i + 1
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(sql[current:i])
+            current = i + 1
+    raise ValueError("Unbalanced parentheses in DATE_ADD/DATE_SUB")
+
+
+def _rewrite_date_arith(sql):
+    while True:
+        match = _DATE_ARITH_RE.search(sql)
+        if not match:
+            return sql
+        args, end = _split_args(sql, match.end())
+        interval = _INTERVAL_RE.match(args[1]) if len(args) == 2 else None
+        if not interval:
+            raise ValueError(f"Unsupported DATE_{match.group(1)} call: {sql[match.start():end]}")
+        amount, unit = interval.groups()
+        if match.group(1).upper() == "SUB":
+            amount = f"-({amount})"
+        sql = f"{sql[:match.start()]}_date_add({args[0].strip()}, {amount}, '{unit.upper()}'){sql[end:]}"
+
+
+@lru_cache(maxsize=1024)
+def mysql_to_sqlite(sql: str) -> str:
+    """Rewrites one MySQL statement into SQLite syntax (see module docstring)."""
+    sql = _INSERT_IGNORE_RE.sub("INSERT OR IGNORE", sql)
+    match = _ON_DUPLICATE_RE.search(sql)
+    if match:
+        head, alias = sql[:match.start()], match.group(1)
+        assignments = _VALUES_FN_RE.sub(r"excluded.\1", sql[match.end():])
+        if alias:
+            assignments = re.sub(rf"\b{alias}\.", "excluded.", assignments)
+            # A derived table keeps its alias; WHERE true stops SQLite reading ON CONFLICT as a join
+            if head.rstrip().endswith(")") and re.search(r"\bFROM\s*\(", head, re.I):
+                head = f"{head}AS {alias} WHERE true "
+        sql = f"{head}ON CONFLICT DO UPDATE SET{assignments}"
+    sql = _FOR_UPDATE_RE.sub("", sql)
+    sql = _rewrite_date_arith(sql)
+    delete = _DELETE_LIMIT_RE.match(sql)
+    if delete:
+        table, where, limit = delete.groups()
+        sql = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT {limit})"
+    return sql
+
+
+# ---------- Engine Hooks ----------
+def _on_connect(dbapi_connection, connection_record):
+    for name, narg, func, deterministic in FUNCTIONS:
+        dbapi_connection.create_function(name, narg, func, deterministic=deterministic)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA busy_timeout = 5000")
+    cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    return mysql_to_sqlite(statement), parameters
+
+
+def install_sqlite(engine):
+    """Registers the MySQL compatibility layer on a SQLite engine (idempotent)."""
+    if not event.contains(engine, "connect", _on_connect):
+        event.listen(engine, "connect", _on_connect)
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute, retval=True)
+    return engine
+
+
+SQLITE_SCHEMA = Path(__file__).resolve().parent / "schema_sqlite.sql"
+
+
+def init_sqlite(engine, schema_path=SQLITE_SCHEMA):
+    """Creates the tables from the SQLite schema (safe to re-run)."""
+    script = Path(schema_path).read_text(encoding="utf-8")
+    raw = engine.raw_connection()
+    try:
+        raw.driver_connection.executescript(script)
+        raw.commit()
+    finally:
+        raw.close()
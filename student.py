@@ -1,9 +1,20 @@
 from rich.console import Console
 import typer
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from rich.table import Table
 
+import account_stats
+import book_stats
+import borrow_archive
+import catalogue_cache
+import recommendation_cache
+import recommender
+import session_cache
+import trending
+from db import read_session
+from query_tracer import traced
+
 
 console = Console()
 
@@ -24,92 +35,70 @@ def ensure_tuple(lst):
 # ---------- RECOMMENDATION FUNCTIONS (NEW) -------------
 def fetch_also_borrowed_books(session: Session, shown_book_ids):
     """
-    Recommend: Those who borrowed these also borrowed...
+    Recommend: Those who borrowed these also borrowed... (hot and archived loans)
     """
     shown_book_ids = ensure_tuple(shown_book_ids)
     if shown_book_ids == (None,):
         return []
     user_id_query = text("""
         SELECT DISTINCT b.user_id
-        FROM borrows b
+        FROM borrows_history b
         JOIN book_copies bc ON b.copy_id = bc.copy_id
         WHERE bc.book_id IN :shown_book_ids
-    """)
+    """).bindparams(bindparam("shown_book_ids", expanding=True))
     user_ids = [row.user_id for row in session.execute(user_id_query, {"shown_book_ids": shown_book_ids})]
     user_ids = ensure_tuple(user_ids)
     if user_ids == (None,):
         return []
     rec_query = text("""
         SELECT bc.book_id, COUNT(*) AS borrow_count
-        FROM borrows b
+        FROM borrows_history b
         JOIN book_copies bc ON b.copy_id = bc.copy_id
         WHERE b.user_id IN :user_ids
             AND bc.book_id NOT IN :shown_book_ids
         GROUP BY bc.book_id
         ORDER BY borrow_count DESC
         LIMIT 3
-    """)
+    """).bindparams(bindparam("user_ids", expanding=True), bindparam("shown_book_ids", expanding=True))
     rec_rows = session.execute(
         rec_query, {"user_ids": user_ids, "shown_book_ids": shown_book_ids}
     ).fetchall()
-    rec_book_ids = [row.book_id for row in rec_rows]
-    rec_book_ids = ensure_tuple(rec_book_ids)
-    if rec_book_ids == (None,):
-        return []
-    book_query = text("""
-        SELECT b.book_id, b.title, GROUP_CONCAT(DISTINCT a.full_name) AS authors
-        FROM books b
-        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-        LEFT JOIN authors a ON ba.author_id = a.author_id
-        WHERE b.book_id IN :rec_book_ids
-        GROUP BY b.book_id
-    """)
-    return session.execute(book_query, {"rec_book_ids": rec_book_ids}).fetchall()
+    # Titles and authors come from the in-process catalogue, in borrow-count order
+    return catalogue_cache.get_cache(session).books(row.book_id for row in rec_rows)
 
 def fetch_similar_items(session: Session, shown_book_ids):
     """
     Recommend: Similar items (by author/category)
     """
-    shown_book_ids = ensure_tuple(shown_book_ids)
-    if shown_book_ids == (None,):
+    if not shown_book_ids:
         return []
-    rel_query = text("""
-        SELECT DISTINCT ba.author_id, bc.category_id
-        FROM books b
-        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-        LEFT JOIN book_categories bc ON b.book_id = bc.book_id
-        WHERE b.book_id IN :shown_book_ids
-    """)
-    rels = session.execute(rel_query, {"shown_book_ids": shown_book_ids}).fetchall()
-    author_ids = set()
-    category_ids = set()
-    for rel in rels:
-        if rel.author_id:
-            author_ids.add(rel.author_id)
-        if rel.category_id:
-            category_ids.add(rel.category_id)
-    author_ids = ensure_tuple(author_ids)
-    category_ids = ensure_tuple(category_ids)
-    if author_ids == (None,) and category_ids == (None,):
+    return catalogue_cache.get_cache(session).similar(shown_book_ids, limit=3)
+
+def fetch_taste_neighbours(session: Session, shown_book_ids):
+    """
+    Recommend: Readers with similar taste liked (nearest books in the CF factor space)
+    """
+    if not shown_book_ids:
         return []
-    sim_query = text("""
-        SELECT DISTINCT b.book_id, b.title, GROUP_CONCAT(DISTINCT a.full_name) AS authors
-        FROM books b
-        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-        LEFT JOIN authors a ON ba.author_id = a.author_id
-        LEFT JOIN book_categories bc ON b.book_id = bc.book_id
-        WHERE (ba.author_id IN :author_ids OR bc.category_id IN :category_ids)
-            AND b.book_id NOT IN :shown_book_ids
-        GROUP BY b.book_id
-        LIMIT 3
-    """)
-    return session.execute(
-        sim_query, {
-            "author_ids": author_ids,
-            "category_ids": category_ids,
-            "shown_book_ids": shown_book_ids
+    return recommender.similar_books(session, shown_book_ids, k=3)
+
+def search_recommendations(session: Session, shown_book_ids):
+    """
+    All three recommendation lists for a result set, from the recommendation
+    cache when this set was shown recently. When "also borrowed" is empty,
+    "popular" holds the currently popular books instead.
+    """
+    def compute():
+        also_borrowed = fetch_also_borrowed_books(session, shown_book_ids)
+        similar_items = fetch_similar_items(session, shown_book_ids)
+        return {
+            "also_borrowed": also_borrowed,
+            "similar_items": similar_items,
+            "taste_neighbours": fetch_taste_neighbours(session, shown_book_ids),
+            # Stands in for "also borrowed" when nobody borrowed alongside these books
+            "popular": [] if also_borrowed else recommendation_cache.popular_books(session, shown_book_ids),
         }
-    ).fetchall()
+    return recommendation_cache.get_or_compute(shown_book_ids, compute)
 # ---------------------------------------------------------------
 
 # ---------- SEARCH FUNCTION ----------
@@ -206,6 +195,90 @@ def search_books(session: Session):
 # my_borrowed_books, display_books, issue_book, return_book, view_account, update_full_name, update_phone,
 # account_menu, student_menu
 
+# ---------- SEARCH QUERIES ----------
+SEARCH_MODES = {"1": "title", "2": "author", "3": "category"}
+
+SEARCH_FILTERS = {
+    "title": "b.title LIKE :term",
+    "author": "REPLACE(REPLACE(LOWER(a.full_name), '.', ''), ' ', '') LIKE :term",
+    "category": "c.name LIKE :term",
+}
+
+
+def search_pattern(mode: str, term: str) -> str:
+    if mode == "author":
+        # Normalize input: lowercase, remove dots & spaces
+        term = term.lower().replace(".", "").replace(" ", "")
+    return f"%{term}%"
+
+
+def search_query(mode: str, with_copies: bool = False):
+    """Builds the search statement for a mode; `with_copies` adds total/available copy counts."""
+    if mode not in SEARCH_FILTERS:
+        raise ValueError(f"Unknown search mode '{mode}'")
+    copy_columns = """,
+               (SELECT COUNT(*) FROM book_copies x WHERE x.book_id = b.book_id) AS total_copies,
+               (SELECT COUNT(*) FROM book_copies x
+                WHERE x.book_id = b.book_id AND x.is_available = TRUE) AS available_copies""" if with_copies else ""
+    return text(f"""
+        SELECT b.book_id, b.title,
+               GROUP_CONCAT(DISTINCT a.full_name) AS authors,
+               GROUP_CONCAT(DISTINCT c.name) AS categories{copy_columns}
+        FROM books b
+        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
+        LEFT JOIN authors a ON ba.author_id = a.author_id
+        LEFT JOIN book_categories bc ON b.book_id = bc.book_id
+        LEFT JOIN categories c ON bc.category_id = c.category_id
+        WHERE {SEARCH_FILTERS[mode]}
+        GROUP BY b.book_id
+    """)
+
+
+def find_books(session: Session, mode: str, term: str, with_copies: bool = False):
+    """Runs a title/author/category search and returns the matching rows."""
+    query = search_query(mode, with_copies)
+    return session.execute(query, {"term": search_pattern(mode, term)}).fetchall()
+
+
+# Only the ids are matched in SQL; the menus render the rows from catalogue_cache
+SEARCH_ID_QUERIES = {
+    "title": "SELECT b.book_id FROM books b WHERE {filter} ORDER BY b.book_id",
+    "author": """
+        SELECT DISTINCT ba.book_id FROM authors a
+        JOIN book_authors ba ON ba.author_id = a.author_id
+        WHERE {filter} ORDER BY ba.book_id
+    """,
+    "category": """
+        SELECT DISTINCT bc.book_id FROM categories c
+        JOIN book_categories bc ON bc.category_id = c.category_id
+        WHERE {filter} ORDER BY bc.book_id
+    """,
+}
+
+
+def find_book_ids(session: Session, mode: str, term: str):
+    """Ids of the books a title/author/category search matches."""
+    if mode not in SEARCH_ID_QUERIES:
+        raise ValueError(f"Unknown search mode '{mode}'")
+    query = text(SEARCH_ID_QUERIES[mode].format(filter=SEARCH_FILTERS[mode]))
+    return [row.book_id for row in session.execute(query, {"term": search_pattern(mode, term)})]
+
+
+AVAILABLE_COPIES_SQL = text("""
+    SELECT book_id, COUNT(*) AS available_copies
+    FROM book_copies
+    WHERE is_available = TRUE
+    GROUP BY book_id
+""")
+
+
+def available_books(session: Session):
+    """(BookRecord, available copies) for every book with a free copy, sorted by title."""
+    counts = {row.book_id: row.available_copies for row in session.execute(AVAILABLE_COPIES_SQL)}
+    books = catalogue_cache.get_cache(session).books(counts)
+    return sorted(((book, counts[book.book_id]) for book in books), key=lambda pair: pair[0].title)
+
+
 # ---------- SEARCH FUNCTION ----------
 def display_recommendations(books, title, session):
     """Display recommendations in a formatted way"""
@@ -235,62 +308,14 @@ def search_books(session: Session):
         if choice == "4":
             break
 
-        term = typer.prompt("Enter search term")
-
-        if choice == "1":  # Title
-            like_term = f"%{term}%"
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bc ON b.book_id = bc.book_id
-                LEFT JOIN categories c ON bc.category_id = c.category_id
-                WHERE b.title LIKE :term
-                GROUP BY b.book_id
-            """)
-
-        elif choice == "2":  # Author
-            # Normalize input: lowercase, remove dots & spaces
-            search_term = term.lower().replace(".", "").replace(" ", "")
-            like_term = f"%{search_term}%"
-
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bc ON b.book_id = bc.book_id
-                LEFT JOIN categories c ON bc.category_id = c.category_id
-                WHERE REPLACE(REPLACE(LOWER(a.full_name), '.', ''), ' ', '') LIKE :term
-                GROUP BY b.book_id
-            """)
-
-        elif choice == "3":  # Category
-            like_term = f"%{term}%"
-            query = text("""
-                SELECT b.book_id, b.title,
-                       GROUP_CONCAT(DISTINCT a.full_name) AS authors,
-                       GROUP_CONCAT(DISTINCT c.name) AS categories
-                FROM books b
-                LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.author_id
-                LEFT JOIN book_categories bc ON b.book_id = bc.book_id
-                LEFT JOIN categories c ON bc.category_id = c.category_id
-                WHERE c.name LIKE :term
-                GROUP BY b.book_id
-            """)
-
-        else:
+        if choice not in SEARCH_MODES:
             console.print("[red]Invalid choice![/red]")
             continue
 
+        term = typer.prompt("Enter search term")
+
         # Execute search query
-        results = session.execute(query, {"term": like_term}).fetchall()
+        results = catalogue_cache.get_cache(session).books(find_book_ids(session, SEARCH_MODES[choice], term))
         
         # Display search results
         if not results:
@@ -305,14 +330,17 @@ def search_books(session: Session):
         # Show recommendations if we have book IDs
         if book_ids:
             console.print("\n[bold cyan]✨ Recommendations for you:[/bold cyan]")
+            recommendations = search_recommendations(session, book_ids)
             
-            # Get "Users also borrowed" recommendations
-            also_borrowed = fetch_also_borrowed_books(session, book_ids)
-            display_recommendations(also_borrowed, "📖 Readers also borrowed:", session)
+            # "Users also borrowed", or popular books when nobody has
+            display_recommendations(recommendations["also_borrowed"], "📖 Readers also borrowed:", session)
+            display_recommendations(recommendations["popular"], "🔥 Popular right now:", session)
             
-            # Get similar items recommendations
-            similar_items = fetch_similar_items(session, book_ids)
-            display_recommendations(similar_items, "📚 Similar items you might like:", session)
+            # Similar items by author/category
+            display_recommendations(recommendations["similar_items"], "📚 Similar items you might like:", session)
+
+            # Nearest books by reading pattern (needs a trained recommender)
+            display_recommendations(recommendations["taste_neighbours"], "🔎 Readers with similar taste liked:", session)
 
 def my_borrowed_books(user_id: int, session: Session):
     query = text("""
@@ -337,13 +365,21 @@ def my_borrowed_books(user_id: int, session: Session):
     """)
 
     results = session.execute(query, {"user_id": user_id}).fetchall()
+    # Loans returned long ago live in borrows_archive; only fetched on request
+    archived = borrow_archive.archived_count(session, user_id)
 
-    if not results:
+    if not results and not archived:
         console.print("[yellow]You have not borrowed any books yet.[/yellow]")
         return
 
-    from rich.table import Table
-    table = Table(title="📚 My Borrowed Books", show_lines=True)
+    if results:
+        console.print(borrows_table("📚 My Borrowed Books", results))
+    if archived and typer.confirm(f"Show {archived} older loan(s) from the archive?", default=False):
+        console.print(borrows_table("🗄️ Archived Loans", borrow_archive.archived_borrows(session, user_id)))
+
+
+def borrows_table(title, results):
+    table = Table(title=title, show_lines=True)
     table.add_column("Borrow ID", style="cyan", no_wrap=True)
     table.add_column("Book ID", style="green")
     table.add_column("Title", style="bold green")
@@ -368,7 +404,7 @@ def my_borrowed_books(user_id: int, session: Session):
             status
         )
 
-    console.print(table)
+    return table
 
 # ---------- DISPLAY FUNCTION ----------
 from rich.table import Table
@@ -398,20 +434,117 @@ def display_books(results):
 
     console.print(table)
 
+# ---------- BORROW / RETURN CORE ----------
+LOAN_DAYS = 14
+
+# Shared with async_service so both paths run the same statements
+PICK_COPY_SQL = text("""
+    SELECT copy_id FROM book_copies
+    WHERE book_id = :book_id AND is_available = TRUE
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+""")
+INSERT_BORROW_SQL = text("""
+    INSERT INTO borrows (user_id, copy_id, librarian_id, borrow_date, due_date)
+    VALUES (:user_id, :copy_id, :librarian_id, CURDATE(), DATE_ADD(CURDATE(), INTERVAL :loan_days DAY))
+""")
+LOCK_ACTIVE_BORROW_SQL = text("""
+    SELECT borrow_id, user_id, copy_id FROM borrows
+    WHERE borrow_id = :borrow_id AND return_date IS NULL
+    FOR UPDATE
+""")
+# Every book a user has borrowed (current loans included), for cache invalidation
+BORROWER_BOOKS_SQL = text("""
+    SELECT DISTINCT bc.book_id
+    FROM borrows_history b
+    JOIN book_copies bc ON bc.copy_id = b.copy_id
+    WHERE b.user_id = :user_id
+""")
+MARK_RETURNED_SQL = text("UPDATE borrows SET return_date = CURDATE() WHERE borrow_id = :borrow_id")
+SET_COPY_AVAILABLE_SQL = text("UPDATE book_copies SET is_available = :available WHERE copy_id = :copy_id")
+
+
+def issue_statements(user_id, copy_id, borrow_id):
+    """
+    (statement, params) pairs that follow INSERT_BORROW_SQL in the issuing
+    transaction. borrow_book and async_service.issue both run this list.
+    """
+    return [
+        (SET_COPY_AVAILABLE_SQL, {"available": False, "copy_id": copy_id}),
+        (account_stats.BUMP_SQL, account_stats.bump_params(user_id, total=1, current=1)),
+        *((statement, {"borrow_id": borrow_id}) for statement in book_stats.ISSUE_STATEMENTS),
+    ]
+
+
+def return_statements(user_id, copy_id, borrow_id):
+    """(statement, params) pairs that mark a locked active borrow returned; shared like issue_statements."""
+    return [
+        (MARK_RETURNED_SQL, {"borrow_id": borrow_id}),
+        (SET_COPY_AVAILABLE_SQL, {"available": True, "copy_id": copy_id}),
+        (account_stats.BUMP_SQL, account_stats.bump_params(user_id, current=-1)),
+        *((statement, {"borrow_id": borrow_id}) for statement in book_stats.RETURN_STATEMENTS),
+    ]
+
+
+def after_issue(book_id: int, borrower_book_ids=(), session: Session = None):
+    """
+    In-process caches to update once an issue has committed.
+    `borrower_book_ids` (rows of BORROWER_BOOKS_SQL) is only needed while
+    the recommendation cache holds entries. Without a session (the async
+    path) trending only moves the book, not its categories.
+    """
+    recommendation_cache.record_borrow(book_id, borrower_book_ids)
+    trending.record_issue(book_id, session)
+
+
+def borrow_book(session: Session, user_id: int, book_id: int, librarian_id: int = None):
+    """
+    Lends one available copy of a book to a user and commits.
+    Returns the new borrow as a dict, or None when no copy is free.
+    SKIP LOCKED lets concurrent issues of the same title claim different copies.
+    """
+    copy = session.execute(PICK_COPY_SQL, {"book_id": book_id}).fetchone()
+
+    if not copy:
+        session.rollback()
+        return None
+
+    result = session.execute(INSERT_BORROW_SQL, {
+        "user_id": user_id, "copy_id": copy.copy_id, "librarian_id": librarian_id, "loan_days": LOAN_DAYS
+    })
+    for statement, params in issue_statements(user_id, copy.copy_id, result.lastrowid):
+        session.execute(statement, params)
+    session.commit()
+    borrower_books = []
+    if recommendation_cache.size():
+        borrower_books = [row.book_id for row in session.execute(BORROWER_BOOKS_SQL, {"user_id": user_id})]
+    after_issue(book_id, borrower_books, session)
+    return {"borrow_id": result.lastrowid, "user_id": user_id, "book_id": book_id, "copy_id": copy.copy_id}
+
+
+def return_borrow(session: Session, borrow_id: int, user_id: int = None):
+    """
+    Marks an active borrow as returned and frees its copy, then commits.
+    When `user_id` is given the borrow must belong to that user.
+    Returns the borrow as a dict, or None if there is no such active borrow.
+    """
+    borrow = session.execute(LOCK_ACTIVE_BORROW_SQL, {"borrow_id": borrow_id}).fetchone()
+
+    if not borrow or (user_id is not None and int(borrow.user_id) != int(user_id)):
+        session.rollback()
+        return None
+
+    for statement, params in return_statements(borrow.user_id, borrow.copy_id, borrow.borrow_id):
+        session.execute(statement, params)
+    session.commit()
+    return {"borrow_id": borrow.borrow_id, "user_id": borrow.user_id, "copy_id": borrow.copy_id}
+
+
 # ---------- ISSUE BOOK FUNCTION ----------
+@traced()
 def issue_book(user_id: int, session: Session):
     # List all books with at least one available copy
-    results = session.execute(text("""
-        SELECT b.book_id, b.title, GROUP_CONCAT(DISTINCT a.full_name) AS authors, 
-               COUNT(bc.copy_id) AS available_copies
-        FROM books b
-        LEFT JOIN book_authors ba ON b.book_id = ba.book_id
-        LEFT JOIN authors a ON ba.author_id = a.author_id
-        LEFT JOIN book_copies bc ON b.book_id = bc.book_id AND bc.is_available = TRUE
-        GROUP BY b.book_id
-        HAVING available_copies > 0
-        ORDER BY b.title
-    """)).fetchall()
+    results = available_books(session)
 
     if not results:
         console.print("[yellow]No books available to borrow.[/yellow]")
@@ -425,8 +558,8 @@ def issue_book(user_id: int, session: Session):
     table.add_column("Authors", style="magenta")
     table.add_column("Available Copies", style="yellow")
 
-    for idx, row in enumerate(results, start=1):
-        table.add_row(str(idx), str(row.book_id), row.title, row.authors or "N/A", str(row.available_copies))
+    for idx, (book, available_copies) in enumerate(results, start=1):
+        table.add_row(str(idx), str(book.book_id), book.title, book.authors or "N/A", str(available_copies))
 
     console.print(table)
 
@@ -435,32 +568,17 @@ def issue_book(user_id: int, session: Session):
         console.print("[red]Invalid selection[/red]")
         return
 
-    selected_book = results[index - 1]
+    selected_book = results[index - 1][0]
 
-    # Find an available copy
-    copy = session.execute(
-        text("SELECT copy_id FROM book_copies WHERE book_id = :book_id AND is_available = TRUE LIMIT 1"),
-        {"book_id": selected_book.book_id}
-    ).fetchone()
-
-    # Issue the book
-    session.execute(
-        text("""
-            INSERT INTO borrows (user_id, copy_id, librarian_id, borrow_date, due_date)
-            VALUES (:user_id, :copy_id, NULL, CURDATE(), DATE_ADD(CURDATE(), INTERVAL 14 DAY))
-        """),
-        {"user_id": user_id, "copy_id": copy.copy_id}
-    )
+    if not borrow_book(session, user_id, selected_book.book_id):
+        console.print("[red]No copies available![/red]")
+        return
 
-    session.execute(
-        text("UPDATE book_copies SET is_available = FALSE WHERE copy_id = :copy_id"),
-        {"copy_id": copy.copy_id}
-    )
-    session.commit()
     console.print(f"[green]Book '{selected_book.title}' issued successfully![/green]")
 
 
 # ---------- RETURN BOOK FUNCTION ----------
+@traced()
 def return_book(user_id: int, session: Session):
     # List all active borrowed books
     results = session.execute(text("""
@@ -468,7 +586,7 @@ def return_book(user_id: int, session: Session):
         FROM borrows br
         JOIN book_copies bc ON br.copy_id = bc.copy_id
         LEFT JOIN books b ON bc.book_id = b.book_id
-        WHERE br.user_id = :user_id AND br.return_date IS NULL
+        WHERE br.active = 1 AND br.user_id = :user_id
     """), {"user_id": user_id}).fetchall()
 
     if not results:
@@ -494,45 +612,32 @@ def return_book(user_id: int, session: Session):
 
     selected_borrow = results[index - 1]
 
-    # Mark returned
-    session.execute(
-        text("UPDATE borrows SET return_date = CURDATE() WHERE borrow_id = :borrow_id"),
-        {"borrow_id": selected_borrow.borrow_id}
-    )
-    session.execute(
-        text("UPDATE book_copies SET is_available = TRUE WHERE copy_id = :copy_id"),
-        {"copy_id": selected_borrow.copy_id}
-    )
-    session.commit()
+    if not return_borrow(session, selected_borrow.borrow_id, user_id):
+        console.print("[red]This book has already been returned.[/red]")
+        return
+
     console.print(f"[green]Book '{selected_borrow.title}' returned successfully![/green]")
 
 # ---------- ACCOUNT FUNCTIONS ----------
+@traced()
 def view_account(user_id: int, session: Session):
-    query = text("""
-        SELECT full_name, email, phone, membership_date, status,
-               (SELECT COUNT(*) FROM borrows WHERE user_id = :user_id) AS total_borrowed,
-               (SELECT COUNT(*) FROM borrows WHERE user_id = :user_id AND return_date IS NULL) AS currently_borrowed,
-               (SELECT IFNULL(SUM(amount), 0) FROM fines f
-                JOIN borrows b ON f.borrow_id = b.borrow_id
-                WHERE b.user_id = :user_id AND f.paid = FALSE) AS fines_due
-        FROM users
-        WHERE user_id = :user_id
-    """)
-    result = session.execute(query, {"user_id": user_id}).fetchone()
+    cached = session_cache.identity(user_id)
+    profile = cached.profile(session)
 
-    if not result:
+    if not profile:
         console.print("[red]User not found![/red]")
         return
 
-    console.print(f"[bold green]Full Name:[/bold green] {result.full_name}")
-    console.print(f"[bold green]Email:[/bold green] {result.email}")
-    console.print(f"[bold green]Phone:[/bold green] {result.phone or '-'}")
-    console.print(f"[bold green]Membership Type:[/bold green] Student")  # hardcoded
-    console.print(f"[bold green]Membership Date:[/bold green] {result.membership_date}")
-    console.print(f"[bold green]Status:[/bold green] {result.status}")
-    console.print(f"[bold green]Total Books Borrowed:[/bold green] {result.total_borrowed}")
-    console.print(f"[bold green]Currently Borrowed Books:[/bold green] {result.currently_borrowed}")
-    console.print(f"[bold green]Fines Due:[/bold green] {result.fines_due}")
+    counters = cached.counters(session)
+    console.print(f"[bold green]Full Name:[/bold green] {profile['full_name']}")
+    console.print(f"[bold green]Email:[/bold green] {profile['email']}")
+    console.print(f"[bold green]Phone:[/bold green] {profile['phone'] or '-'}")
+    console.print(f"[bold green]Membership Type:[/bold green] {profile['membership_type']}")
+    console.print(f"[bold green]Membership Date:[/bold green] {profile['membership_date']}")
+    console.print(f"[bold green]Status:[/bold green] {profile['status']}")
+    console.print(f"[bold green]Total Books Borrowed:[/bold green] {counters['total_borrowed']}")
+    console.print(f"[bold green]Currently Borrowed Books:[/bold green] {counters['currently_borrowed']}")
+    console.print(f"[bold green]Fines Due:[/bold green] {counters['fines_due']}")
 
 
 def update_full_name(user_id: int, session: Session):
@@ -542,6 +647,7 @@ def update_full_name(user_id: int, session: Session):
         {"full_name": new_name, "user_id": user_id}
     )
     session.commit()
+    session_cache.invalidate_profile(user_id)
     console.print("[green]Full name updated successfully![/green]")
 
 def update_phone(user_id: int, session: Session):
@@ -551,6 +657,7 @@ def update_phone(user_id: int, session: Session):
         {"phone": new_phone, "user_id": user_id}
     )
     session.commit()
+    session_cache.invalidate_profile(user_id)
     console.print("[green]Phone number updated successfully![/green]")
 
 def account_menu(user_id: int, session: Session):
@@ -575,6 +682,14 @@ def account_menu(user_id: int, session: Session):
         else:
             console.print("[red]Invalid choice![/red]")
 
+# ---------- RECOMMENDED FOR YOU ----------
+def recommended_books(user_id: int, session: Session):
+    books = recommender.recommended_for_user(session, user_id)
+    if not books:
+        console.print("[yellow]No personal recommendations yet; borrow or review a few books first.[/yellow]")
+        return
+    display_recommendations(books, "Recommended for you:", session)
+
 # ---------- STUDENT MENU ----------
 def student_menu(user_id: int, session: Session):
     while True:
@@ -585,13 +700,15 @@ def student_menu(user_id: int, session: Session):
 3. Issue Book
 4. Return Book
 5. Account
-6. Logout
+6. Recommended for You
+7. Logout
 ==========================================
         """)
         choice = typer.prompt("Enter your choice")
 
         if choice == "1":
-            search_books(session)
+            with read_session(session) as reader:
+                search_books(reader)
         elif choice == "2":
             my_borrowed_books(user_id, session)
         elif choice == "3":
@@ -601,6 +718,10 @@ def student_menu(user_id: int, session: Session):
         elif choice == "5":
             account_menu(user_id, session)
         elif choice == "6":
+            with read_session(session) as reader:
+                recommended_books(user_id, reader)
+        elif choice == "7":
+            session_cache.forget(user_id)
             console.print("[yellow]Logging out...[/yellow]")
             break
         else:
@@ -0,0 +1,55 @@
+"""
+Shared fixtures: a fresh SQLite database per test, created from
+schema_sqlite.sql with the MySQL compatibility layer installed, so the
+modules' MySQL SQL runs unchanged.
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# Keep test runs away from the working directory's catalogue snapshot
+os.environ.setdefault("LMS_CATALOGUE_SNAPSHOT", "")
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import sql_dialect
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lms.db'}", future=True)
+    sql_dialect.install_sqlite(engine)
+    sql_dialect.init_sqlite(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with sessionmaker(bind=engine, future=True)() as session:
+        yield session
+
+
+@pytest.fixture
+def library(session):
+    """Two students, a librarian and two books with two copies each; returns their ids."""
+    session.execute(text("""
+        INSERT INTO users (user_id, full_name, username, email, membership_type_id, membership_date)
+        VALUES (1, 'Ada Reader', 'ada', 'ada@example.org', 1, '2024-01-01'),
+               (2, 'Ben Reader', 'ben', 'ben@example.org', 1, '2024-01-01')
+    """))
+    session.execute(text("""
+        INSERT INTO librarians (librarian_id, full_name, email, username, password_hash)
+        VALUES (1, 'Lib Rarian', 'lib@example.org', 'lib', 'x')
+    """))
+    session.execute(text("INSERT INTO books (book_id, title) VALUES (1, 'Dune'), (2, 'Emma')"))
+    session.execute(text("""
+        INSERT INTO book_copies (copy_id, book_id, barcode)
+        VALUES (1, 1, 'B-1-1'), (2, 1, 'B-1-2'), (3, 2, 'B-2-1'), (4, 2, 'B-2-2')
+    """))
+    session.commit()
+    return {"users": [1, 2], "books": [1, 2], "copies": [1, 2, 3, 4]}
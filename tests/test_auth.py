@@ -0,0 +1,39 @@
+import hashlib
+
+from sqlalchemy import text
+
+import auth
+
+
+def test_scrypt_round_trip():
+    stored = auth.hash_password("correct horse")
+    assert stored.startswith("scrypt$")
+    assert auth.verify_password("correct horse", stored) == (True, False)
+    assert auth.verify_password("wrong", stored) == (False, False)
+
+
+def test_legacy_sha256_needs_rehash():
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    assert auth.verify_password("secret", legacy) == (True, True)
+    assert auth.verify_password("secret", legacy.upper()) == (True, True)
+    assert auth.verify_password("other", legacy) == (False, False)
+
+
+def test_corrupt_stored_values_fail():
+    assert auth.verify_password("secret", "") == (False, False)
+    assert auth.verify_password("secret", "scrypt$bad") == (False, False)
+    assert auth.verify_password("secret", "é" * 64) == (False, False)
+
+
+def test_login_rehashes_legacy_password(session, library):
+    session.execute(
+        text("UPDATE librarians SET password_hash = :h WHERE librarian_id = 1"),
+        {"h": hashlib.sha256(b"secret").hexdigest()},
+    )
+    session.commit()
+
+    row = auth._check_credentials(session, "librarian", "librarians", "librarian_id", "lib", "secret")
+    assert row is not None
+    stored = session.execute(text("SELECT password_hash FROM librarians WHERE librarian_id = 1")).scalar()
+    assert stored.startswith("scrypt$")
+    assert auth.verify_password("secret", stored) == (True, False)
@@ -0,0 +1,52 @@
+from sqlalchemy import text
+
+import borrow_archive
+from librarian import add_fine
+
+
+def _old_borrows(session, count):
+    """`count` loans of copy 1 returned two years ago, plus one still out; returns their ids."""
+    for _ in range(count):
+        session.execute(text("""
+            INSERT INTO borrows (user_id, copy_id, borrow_date, due_date, return_date)
+            VALUES (1, 1, DATE_SUB(CURDATE(), INTERVAL 750 DAY),
+                    DATE_SUB(CURDATE(), INTERVAL 736 DAY), DATE_SUB(CURDATE(), INTERVAL 740 DAY))
+        """))
+    session.execute(text("""
+        INSERT INTO borrows (user_id, copy_id, borrow_date, due_date)
+        VALUES (2, 3, DATE_SUB(CURDATE(), INTERVAL 750 DAY), DATE_SUB(CURDATE(), INTERVAL 736 DAY))
+    """))
+    session.commit()
+    return [row[0] for row in session.execute(text("SELECT borrow_id FROM borrows ORDER BY borrow_id"))]
+
+
+def _ids(session, table):
+    return [row[0] for row in session.execute(text(f"SELECT borrow_id FROM {table} ORDER BY borrow_id"))]
+
+
+def test_moves_in_batches_and_skips_fined(session, library):
+    ids = _old_borrows(session, 5)
+    session.execute(text("INSERT INTO fines (borrow_id, amount) VALUES (:borrow_id, 1)"), {"borrow_id": ids[0]})
+    session.commit()
+
+    assert borrow_archive.archive_returned(session, older_than_days=365, batch_size=2, max_rows=3) == 3
+    assert _ids(session, "borrows_archive") == ids[1:4]
+    assert borrow_archive.archive_returned(session, older_than_days=365, batch_size=2) == 1
+    # The fined and the active borrow stay hot; nothing is lost from the history view
+    assert _ids(session, "borrows") == [ids[0], ids[5]]
+    assert _ids(session, "borrows_archive") == ids[1:5]
+    assert _ids(session, "borrows_history") == ids
+    assert borrow_archive.archived_count(session, 1) == 4
+
+
+def test_recent_returns_stay_hot(session, library):
+    _old_borrows(session, 2)
+    assert borrow_archive.archive_returned(session, older_than_days=1000) == 0
+
+
+def test_fining_an_archived_borrow_restores_it(session, library):
+    ids = _old_borrows(session, 1)
+    borrow_archive.archive_returned(session, older_than_days=365)
+    assert add_fine(session, ids[0], 3)
+    assert _ids(session, "borrows_archive") == []
+    assert ids[0] in _ids(session, "borrows")
@@ -0,0 +1,59 @@
+from sqlalchemy import text
+
+import sql_dialect
+from sql_dialect import mysql_to_sqlite
+
+
+def test_insert_ignore():
+    assert mysql_to_sqlite("INSERT IGNORE INTO t (a) VALUES (1)") == "INSERT OR IGNORE INTO t (a) VALUES (1)"
+
+
+def test_on_duplicate_key_values_function():
+    sql = mysql_to_sqlite("INSERT INTO t (a, b) VALUES (1, 2) ON DUPLICATE KEY UPDATE b = b + VALUES(b)")
+    assert "ON DUPLICATE" not in sql
+    assert sql.endswith("ON CONFLICT DO UPDATE SET b = b + excluded.b")
+
+
+def test_on_duplicate_key_row_alias():
+    sql = mysql_to_sqlite("INSERT INTO t (a, b) VALUES (1, 2) AS new ON DUPLICATE KEY UPDATE b = t.b + new.b")
+    assert sql == "INSERT INTO t (a, b) VALUES (1, 2) ON CONFLICT DO UPDATE SET b = t.b + excluded.b"
+
+
+def test_on_duplicate_key_derived_table():
+    sql = mysql_to_sqlite(
+        "INSERT INTO t (a, b) SELECT * FROM (SELECT 1 AS a, 2 AS b) AS new "
+        "ON DUPLICATE KEY UPDATE b = t.b + new.b"
+    )
+    assert "AS new WHERE true ON CONFLICT DO UPDATE SET b = t.b + excluded.b" in sql
+
+
+def test_date_add_and_sub():
+    assert "_date_add(borrow_date, 14, 'DAY')" in mysql_to_sqlite("SELECT DATE_ADD(borrow_date, INTERVAL 14 DAY)")
+    assert "_date_add(CURDATE(), -(3), 'MONTH')" in mysql_to_sqlite("SELECT DATE_SUB(CURDATE(), INTERVAL 3 MONTH)")
+
+
+def test_delete_limit():
+    sql = mysql_to_sqlite("DELETE FROM t WHERE a < 5 LIMIT 100")
+    assert sql == "DELETE FROM t WHERE rowid IN (SELECT rowid FROM t WHERE a < 5 LIMIT 100)"
+
+
+def test_rewrites_run_on_sqlite(session):
+    session.execute(text("CREATE TABLE t (a INTEGER PRIMARY KEY, b INTEGER NOT NULL)"))
+    session.execute(text("INSERT IGNORE INTO t (a, b) VALUES (1, 1)"))
+    session.execute(text("INSERT IGNORE INTO t (a, b) VALUES (1, 5)"))
+    session.execute(text("INSERT INTO t (a, b) VALUES (1, 2) AS new ON DUPLICATE KEY UPDATE b = t.b + new.b"))
+    session.execute(text(
+        "INSERT INTO t (a, b) SELECT * FROM (SELECT 1 AS a, 4 AS b) AS new ON DUPLICATE KEY UPDATE b = t.b + new.b"
+    ))
+    assert session.execute(text("SELECT b FROM t WHERE a = 1")).scalar() == 7
+
+    session.execute(text("INSERT INTO t (a, b) VALUES (2, 0), (3, 0), (4, 0)"))
+    session.execute(text("DELETE FROM t WHERE b = 0 LIMIT 2"))
+    assert session.execute(text("SELECT COUNT(*) FROM t WHERE b = 0")).scalar() == 1
+
+    assert session.execute(text("SELECT DATE_ADD('2024-01-31', INTERVAL 1 MONTH)")).scalar().startswith("2024-02-29")
+
+
+def test_is_sqlite():
+    assert sql_dialect.is_sqlite("sqlite:///lms.db")
+    assert not sql_dialect.is_sqlite("mysql+pymysql://root@localhost/lms")
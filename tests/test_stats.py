@@ -0,0 +1,51 @@
+"""The incrementally maintained rollups must match a rebuild from history."""
+from sqlalchemy import text
+
+import account_stats
+import book_stats
+from librarian import add_fine, pay_fine
+from student import borrow_book, return_borrow
+
+ACCOUNT_SQL = "SELECT user_id, total_borrowed, currently_borrowed, fines_due FROM user_account_stats ORDER BY user_id"
+BOOK_SQL = """
+    SELECT book_id, total_borrows, unique_borrowers, returned_count, late_returns,
+           total_late_days, avg_late_days, last_borrowed
+    FROM book_borrow_stats ORDER BY book_id
+"""
+MONTHLY_SQL = "SELECT book_id, month, borrows, returns, late_days FROM book_borrow_monthly ORDER BY book_id, month"
+
+
+def _rows(session, sql):
+    return [tuple(row) for row in session.execute(text(sql))]
+
+
+def _activity(session):
+    first = borrow_book(session, 1, 1)
+    second = borrow_book(session, 1, 2)
+    third = borrow_book(session, 2, 1)
+    assert borrow_book(session, 2, 1) is None  # both copies of book 1 are out
+    return_borrow(session, first["borrow_id"])
+    return_borrow(session, third["borrow_id"])
+    borrow_book(session, 2, 1)
+    fine_id = add_fine(session, first["borrow_id"], 2.5)
+    add_fine(session, second["borrow_id"], 1.25)
+    assert pay_fine(session, fine_id)
+    assert not pay_fine(session, fine_id)
+
+
+def test_account_stats_match_rebuild(session, library):
+    _activity(session)
+    incremental = _rows(session, ACCOUNT_SQL)
+    assert account_stats.get_stats(session, 1) == {"total_borrowed": 2, "currently_borrowed": 1, "fines_due": 1.25}
+
+    account_stats.rebuild(session)
+    assert _rows(session, ACCOUNT_SQL) == incremental
+
+
+def test_book_stats_match_rebuild(session, library):
+    _activity(session)
+    incremental = _rows(session, BOOK_SQL), _rows(session, MONTHLY_SQL)
+    assert [row[:4] for row in incremental[0]] == [(1, 3, 2, 2), (2, 1, 1, 0)]
+
+    book_stats.rebuild(session)
+    assert (_rows(session, BOOK_SQL), _rows(session, MONTHLY_SQL)) == incremental
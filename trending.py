@@ -0,0 +1,186 @@
+"""
+"Trending now": borrow counts per book and per category that decay
+exponentially with age (half-life LMS_TRENDING_HALF_LIFE_DAYS), so last
+week's borrows outweigh last year's.
+
+Scores are kept relative to a fixed epoch day: a borrow on day d adds
+exp(rate * (d - epoch)). Every score then decays by the same factor as time
+passes, so a new borrow is one addition and the ranking never has to be
+re-scored. Top-N comes from a max-heap with lazy deletion. The engine is
+rebuilt from the recent hot and archived borrows on first use and every
+LMS_TRENDING_REBUILD_SECONDS, and updated by record_issue() in between.
+"""
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+HALF_LIFE_DAYS = float(os.getenv("LMS_TRENDING_HALF_LIFE_DAYS", "14"))
+# Borrows older than this many half-lives weigh under 1/4096 and are not read
+WINDOW_HALF_LIVES = 12
+# Issues made by other processes are picked up by the periodic rebuild
+REBUILD_SECONDS = float(os.getenv("LMS_TRENDING_REBUILD_SECONDS", "3600"))
+# Move the epoch forward before exp() loses precision
+MAX_EXPONENT = 50.0
+
+# archive-borrows may move loans younger than the window into borrows_archive
+RECENT_BORROWS_SQL = text("""
+    SELECT bc.book_id, br.borrow_date, COUNT(*) AS borrows
+    FROM (
+        SELECT copy_id, borrow_date FROM borrows
+        WHERE borrow_date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+        UNION ALL
+        SELECT copy_id, borrow_date FROM borrows_archive
+        WHERE borrow_date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+    ) br
+    JOIN book_copies bc ON bc.copy_id = br.copy_id
+    GROUP BY bc.book_id, br.borrow_date
+""")
+
+
+def _day(value):
+    if isinstance(value, str):  # SQLite returns dates as text
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+class DecayedTopN:
+    """Scores per key with top-N queries over a heap of (-score, key); stale heap entries are skipped."""
+
+    def __init__(self):
+        self.scores = {}
+        self._heap = []
+
+    def add(self, key, weight):
+        score = self.scores.get(key, 0.0) + weight
+        self.scores[key] = score
+        heapq.heappush(self._heap, (-score, key))
+        if len(self._heap) > 2 * len(self.scores) + 1024:
+            self._heap = [(-s, k) for k, s in self.scores.items()]
+            heapq.heapify(self._heap)
+
+    def scale(self, factor):
+        self.scores = {k: s * factor for k, s in self.scores.items()}
+        self._heap = [(-s, k) for k, s in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n):
+        """[(key, score)] highest first; scores are relative to the engine's epoch."""
+        found, popped, seen = [], [], set()
+        while self._heap and len(found) < n:
+            entry = heapq.heappop(self._heap)
+            score, key = -entry[0], entry[1]
+            if self.scores.get(key) == score and key not in seen:
+                seen.add(key)
+                found.append((key, score))
+                popped.append(entry)
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        return found
+
+    def __len__(self):
+        return len(self.scores)
+
+
+class Trending:
+    def __init__(self, half_life_days=HALF_LIFE_DAYS, today=None):
+        self.rate = math.log(2) / half_life_days
+        self.epoch = today or date.today().toordinal()
+        self.books, self.categories = DecayedTopN(), DecayedTopN()
+        self.built_at = time.monotonic()
+
+    def _weight(self, day):
+        if self.rate * (day - self.epoch) > MAX_EXPONENT:
+            shift = day - self.epoch
+            self.books.scale(math.exp(-self.rate * shift))
+            self.categories.scale(math.exp(-self.rate * shift))
+            self.epoch = day
+        return math.exp(self.rate * (day - self.epoch))
+
+    @classmethod
+    def build(cls, session: Session, half_life_days=HALF_LIFE_DAYS):
+        """Scores every borrow in the last WINDOW_HALF_LIVES half-lives."""
+        import catalogue_cache
+
+        engine = cls(half_life_days)
+        days = int(math.ceil(half_life_days * WINDOW_HALF_LIVES))
+        for book_id, borrow_date, borrows in session.execute(RECENT_BORROWS_SQL, {"days": days}):
+            engine.books.add(book_id, borrows * engine._weight(_day(borrow_date)))
+        # A category's score is the sum of its books' (both decay at the same rate)
+        cache = catalogue_cache.get_cache(session)
+        for book_id, score in engine.books.scores.items():
+            for category_id in cache.category_ids(book_id):
+                engine.categories.add(category_id, score)
+        return engine
+
+    def record_issue(self, book_id, category_ids=(), day=None):
+        weight = self._weight(day or date.today().toordinal())
+        self.books.add(int(book_id), weight)
+        for category_id in category_ids:
+            self.categories.add(int(category_id), weight)
+
+    def _now(self, ranked, day=None):
+        # Express scores as decayed borrow counts as of `day`
+        factor = math.exp(-self.rate * ((day or date.today().toordinal()) - self.epoch))
+        return [(key, score * factor) for key, score in ranked]
+
+    def top_books(self, n=10, day=None):
+        """[(book_id, decayed borrows)] most trending first."""
+        return self._now(self.books.top(n), day)
+
+    def top_categories(self, n=10, day=None):
+        """[(category_id, decayed borrows)] most trending first."""
+        return self._now(self.categories.top(n), day)
+
+
+# ---------- Shared Instance ----------
+_trending = None
+_lock = threading.Lock()
+
+
+def get_trending(session: Session) -> Trending:
+    """The process-wide engine, built on first use and rebuilt every REBUILD_SECONDS."""
+    global _trending
+    with _lock:
+        if _trending is None or time.monotonic() - _trending.built_at > REBUILD_SECONDS:
+            _trending = Trending.build(session)
+        return _trending
+
+
+def record_issue(book_id: int, session: Session = None):
+    """
+    Counts a new borrow; a no-op until the engine has been built in this
+    process. Without a session only the book's score moves; its categories
+    catch up at the next rebuild.
+    """
+    import catalogue_cache
+
+    if _trending is None:
+        return
+    # The cache lookup may hit the database, so it stays outside the lock
+    category_ids = catalogue_cache.get_cache(session).category_ids(book_id) if session is not None else ()
+    with _lock:
+        if _trending is not None:
+            _trending.record_issue(book_id, category_ids)
+
+
+def trending_books(session: Session, n: int = 10):
+    """[(BookRecord, score)] for the top `n` trending books."""
+    import catalogue_cache
+
+    ranked = get_trending(session).top_books(n)
+    records = {r.book_id: r for r in catalogue_cache.get_cache(session).books(b for b, _ in ranked)}
+    return [(records[b], score) for b, score in ranked if b in records]
+
+
+def trending_categories(session: Session, n: int = 10):
+    """[(category name, score)] for the top `n` trending categories."""
+    import catalogue_cache
+
+    names = catalogue_cache.get_cache(session).categories
+    return [((names.lookup([c]) or [str(c)])[0], score) for c, score in get_trending(session).top_categories(n)]